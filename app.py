@@ -2,9 +2,16 @@ from flask import Flask, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-from backend.gee_handler import GEEHandler
+from backend.imagery_backend import create_imagery_backend
 from backend.ml_classifier import MLClassifier
 from backend.utils import create_directories
+from backend.colorize import render_png
+from backend.tiles import is_valid_tile, render_tile
+from backend.tile_cache import TileCache
+from backend.jobs import JobManager, QueueFullError, QUEUED, FINISHED
+from backend.model_registry import ModelRegistry
+from threadpoolctl import threadpool_limits
+from config import Config
 
 # Try to import ReportGenerator (optional feature)
 try:
@@ -24,14 +31,26 @@ CORS(app)
 create_directories()
 
 # Initialize handlers
-gee_handler = GEEHandler()
-ml_classifier = MLClassifier()
+gee_handler = create_imagery_backend()
+model_registry = ModelRegistry(Config.MODELS_DIR, Config.MODEL_CACHE_ENTRIES, Config.MODEL_CACHE_BYTES,
+                               Config.MODEL_STORE_ENTRIES, Config.MODEL_STORE_BYTES)
+ml_classifier = MLClassifier(model_registry)
 report_generator = ReportGenerator() if REPORTS_AVAILABLE else None
+tile_cache = TileCache(Config.TILE_CACHE_DIR, Config.TILE_CACHE_MAX_BYTES)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'ok', 'message': 'Server is running'})
 
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'analysis_results': gee_handler.result_cache.stats() if gee_handler.result_cache else None,
+        'tiles': tile_cache.stats(),
+        'exports': gee_handler.export_store.stats(),
+        'models': model_registry.stats()
+    })
+
 @app.route('/api/search-location', methods=['POST'])
 def search_location():
     data = request.json
@@ -62,13 +81,27 @@ def classify_land_cover():
     data = request.json
     image_path = data.get('image_path')
     model_type = data.get('model_type', 'random_forest')
+    model_id = data.get('model_id')
     
     try:
-        result = ml_classifier.classify(image_path, model_type)
+        with gee_handler.export_store.pinned(image_path):
+            result = ml_classifier.classify(image_path, model_type, model_id=model_id)
         return jsonify({'success': True, 'result': result})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/models', methods=['GET'])
+def list_models():
+    """Registered models with their training metadata, newest first"""
+    return jsonify({'success': True, 'models': model_registry.list_models(request.args.get('model_type'))})
+
+@app.route('/api/models/<model_id>', methods=['GET'])
+def get_model(model_id):
+    try:
+        return jsonify({'success': True, 'model': model_registry.metadata(model_id)})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+
 @app.route('/api/download/<path:filename>', methods=['GET'])
 def download_file(filename):
     try:
@@ -101,26 +134,65 @@ def download_file(filename):
         print(f"Download error: {e}")
         return f"Error: {str(e)}", 500
 
+def resolve_export_path(filename):
+    """Map a requested file name ('exports/x.tif' or 'x.tif') to its path under exports/"""
+    # Normalize path separators
+    filename = filename.replace('\\', '/')
+    
+    # Handle both 'exports/filename' and just 'filename'
+    if filename.startswith('exports/'):
+        file_path = filename
+    else:
+        file_path = os.path.join('exports', filename)
+    
+    # Normalize path for current OS
+    return os.path.normpath(file_path)
+
+def send_cached_png(file_path, params, render, download_name):
+    """Serve a rendered PNG through the tile cache with a strong ETag
+    
+    Exports never change after they are written, so the cache key (file
+    content hash + render params) doubles as the ETag and a matching
+    If-None-Match is answered with 304 before rasterio is touched.
+    """
+    import io
+    
+    key = tile_cache.key(file_path, *params)
+    
+    if request.if_none_match.contains(key):
+        response = app.response_class(status=304)
+        response.set_etag(key)
+        return response
+    
+    data = tile_cache.get(key)
+    if data is None:
+        data = render()
+        tile_cache.put(key, data)
+    
+    return send_file(
+        io.BytesIO(data),
+        mimetype='image/png',
+        as_attachment=False,
+        download_name=download_name,
+        etag=key
+    )
+
+def render_overlay(file_path):
+    """Whole classified image as one colorized PNG"""
+    import rasterio
+    
+    # Read the classified image
+    with rasterio.open(file_path) as src:
+        data = src.read(1)
+    
+    # Colorize with the shared palette lookup table as a paletted PNG
+    return render_png(data)
+
 @app.route('/api/get-map-tiles/<path:filename>', methods=['GET'])
 def get_map_tiles(filename):
     """Generate map tiles from classified image for web visualization"""
     try:
-        import rasterio
-        import numpy as np
-        from PIL import Image
-        import io
-        
-        # Normalize path separators
-        filename = filename.replace('\\', '/')
-        
-        # Handle both 'exports/filename' and just 'filename'
-        if filename.startswith('exports/'):
-            file_path = filename
-        else:
-            file_path = os.path.join('exports', filename)
-        
-        # Normalize path for current OS
-        file_path = os.path.normpath(file_path)
+        file_path = resolve_export_path(filename)
         
         print(f"Loading map tiles from: {file_path}")
         
@@ -128,49 +200,33 @@ def get_map_tiles(filename):
             print(f"File not found: {file_path}")
             return f"File not found: {file_path}", 404
         
-        # Read the classified image
-        with rasterio.open(file_path) as src:
-            data = src.read(1)
-            bounds = src.bounds
-            
-        # Color mapping for classes
-        color_map = {
-            0: [52, 152, 219],    # Water - Blue
-            1: [39, 174, 96],     # Forest - Dark Green
-            2: [46, 204, 113],    # Grassland - Light Green
-            3: [231, 76, 60],     # Urban - Red
-            4: [149, 165, 166],   # Barren - Gray
-            5: [243, 156, 18],    # Agriculture - Orange
-            # MODIS classes
-            11: [52, 152, 219],   # Wetlands - Blue
-            12: [243, 156, 18],   # Croplands - Orange
-            13: [231, 76, 60],    # Urban - Red
-            16: [149, 165, 166],  # Barren - Gray
-            17: [52, 152, 219],   # Water - Blue
-        }
-        
-        # Create RGB image
-        height, width = data.shape
-        rgb_image = np.zeros((height, width, 3), dtype=np.uint8)
+        return send_cached_png(
+            file_path, ('overlay',),
+            lambda: render_overlay(file_path),
+            f'{filename}.png'
+        )
         
-        for class_id, color in color_map.items():
-            mask = data == class_id
-            rgb_image[mask] = color
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/tiles/<path:filename>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def get_xyz_tile(filename, z, x, y):
+    """Serve one 256x256 Web Mercator tile of a classified image"""
+    try:
+        if not is_valid_tile(z, x, y):
+            return jsonify({'success': False, 'error': f'Invalid tile {z}/{x}/{y}'}), 400
         
-        # Convert to PNG
-        img = Image.fromarray(rgb_image, 'RGB')
+        file_path = resolve_export_path(filename)
         
-        # Save to bytes
-        img_io = io.BytesIO()
-        img.save(img_io, 'PNG')
-        img_io.seek(0)
+        if not os.path.exists(file_path):
+            return jsonify({'success': False, 'error': f'File not found: {file_path}'}), 404
         
-        # Return image with bounds info
-        return send_file(
-            img_io,
-            mimetype='image/png',
-            as_attachment=False,
-            download_name=f'{filename}.png'
+        return send_cached_png(
+            file_path, ('xyz', z, x, y),
+            lambda: render_tile(file_path, z, x, y),
+            f'{z}_{x}_{y}.png'
         )
         
     except Exception as e:
@@ -227,7 +283,25 @@ def get_image_bounds(filename):
 
 @app.route('/api/process-complete', methods=['POST'])
 def process_complete_workflow():
-    data = request.json
+    """Queue the complete workflow as a background job
+
+    Returns 202 with the job ID at once; poll /api/jobs/<job_id> or join
+    the job's Socket.IO room for `job_update` events.
+    """
+    data = request.json or {}
+    if not data.get('bounds'):
+        return jsonify({'success': False, 'error': 'Bounds are required'}), 400
+
+    job = job_manager.submit('process-complete', lambda job: run_complete_workflow(job, data), data)
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}'
+    }), 202
+
+def run_complete_workflow(job, data):
+    """Fetch, export, train and classify for one process-complete job"""
     bounds = data.get('bounds')
     start_date = data.get('start_date', '2023-01-01')
     end_date = data.get('end_date', '2023-12-31')
@@ -235,49 +309,59 @@ def process_complete_workflow():
     dataset_type = data.get('dataset_type', 'sentinel')
     analysis_type = data.get('analysis_type', 'classification')
     
-    try:
-        # Handle different analysis types
-        if analysis_type == 'water':
+    # Handle different analysis types
+    if analysis_type == 'water':
+        with job.stage('analysis', 'Detecting water bodies'):
             result = gee_handler.detect_water_bodies(bounds, start_date, end_date)
-            return jsonify({'success': True, 'analysis': result, 'type': 'water'})
-        
-        elif analysis_type == 'ndvi':
+        return {'success': True, 'analysis': result, 'type': 'water'}
+    
+    elif analysis_type == 'ndvi':
+        with job.stage('analysis', 'Calculating NDVI'):
             result = gee_handler.calculate_ndvi_analysis(bounds, start_date, end_date)
-            return jsonify({'success': True, 'analysis': result, 'type': 'ndvi'})
-        
-        elif analysis_type == 'urban':
-            old_start = data.get('old_start_date', '2020-01-01')
-            old_end = data.get('old_end_date', '2020-12-31')
+        return {'success': True, 'analysis': result, 'type': 'ndvi'}
+    
+    elif analysis_type == 'urban':
+        old_start = data.get('old_start_date', '2020-01-01')
+        old_end = data.get('old_end_date', '2020-12-31')
+        with job.stage('analysis', 'Detecting urban sprawl'):
             result = gee_handler.detect_urban_sprawl(bounds, old_start, old_end, start_date, end_date)
-            return jsonify({'success': True, 'analysis': result, 'type': 'urban'})
-        
-        elif analysis_type == 'forest':
-            old_start = data.get('old_start_date', '2020-01-01')
-            old_end = data.get('old_end_date', '2020-12-31')
+        return {'success': True, 'analysis': result, 'type': 'urban'}
+    
+    elif analysis_type == 'forest':
+        old_start = data.get('old_start_date', '2020-01-01')
+        old_end = data.get('old_end_date', '2020-12-31')
+        with job.stage('analysis', 'Detecting forest change'):
             result = gee_handler.detect_forest_change(bounds, old_start, old_end, start_date, end_date)
-            return jsonify({'success': True, 'analysis': result, 'type': 'forest'})
-        
-        elif analysis_type == 'moisture':
+        return {'success': True, 'analysis': result, 'type': 'forest'}
+    
+    elif analysis_type == 'moisture':
+        with job.stage('analysis', 'Calculating soil moisture'):
             result = gee_handler.calculate_soil_moisture(bounds, start_date, end_date)
-            return jsonify({'success': True, 'analysis': result, 'type': 'moisture'})
-        
-        else:  # classification
-            # Fetch imagery
+        return {'success': True, 'analysis': result, 'type': 'moisture'}
+    
+    else:  # classification
+        # Fetch imagery
+        with job.stage('fetch', 'Fetching satellite imagery'):
             imagery_result = gee_handler.fetch_satellite_data(bounds, start_date, end_date, dataset_type)
-            
-            # Export to .tif
-            export_path = gee_handler.export_to_tif(imagery_result['image_id'], bounds, dataset_type)
-            
+        
+        # Export to .tif, pinned so eviction cannot delete it while this job reads it
+        with job.stage('export', 'Downloading GeoTIFF'):
+            export_path = gee_handler.export_to_tif(imagery_result['image_id'], bounds, dataset_type,
+                                                    progress_callback=job.progress_callback,
+                                                    start_date=start_date, end_date=end_date, pin=True)
+        
+        try:
             # Train and classify
             if dataset_type == 'modis':
                 # Read MODIS data and get class distribution
                 import rasterio
                 import numpy as np
                 
-                with rasterio.open(export_path) as src:
-                    data_array = src.read(1)
-                
-                unique, counts = np.unique(data_array[data_array != 0], return_counts=True)
+                with job.stage('classify', 'Summarizing MODIS land cover'):
+                    with rasterio.open(export_path) as src:
+                        data_array = src.read(1)
+                    
+                    unique, counts = np.unique(data_array[data_array != 0], return_counts=True)
                 
                 modis_classes = {
                     1: 'Evergreen Needleleaf Forest', 2: 'Evergreen Broadleaf Forest',
@@ -298,25 +382,46 @@ def process_complete_workflow():
                 }
             else:
                 # Train model and classify
-                classification_result = ml_classifier.train_and_classify(export_path, model_type)
-            
-            return jsonify({
-                'success': True,
-                'imagery': imagery_result,
-                'export_path': export_path,
-                'classification': classification_result,
-                'type': 'classification'
-            })
-    
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({'success': False, 'error': str(e)}), 500
-
-if __name__ == '__main__':
-    port = int(os.getenv('PORT', 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
+                with job.stage('classify', 'Classifying'):
+                    # Reuses a compatible trained model (or the one named) unless retrain is requested
+                    classification_result = ml_classifier.train_and_classify(
+                        export_path, model_type, sensor=dataset_type,
+                        retrain=bool(data.get('retrain')), model_id=data.get('model_id')
+                    )
+        finally:
+            gee_handler.export_store.release(export_path)
+        
+        return {
+            'success': True,
+            'imagery': imagery_result,
+            'export_path': export_path,
+            'classification': classification_result,
+            'type': 'classification'
+        }
 
+def job_managers():
+    return {'workflows': job_manager, 'training': training_executor}
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Queue depth, wait times and job counts per executor"""
+    return jsonify({name: manager.stats() for name, manager in job_managers().items()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    for manager in job_managers().values():
+        job = manager.get(job_id)
+        if job is not None:
+            return jsonify(job.to_dict())
+    return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    for manager in job_managers().values():
+        job = manager.cancel(job_id)
+        if job is not None:
+            return jsonify(job.to_dict())
+    return jsonify({'success': False, 'error': 'Job not found'}), 404
 
 @app.route('/api/detect-water', methods=['POST'])
 def detect_water_bodies():
@@ -426,16 +531,47 @@ def download_report(filename):
 
 
 # Import Flask-SocketIO for real-time updates
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 from backend.realtime_trainer import RealtimeTrainer
-import threading
 
-# Initialize SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Initialize SocketIO on real threads, matching gunicorn's gthread workers:
+# jobs run CPU-bound labeling, fits and predictions in OS threads, which a
+# green-thread hub (eventlet) would block long enough to miss heartbeats
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+
+# Background jobs publish every update to a room named after the job ID
+job_manager = JobManager(
+    Config.JOB_WORKERS,
+    max_history=Config.JOB_HISTORY,
+    on_update=lambda job: socketio.emit('job_update', job.to_dict(), room=job.id)
+)
 
-# Store active training sessions
+# Queued or running training job per session ID
 training_sessions = {}
 
+def track_training_session(job):
+    """Point a training's session at it when queued and forget it once finished
+
+    Runs from the executor's updates, so the entry exists before the job can
+    start and is removed however it ends, including cancellation in the queue.
+    """
+    session_id = job.params.get('session_id', 'default')
+    if job.status == QUEUED:
+        training_sessions[session_id] = job.id
+    elif job.status in FINISHED and training_sessions.get(session_id) == job.id:
+        del training_sessions[session_id]
+
+# Trainings run on their own bounded executor so they cannot starve workflows
+training_executor = JobManager(
+    Config.TRAINING_WORKERS,
+    on_update=track_training_session,
+    max_history=Config.JOB_HISTORY,
+    max_queued=Config.TRAINING_QUEUE_SIZE
+)
+
+# Cap BLAS/OpenMP pools the same way joblib fits are capped per job
+threadpool_limits(Config.THREADS_PER_JOB)
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
@@ -449,7 +585,11 @@ def handle_disconnect():
 
 @app.route('/api/train-realtime', methods=['POST'])
 def train_realtime():
-    """Train model with real-time progress updates"""
+    """Train model with real-time progress updates
+
+    Trainings run on a small executor; when its queue is full the request
+    is refused with 429 rather than starting another competing fit.
+    """
     data = request.json
     image_path = data.get('image_path')
     output_path = data.get('output_path', 'exports/classified_realtime.tif')
@@ -458,44 +598,51 @@ def train_realtime():
     if not image_path or not os.path.exists(image_path):
         return jsonify({'success': False, 'error': 'Invalid image path'}), 400
     
-    def progress_callback(update):
-        """Send progress updates via WebSocket"""
-        socketio.emit('training_progress', update, room=session_id)
-    
-    def train_in_background():
-        """Train model in background thread"""
+    def train_in_background(job):
+        """Train model on a training worker"""
+        def progress_callback(update):
+            """Send progress updates via WebSocket"""
+            socketio.emit('training_progress', update, room=session_id)
+            job.report(update['progress'], update['message'])
+        
         try:
-            trainer = RealtimeTrainer(progress_callback=progress_callback)
-            result = trainer.complete_workflow(image_path, output_path)
+            with job.stage('training'), gee_handler.export_store.pinned(image_path):
+                trainer = RealtimeTrainer(progress_callback=progress_callback, registry=model_registry)
+                result = trainer.complete_workflow(image_path, output_path)
             
             socketio.emit('training_complete', {
                 'success': True,
                 'result': result
             }, room=session_id)
+            return result
             
         except Exception as e:
             socketio.emit('training_error', {
                 'success': False,
                 'error': str(e)
             }, room=session_id)
+            raise
     
-    # Start training in background
-    thread = threading.Thread(target=train_in_background)
-    thread.daemon = True
-    thread.start()
-    
-    training_sessions[session_id] = thread
+    try:
+        job = training_executor.submit('train-realtime', train_in_background, data)
+    except QueueFullError as e:
+        response = jsonify({'success': False, 'error': f'Training queue is full: {e}'})
+        response.headers['Retry-After'] = '30'
+        return response, 429
     
     return jsonify({
         'success': True,
-        'message': 'Training started',
-        'session_id': session_id
+        'message': 'Training queued' if job.status == 'queued' else 'Training started',
+        'session_id': session_id,
+        'job_id': job.id,
+        'status_url': f'/api/jobs/{job.id}'
     })
 
 @socketio.on('join_session')
 def handle_join_session(data):
-    """Join a training session to receive updates"""
+    """Join a training session (or a job ID) to receive its updates"""
     session_id = data.get('session_id', 'default')
+    join_room(session_id)
     print(f'Client {request.sid} joined session: {session_id}')
     emit('joined_session', {'session_id': session_id})
 
@@ -0,0 +1,82 @@
+"""
+Classified Map Colorization
+256-entry palette lookup tables and paletted PNG rendering
+"""
+
+import io
+import numpy as np
+from PIL import Image
+
+from config import Config
+
+# Overlay colors for our classes plus the MODIS LC_Type1 classes we display
+MAP_COLORS = dict(Config.CLASS_COLORS)
+MAP_COLORS.update({
+    11: [52, 152, 219],   # Wetlands - Blue
+    12: [243, 156, 18],   # Croplands - Orange
+    13: [231, 76, 60],    # Urban - Red
+    16: [149, 165, 166],  # Barren - Gray
+    17: [52, 152, 219],   # Water - Blue
+})
+
+
+def build_palette(color_map):
+    """256 x 3 uint8 lookup table; unmapped values stay black"""
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    for class_id, color in color_map.items():
+        palette[class_id] = color
+    return palette
+
+
+MAP_PALETTE = build_palette(MAP_COLORS)
+
+
+def _as_indices(data):
+    """Class values as uint8 palette indices (out-of-range values map to 0)"""
+    if data.dtype == np.uint8:
+        return data
+    indices = data.astype(np.uint8)
+    indices[(data < 0) | (data > 255)] = 0
+    return indices
+
+
+def colorize(data, palette=MAP_PALETTE):
+    """RGB (height, width, 3) image from a 2-D class array in one indexing pass"""
+    return palette[_as_indices(data)]
+
+
+def paletted_image(data, palette=MAP_PALETTE, transparent_index=None):
+    """'P' mode PIL image that stores one byte per pixel plus the palette"""
+    img = Image.fromarray(np.ascontiguousarray(_as_indices(data)))
+    img.putpalette(palette.ravel().tolist())
+    if transparent_index is not None:
+        img.info['transparency'] = transparent_index
+    return img
+
+
+def render_png(data, palette=MAP_PALETTE, transparent_index=None):
+    """Encode a class array as a paletted PNG and return the bytes
+
+    Class maps rarely use more than a handful of values, so the values that
+    are present are remapped onto a dense palette and packed at 1, 2 or 4
+    bits per pixel when they fit, which keeps both encoding time and size
+    down (PNG does not filter palette images, packing makes up for it).
+    """
+    indices = _as_indices(data)
+    present = np.flatnonzero(np.bincount(indices.ravel(), minlength=256))
+    if transparent_index is not None and transparent_index not in present:
+        present = np.append(present, transparent_index)
+
+    save_options = {}
+    if len(present) <= 16:
+        remap = np.zeros(256, dtype=np.uint8)
+        remap[present] = np.arange(len(present))
+        indices = remap[indices]
+        palette = palette[present]
+        if transparent_index is not None:
+            transparent_index = int(remap[transparent_index])
+        save_options['bits'] = 1 if len(present) <= 2 else 2 if len(present) <= 4 else 4
+
+    img_io = io.BytesIO()
+    paletted_image(indices, palette, transparent_index).save(img_io, 'PNG', **save_options)
+    return img_io.getvalue()
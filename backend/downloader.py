@@ -0,0 +1,155 @@
+"""
+GeoTIFF Downloader
+Streams downloads to a partial file with connect/read timeouts, HTTP Range
+resume and exponential backoff, and validates the GeoTIFF before publishing
+"""
+
+import os
+import re
+import time
+import urllib3
+import rasterio
+from rasterio.errors import RasterioIOError
+
+from config import Config
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+PART_SUFFIX = '.part'
+
+_http = urllib3.PoolManager()
+
+
+class DownloadError(Exception):
+    """Download failed permanently or produced an unreadable file"""
+
+
+class _RetryableError(Exception):
+    """Attempt failed in a way worth retrying"""
+
+
+def validate_geotiff(path):
+    """Raise DownloadError unless path opens as a raster with data"""
+    try:
+        with rasterio.open(path) as src:
+            if src.count == 0 or src.width == 0 or src.height == 0:
+                raise DownloadError(f"Downloaded raster is empty: {path}")
+            # Touch the last block so truncated files fail here
+            src.read(1, window=((src.height - 1, src.height), (src.width - 1, src.width)))
+    except RasterioIOError as e:
+        raise DownloadError(f"Downloaded file is not a readable GeoTIFF: {e}")
+
+
+def _total_size(response, offset):
+    """Full size of the resource, or None when the server does not say"""
+    content_range = response.headers.get('Content-Range', '')
+    match = re.match(r'bytes \d+-\d+/(\d+)', content_range)
+    if match:
+        return int(match.group(1))
+    length = response.headers.get('Content-Length')
+    return offset + int(length) if length is not None else None
+
+
+def download_file(url, dest_path, progress_callback=None,
+                  chunk_size=None, connect_timeout=None, read_timeout=None,
+                  max_retries=None, backoff=None, validate=validate_geotiff):
+    """Download url to dest_path, resuming and retrying as needed
+
+    Data is streamed into dest_path + '.part'; after a dropped connection
+    or timeout the next attempt asks for the remaining bytes with a Range
+    header. The file is validated and renamed to dest_path only once
+    complete. On a permanent failure, or any other exception such as a
+    cancellation raised from progress_callback, the partial file is removed.
+    progress_callback has the trainer's send_progress signature (stage,
+    progress, message, data) and receives bytes and bytes/sec at most
+    every Config.PROGRESS_INTERVAL seconds.
+    """
+    chunk_size = chunk_size or Config.DOWNLOAD_CHUNK_SIZE
+    timeout = urllib3.Timeout(
+        connect=connect_timeout or Config.DOWNLOAD_CONNECT_TIMEOUT,
+        read=read_timeout or Config.DOWNLOAD_READ_TIMEOUT
+    )
+    max_retries = Config.DOWNLOAD_MAX_RETRIES if max_retries is None else max_retries
+    backoff = Config.DOWNLOAD_BACKOFF if backoff is None else backoff
+
+    part_path = dest_path + PART_SUFFIX
+    attempt = 0
+
+    try:
+        while True:
+            try:
+                _download_attempt(url, part_path, timeout, chunk_size, progress_callback)
+                break
+            except (_RetryableError, urllib3.exceptions.HTTPError, OSError) as e:
+                attempt += 1
+                if attempt > max_retries:
+                    raise DownloadError(f"Download failed after {attempt} attempts: {e}")
+                delay = backoff * 2 ** (attempt - 1)
+                print(f"Download attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        if validate:
+            validate(part_path)
+    except BaseException:
+        # Retryable failures were handled above; nothing will resume this file
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    os.replace(part_path, dest_path)
+    return dest_path
+
+
+def _download_attempt(url, part_path, timeout, chunk_size, progress_callback):
+    """Fetch the rest of url into part_path"""
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+    response = _http.request('GET', url, headers=headers, timeout=timeout,
+                             retries=False, preload_content=False)
+    try:
+        if response.status == 416 and offset:
+            # Nothing left to fetch: the partial file is already complete
+            return
+        if response.status in RETRYABLE_STATUS:
+            raise _RetryableError(f"HTTP {response.status}")
+        if response.status not in (200, 206):
+            raise DownloadError(f"HTTP {response.status} for {url}")
+
+        if response.status == 200:
+            # Server ignored the Range header; start over
+            offset = 0
+        total = _total_size(response, offset)
+
+        received = offset
+        started = last_report = time.monotonic()
+
+        with open(part_path, 'ab' if offset else 'wb') as f:
+            # read1 hands over whatever has arrived, so bytes received before
+            # a dropped connection are kept for the resumed attempt
+            while True:
+                chunk = response.read1(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                received += len(chunk)
+
+                now = time.monotonic()
+                if progress_callback and now - last_report >= Config.PROGRESS_INTERVAL:
+                    last_report = now
+                    _report(progress_callback, received, total, (received - offset) / (now - started))
+
+        if total is not None and received < total:
+            raise _RetryableError(f"connection closed after {received} of {total} bytes")
+
+        if progress_callback:
+            elapsed = max(time.monotonic() - started, 1e-6)
+            _report(progress_callback, received, total, (received - offset) / elapsed)
+    finally:
+        response.release_conn()
+
+
+def _report(progress_callback, received, total, rate):
+    progress = int(received * 100 / total) if total else 0
+    progress_callback('downloading', progress,
+                      f'Downloaded {received / 1e6:.1f} MB at {rate / 1e6:.2f} MB/s',
+                      {'bytes': received, 'total_bytes': total, 'bytes_per_second': rate})
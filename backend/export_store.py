@@ -0,0 +1,254 @@
+"""
+Export Store
+Content-addressed store for downloaded GeoTIFF exports, keyed by a hash of
+the export request so identical requests share a single file, with an age
+limit and a byte budget enforced least recently used first. Exports pinned
+by a running job are never deleted.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+INDEX_FILENAME = 'index.json'
+SIDECAR_SUFFIXES = ('.stats.json',)  # per-file caches written next to an export
+
+
+class ExportStore:
+    def __init__(self, root_dir, max_bytes=None, max_age=None):
+        """
+        root_dir: Directory holding the exported files and the index
+        max_bytes: Total size budget; least recently used exports are
+            deleted beyond it (None for no limit)
+        max_age: Seconds after which an export is stale and downloaded
+            again (None for no limit)
+        """
+        self.root_dir = root_dir
+        self.index_path = os.path.join(root_dir, INDEX_FILENAME)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._pins = {}  # absolute path -> number of holders
+        os.makedirs(root_dir, exist_ok=True)
+        self._index = self._load_index()
+
+        with self._lock:
+            self._evict()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        """Rewrite the index atomically (lock held)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def key(spec):
+        """Hash of an export request (AOI, scale, collection, bands, date window)"""
+        payload = json.dumps(spec, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path_for(self, key, prefix):
+        return os.path.join(self.root_dir, f'{prefix}_{key[:16]}.tif')
+
+    def _expired(self, entry, now=None):
+        return self.max_age is not None and (now or time.time()) - entry['created'] > self.max_age
+
+    def pin(self, path):
+        """Keep the export at path from being deleted until a matching release(path)"""
+        with self._lock:
+            self._pin(path)
+
+    def release(self, path):
+        """Drop one pin taken with pin() or a pin=True fetch/find"""
+        with self._lock:
+            self._unpin(path)
+
+    @contextmanager
+    def pinned(self, path):
+        """Pin path for the duration of a with block"""
+        self.pin(path)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def _pin(self, path):
+        path = os.path.abspath(path)
+        self._pins[path] = self._pins.get(path, 0) + 1
+
+    def _unpin(self, path):
+        path = os.path.abspath(path)
+        if self._pins.get(path, 0) > 1:
+            self._pins[path] -= 1
+        else:
+            self._pins.pop(path, None)
+
+    def _pinned(self, entry):
+        return os.path.abspath(entry['path']) in self._pins
+
+    def lookup(self, key, prefix, pin=False):
+        """Path of a stored export for key, or None
+
+        pin: Pin the export that is found (see pin)
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry and self._expired(entry):
+                # A pinned file stays for its holder; a new download replaces it
+                if not self._pinned(entry):
+                    self._remove(key)
+                    self._save_index()
+                return None
+            if entry:
+                entry['used'] = time.time()
+            path = entry['path'] if entry else self.path_for(key, prefix)
+            if pin:
+                self._pin(path)
+
+        if os.path.exists(path):
+            return path
+
+        with self._lock:
+            if pin:
+                self._unpin(path)
+            if entry:
+                # File was removed behind our back; forget it
+                self._index.pop(key, None)
+                self._save_index()
+        return None
+
+    def find(self, match, pin=False):
+        """Path of a stored export whose spec satisfies match(spec), or None
+
+        pin: Pin the export that is found (see pin)
+        """
+        with self._lock:
+            entries = list(self._index.values())
+
+        for entry in entries:
+            if not match(entry['spec']) or self._expired(entry):
+                continue
+            if pin:
+                self.pin(entry['path'])
+            # Checked after pinning, so a file still here stays until released
+            if os.path.exists(entry['path']):
+                return entry['path']
+            if pin:
+                self.release(entry['path'])
+        return None
+
+    def fetch(self, spec, download, prefix='export', pin=False):
+        """Path of the export for spec, calling download(path) only on a miss
+
+        download writes the file to the path it is given; that path is a
+        temporary file which is renamed into place once download returns,
+        so readers never see a partial export and concurrent identical
+        requests in this process wait for a single download.
+        pin: Pin the returned export, so eviction cannot delete it while the
+            caller uses it; the caller must release(path) when done.
+        """
+        key = self.key(spec)
+
+        path = self.lookup(key, prefix, pin)
+        if path:
+            print(f"Reusing export {path}")
+            return path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                path = self.lookup(key, prefix, pin)
+                if path:
+                    return path
+
+                path = self.path_for(key, prefix)
+                fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix='.tmp')
+                os.close(fd)
+                try:
+                    download(tmp_path)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+                with self._lock:
+                    now = time.time()
+                    self._index[key] = {
+                        'path': path,
+                        'spec': spec,
+                        'size': os.path.getsize(path),
+                        'created': now,
+                        'used': now
+                    }
+                    if pin:
+                        self._pin(path)
+                    self._evict(keep=key)
+                    self._save_index()
+        finally:
+            # Failed downloads must not leave their lock behind either
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+        return path
+
+    def _remove(self, key):
+        """Forget an export and delete its file and sidecars (lock held)"""
+        entry = self._index.pop(key)
+        for path in (entry['path'],) + tuple(entry['path'] + suffix for suffix in SIDECAR_SUFFIXES):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self, keep=None):
+        """Delete stale exports, then least recently used ones beyond max_bytes (lock held)
+
+        keep: Key of an export that must survive, such as the one just fetched
+        Pinned exports are skipped, so the store can stay over max_bytes
+        until their jobs release them.
+        """
+        now = time.time()
+        removed = [key for key, entry in self._index.items()
+                   if key != keep and not self._pinned(entry) and self._expired(entry, now)]
+        for key in removed:
+            self._remove(key)
+
+        if self.max_bytes is not None:
+            total = sum(entry['size'] for entry in self._index.values())
+            by_use = sorted(self._index.items(), key=lambda item: item[1].get('used', item[1]['created']))
+            for key, entry in by_use:
+                if total <= self.max_bytes:
+                    break
+                if key != keep and not self._pinned(entry):
+                    total -= entry['size']
+                    self._remove(key)
+                    removed.append(key)
+
+        if removed:
+            self._save_index()
+
+    def stats(self):
+        """Stored exports and their total size"""
+        with self._lock:
+            return {
+                'entries': len(self._index),
+                'bytes': sum(entry['size'] for entry in self._index.values()),
+                'max_bytes': self.max_bytes,
+                'max_age': self.max_age,
+                'pinned': len(self._pins)
+            }
@@ -0,0 +1,46 @@
+"""
+Feature Encoding
+Quantizes pixel values into 256 bins per band from the cached per-band
+statistics, giving the compact uint8 feature matrix that pixel
+classifiers are trained on and predict from
+"""
+
+import numpy as np
+
+UINT8_ENCODING = 'uint8'
+RAW_ENCODING = 'raw'
+
+
+def quantize_bands(X, stats, block_size=1_000_000):
+    """Encode (n_pixels, bands) as a C-contiguous uint8 matrix
+
+    Each band's [min, max] from stats is split into 256 equal bins; values
+    outside it (pixels of another scene) fall into the first or last bin.
+    Blocks of block_size pixels are converted at a time, so no float copy
+    of the whole matrix is made.
+    """
+    band_min = np.asarray(stats['min'], dtype=np.float32)
+    band_max = np.asarray(stats['max'], dtype=np.float32)
+    scale = np.float32(256) / np.maximum(band_max - band_min, np.float32(1e-8))
+
+    features = np.empty(X.shape, dtype=np.uint8)
+    for start in range(0, X.shape[0], block_size):
+        block = np.subtract(X[start:start + block_size], band_min, dtype=np.float32)
+        block *= scale
+        np.clip(block, 0, 255, out=block)
+        features[start:start + block_size] = block  # truncates to the bin index
+    return features
+
+
+def encode_features(X, encoding_stats):
+    """X as a model expects it: quantized with encoding_stats, or unchanged if None"""
+    if encoding_stats is None:
+        return X
+    return quantize_bands(X, encoding_stats)
+
+
+def model_encoding_stats(metadata):
+    """Band stats a registered model's features were quantized with, or None for raw models"""
+    if metadata.get('feature_encoding') == UINT8_ENCODING:
+        return metadata['band_stats']
+    return None
@@ -1,12 +1,36 @@
 import ee
 import os
 from geopy.geocoders import Nominatim
-from backend.utils import generate_filename
+from backend.utils import rectangle_area_sqkm
+from backend.imagery_backend import ImageryBackend
+from backend.result_cache import ResultCache, SQLiteStore, cached_analysis, normalize_bounds
+from backend.export_store import ExportStore
+from backend.downloader import download_file, DownloadError
+from backend.tiled_export import plan_grid, tile_request, download_tiled
+from backend.raster_analytics import analyze_raster
+from config import Config
 
-class GEEHandler:
+# Sentinel-2 composite recipe: collection, cloud filter and how many of the
+# clearest images go into the median. Exports and index analyses share it, so
+# a scene exported for classification at ANALYSIS_SCALE holds the very pixels
+# the analyses reduce and can answer them locally.
+SENTINEL_COMPOSITE = {'collection': 'COPERNICUS/S2_SR_HARMONIZED', 'max_cloud': 20, 'limit': 30}
+# Red, Green, Blue, NIR for classification, and SWIR for the moisture indices
+EXPORT_BANDS = ['B4', 'B3', 'B2', 'B8', 'B11']
+ANALYSIS_SCALE = 10
+
+class GEEHandler(ImageryBackend):
     def __init__(self):
         """Initialize Google Earth Engine - REQUIRED for this application"""
         self.initialized = False
+        self.result_cache = ResultCache(
+            SQLiteStore(Config.GEE_RESULT_CACHE_PATH, Config.GEE_RESULT_CACHE_DISK_ENTRIES),
+            max_entries=Config.GEE_RESULT_CACHE_MEMORY_ENTRIES,
+            ttl=Config.GEE_RESULT_CACHE_TTL,
+            bounds_tolerance=Config.GEE_BOUNDS_TOLERANCE
+        )
+        self.export_store = ExportStore(Config.EXPORTS_DIR, Config.EXPORT_STORE_BYTES,
+                                        Config.EXPORT_STORE_MAX_AGE)
         
         # Setup credentials from environment variable if available
         gee_creds = os.getenv('GEE_CREDENTIALS')
@@ -69,6 +93,7 @@ class GEEHandler:
         else:
             raise ValueError(f"Location '{location_name}' not found")
     
+    @cached_analysis('imagery', ttl=Config.GEE_DOWNLOAD_URL_TTL)
     def fetch_satellite_data(self, bounds, start_date, end_date, dataset_type='sentinel'):
         """Fetch satellite imagery from Google Earth Engine
         
@@ -189,30 +214,104 @@ class GEEHandler:
                 'image_count': count
             }
     
-    def export_to_tif(self, image_id, bounds, dataset_type='sentinel'):
-        """Export image to .tif file with size limits"""
-        aoi = ee.Geometry.Rectangle([
-            bounds['west'], bounds['south'],
-            bounds['east'], bounds['north']
-        ])
+    def export_to_tif(self, image_id, bounds, dataset_type='sentinel', progress_callback=None,
+                      start_date=None, end_date=None, pin=False):
+        """Export image to .tif file with size limits
+        
+        Exports are content-addressed: a request with the same AOI, scale,
+        composite recipe, bands and date window as an earlier one reuses its
+        file instead of downloading the scene again. The Sentinel-2 composite
+        (SENTINEL_COMPOSITE, EXPORT_BANDS) covers start_date to end_date, by
+        default the last 6 months.
+        progress_callback receives download progress with the trainer's
+        send_progress signature. With pin, the export is kept from eviction
+        until export_store.release(path).
+        """
+        bounds = normalize_bounds(bounds, Config.GEE_BOUNDS_TOLERANCE)
         
-        # Calculate appropriate scale based on area size
-        area = aoi.area().getInfo() / 1000000  # km²
+        if dataset_type == 'modis':
+            from datetime import datetime
+            spec = {
+                'bounds': bounds,
+                'collection': 'MODIS/061/MCD12Q1',
+                'bands': ['LC_Type1'],
+                'scale': 500,
+                # Newest annual product as of this year; a new year looks again
+                'dates': ['latest', str(datetime.now().year)]
+            }
+            prefix = 'modis_landcover'
+        else:
+            area = rectangle_area_sqkm(bounds)
+            if Config.EXPORT_TILED:
+                # Full resolution while the scene fits EXPORT_MAX_PIXELS; the tile
+                # grid keeps each request under Earth Engine's size limit
+                scale = self._export_scale(area, Config.EXPORT_MAX_PIXELS)
+            else:
+                # Calculate appropriate scale based on area size
+                scale = self._export_scale(area)
+            print(f"Area: {area:.2f} km², Using scale: {scale}m")
+            
+            if start_date is None or end_date is None:
+                # Limit to recent 6 months
+                from datetime import datetime, timedelta
+                now = datetime.now()
+                start_date = (now - timedelta(days=180)).strftime('%Y-%m-%d')
+                end_date = now.strftime('%Y-%m-%d')
+            
+            spec = dict(SENTINEL_COMPOSITE, **{
+                'bounds': bounds,
+                'bands': EXPORT_BANDS,
+                'scale': scale,
+                'dates': [start_date, end_date],
+                'tiled': Config.EXPORT_TILED
+            })
+            prefix = 'satellite_image'
         
+        return self.export_store.fetch(spec, lambda path: self._download_export(spec, path, progress_callback),
+                                       prefix, pin)
+    
+    def _export_scale(self, area, max_pixels=30000 ** 2):
+        """Coarsest-needed scale (m) keeping an area (km²) under max_pixels"""
         # Calculate dimensions at different scales to stay under 32768 pixel limit
         # Max pixels = 32768 x 32768 = 1,073,741,824 pixels
         # Safe limit = 30000 x 30000 = 900,000,000 pixels
         
-        if dataset_type == 'modis':
-            scale = 500
-            collection = ee.ImageCollection('MODIS/061/MCD12Q1') \
+        # Calculate side length (assuming square for simplicity)
+        side_length = ((area * 1000000) ** 0.5)
+        
+        # Calculate minimum scale needed
+        # pixels = side_length / scale
+        # We want pixels < sqrt(max_pixels) a side
+        min_scale = side_length / max_pixels ** 0.5
+        
+        # Choose appropriate scale
+        if min_scale > 500:
+            return 1000  # Very large area
+        elif min_scale > 100:
+            return 500   # Large area
+        elif min_scale > 50:
+            return 100   # Medium-large area
+        elif min_scale > 20:
+            return 50    # Medium area
+        elif min_scale > 10:
+            return 30    # Small-medium area
+        return 10        # Small area
+    
+    def _download_export(self, spec, export_path, progress_callback=None):
+        """Build the image described by an export spec and download it to export_path"""
+        bounds = spec['bounds']
+        aoi = ee.Geometry.Rectangle([
+            bounds['west'], bounds['south'],
+            bounds['east'], bounds['north']
+        ])
+        scale = spec['scale']
+        
+        if spec['collection'] == 'MODIS/061/MCD12Q1':
+            collection = ee.ImageCollection(spec['collection']) \
                 .filterBounds(aoi)
             
             image = collection.sort('system:time_start', False).first()
-            landcover = image.select('LC_Type1').clip(aoi)
-            
-            filename = generate_filename('modis_landcover', 'tif')
-            export_path = os.path.join('exports', filename)
+            landcover = image.select(spec['bands']).clip(aoi)
             
             url = landcover.getDownloadURL({
                 'scale': scale,
@@ -221,69 +320,29 @@ class GEEHandler:
                 'crs': 'EPSG:4326'
             })
         else:
-            # Calculate required scale to stay under pixel limit
-            # Area in square meters
-            area_m2 = area * 1000000
-            
-            # Calculate side length (assuming square for simplicity)
-            side_length = (area_m2 ** 0.5)
-            
-            # Calculate minimum scale needed
-            # pixels = side_length / scale
-            # We want pixels < 30000
-            min_scale = side_length / 30000
-            
-            # Choose appropriate scale
-            if min_scale > 500:
-                scale = 1000  # Very large area
-            elif min_scale > 100:
-                scale = 500   # Large area
-            elif min_scale > 50:
-                scale = 100   # Medium-large area
-            elif min_scale > 20:
-                scale = 50    # Medium area
-            elif min_scale > 10:
-                scale = 30    # Small-medium area
-            else:
-                scale = 10    # Small area
-            
-            print(f"Area: {area:.2f} km², Using scale: {scale}m")
+            start_date, end_date = spec['dates']
             
             try:
-                # Limit to recent 6 months and best 30 images
-                from datetime import datetime, timedelta
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=180)
-                
-                collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED') \
-                    .filterBounds(aoi) \
-                    .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')) \
-                    .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)) \
-                    .sort('CLOUDY_PIXEL_PERCENTAGE') \
-                    .limit(30)
+                collection = self._sentinel_collection(aoi, start_date, end_date, spec)
                 
                 # Check if collection has images
                 count = collection.size().getInfo()
-                print(f"Found {count} Sentinel-2 images (limited to 30 best)")
+                print(f"Found {count} Sentinel-2 images (limit: {spec.get('limit') or 'none'})")
                 
                 if count == 0:
                     raise Exception("No Sentinel-2 images found for this area")
                 
                 image = collection.median().clip(aoi)
                 
-                # Select available bands (B2=Blue, B3=Green, B4=Red, B8=NIR)
-                image = image.select(['B4', 'B3', 'B2', 'B8'])
+                # Select available bands (B2=Blue, B3=Green, B4=Red, B8=NIR, B11=SWIR)
+                image = image.select(spec['bands'])
                 
             except Exception as e:
                 print(f"Sentinel-2 error: {e}")
                 # Fallback to older collection with limit
-                from datetime import datetime, timedelta
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=180)
-                
                 collection = ee.ImageCollection('COPERNICUS/S2_SR') \
                     .filterBounds(aoi) \
-                    .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')) \
+                    .filterDate(start_date, end_date) \
                     .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 30)) \
                     .sort('CLOUDY_PIXEL_PERCENTAGE') \
                     .limit(30)
@@ -295,10 +354,11 @@ class GEEHandler:
                     raise Exception("No satellite images available for this area")
                 
                 image = collection.median().clip(aoi)
-                image = image.select(['B4', 'B3', 'B2', 'B8'])
+                image = image.select(spec['bands'])
             
-            filename = generate_filename('satellite_image', 'tif')
-            export_path = os.path.join('exports', filename)
+            if spec.get('tiled'):
+                self._download_tiled(image, spec, export_path, progress_callback)
+                return
             
             try:
                 url = image.getDownloadURL({
@@ -322,16 +382,80 @@ class GEEHandler:
                 })
         
         # Download file
-        import urllib.request
         try:
             print(f"Downloading from GEE...")
-            urllib.request.urlretrieve(url, export_path)
+            download_file(url, export_path, progress_callback)
             print(f"Download complete: {export_path}")
-        except Exception as e:
+        except DownloadError as e:
+            print(f"Download failed: {e}")
+            raise Exception(f"Failed to download satellite image: {str(e)}")
+    
+    def _download_tiled(self, image, spec, export_path, progress_callback=None):
+        """Download image over the spec's AOI as a grid of tiles mosaicked into export_path"""
+        transform, width, height, windows = plan_grid(
+            spec['bounds'], spec['scale'], Config.EXPORT_TILE_PIXELS
+        )
+        print(f"Exporting {width}x{height} px at {spec['scale']}m as {len(windows)} tiles")
+        
+        def tile_url(window):
+            params = tile_request(transform, window)
+            params.update({'format': 'GEO_TIFF', 'filePerBand': False})
+            return image.getDownloadURL(params)
+        
+        try:
+            download_tiled(tile_url, export_path, transform, width, height, windows,
+                           Config.EXPORT_WORKERS, progress_callback)
+            print(f"Download complete: {export_path}")
+        except DownloadError as e:
             print(f"Download failed: {e}")
             raise Exception(f"Failed to download satellite image: {str(e)}")
+    
+    def _sentinel_collection(self, aoi, start_date, end_date, recipe):
+        """Sentinel-2 images over aoi and dates selected by a composite recipe"""
+        collection = ee.ImageCollection(recipe['collection']) \
+            .filterBounds(aoi) \
+            .filterDate(start_date, end_date) \
+            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', recipe['max_cloud']))
         
-        return export_path
+        if recipe.get('limit'):
+            # Clearest images first
+            collection = collection.sort('CLOUDY_PIXEL_PERCENTAGE').limit(recipe['limit'])
+        return collection
+    
+    def _analysis_image(self, aoi, start_date, end_date):
+        """Median composite the index analyses reduce over"""
+        return self._sentinel_collection(aoi, start_date, end_date, SENTINEL_COMPOSITE).median().clip(aoi)
+    
+    def _local_statistics(self, bounds, start_date, end_date, indices=(), masks=None):
+        """Answer a reduction from a stored export of the same composite, if any
+        
+        An export matches when it covers the same AOI and dates and was built
+        with SENTINEL_COMPOSITE at ANALYSIS_SCALE, as export_to_tif builds
+        scenes for classification, so its pixels are the ones Earth Engine
+        would reduce. Returns analyze_raster's Earth Engine style dictionary,
+        or None when no export matches or the matching export lacks a needed
+        band.
+        """
+        bounds = normalize_bounds(bounds, Config.GEE_BOUNDS_TOLERANCE)
+        
+        path = self.export_store.find(lambda spec: (
+            spec.get('bounds') == bounds and spec.get('dates') == [start_date, end_date] and
+            spec.get('scale') == ANALYSIS_SCALE and
+            all(spec.get(key, '') == value for key, value in SENTINEL_COMPOSITE.items())
+        ), pin=True)
+        if path is None:
+            return None
+        
+        try:
+            stats = analyze_raster(path, indices, masks)
+        except ValueError as e:
+            print(f"Local statistics unavailable: {e}")
+            return None
+        finally:
+            self.export_store.release(path)
+        
+        print(f"Answered from local export {path}")
+        return stats
     
     def calculate_ndvi(self, image):
         """Calculate NDVI (Normalized Difference Vegetation Index)"""
@@ -347,6 +471,7 @@ class GEEHandler:
         ndwi = green.subtract(nir).divide(green.add(nir)).rename('NDWI')
         return ndwi
 
+    @cached_analysis('modis_landcover')
     def get_modis_landcover(self, bounds, year='2022'):
         """Get MODIS Land Cover data for specific year
         
@@ -425,21 +550,21 @@ class GEEHandler:
             ]
         }
 
+    @cached_analysis('water')
     def detect_water_bodies(self, bounds, start_date, end_date):
         """Detect water bodies using NDWI (Normalized Difference Water Index)"""
+        water_area = self._local_statistics(bounds, start_date, end_date,
+                                            masks={'NDWI': ('NDWI', 0.3)})
+        if water_area is not None:
+            return self._water_result(water_area)
+        
         aoi = ee.Geometry.Rectangle([
             bounds['west'], bounds['south'],
             bounds['east'], bounds['north']
         ])
         
-        # Fetch Sentinel-2 imagery
-        collection = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterBounds(aoi) \
-            .filterDate(start_date, end_date) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-        
-        # Get median composite
-        image = collection.median().clip(aoi)
+        # Median Sentinel-2 composite
+        image = self._analysis_image(aoi, start_date, end_date)
         
         # Calculate NDWI (Green - NIR) / (Green + NIR)
         green = image.select('B3')
@@ -449,37 +574,30 @@ class GEEHandler:
         # Threshold for water (NDWI > 0.3)
         water_mask = ndwi.gt(0.3)
         
-        # Calculate water area
+        # Calculate water area (one round-trip)
         water_area = water_mask.multiply(ee.Image.pixelArea()).reduceRegion(
             reducer=ee.Reducer.sum(),
             geometry=aoi,
-            scale=10,
+            scale=ANALYSIS_SCALE,
             maxPixels=1e9
-        )
+        ).getInfo()
         
-        return {
-            'ndwi_image': ndwi,
-            'water_mask': water_mask,
-            'water_area_sqm': water_area.getInfo().get('NDWI', 0),
-            'water_area_sqkm': water_area.getInfo().get('NDWI', 0) / 1000000,
-            'threshold': 0.3
-        }
+        return dict(self._water_result(water_area), ndwi_image=ndwi, water_mask=water_mask)
     
+    @cached_analysis('ndvi')
     def calculate_ndvi_analysis(self, bounds, start_date, end_date):
         """Calculate NDVI for vegetation health analysis"""
+        stats_info = self._local_statistics(bounds, start_date, end_date, indices=['NDVI'])
+        if stats_info is not None:
+            return self._ndvi_result(stats_info)
+        
         aoi = ee.Geometry.Rectangle([
             bounds['west'], bounds['south'],
             bounds['east'], bounds['north']
         ])
         
-        # Fetch Sentinel-2 imagery
-        collection = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterBounds(aoi) \
-            .filterDate(start_date, end_date) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-        
-        # Get median composite
-        image = collection.median().clip(aoi)
+        # Median Sentinel-2 composite
+        image = self._analysis_image(aoi, start_date, end_date)
         
         # Calculate NDVI (NIR - Red) / (NIR + Red)
         nir = image.select('B8')
@@ -494,38 +612,33 @@ class GEEHandler:
                 ee.Reducer.stdDev(), '', True
             ),
             geometry=aoi,
-            scale=10,
+            scale=ANALYSIS_SCALE,
             maxPixels=1e9
         )
         
         stats_info = stats.getInfo()
         
-        # Classify vegetation health
-        # NDVI < 0.2: Barren/Urban
-        # 0.2 - 0.4: Sparse vegetation
-        # 0.4 - 0.6: Moderate vegetation
-        # > 0.6: Dense vegetation
-        
-        return {
-            'ndvi_image': ndvi,
-            'mean_ndvi': stats_info.get('NDVI_mean', 0),
-            'min_ndvi': stats_info.get('NDVI_min', 0),
-            'max_ndvi': stats_info.get('NDVI_max', 0),
-            'std_ndvi': stats_info.get('NDVI_stdDev', 0),
-            'vegetation_health': self._classify_vegetation_health(stats_info.get('NDVI_mean', 0))
-        }
+        return dict(self._ndvi_result(stats_info), ndvi_image=ndvi)
     
-    def _classify_vegetation_health(self, mean_ndvi):
-        """Classify vegetation health based on NDVI"""
-        if mean_ndvi < 0.2:
-            return 'Poor (Barren/Urban)'
-        elif mean_ndvi < 0.4:
-            return 'Fair (Sparse Vegetation)'
-        elif mean_ndvi < 0.6:
-            return 'Good (Moderate Vegetation)'
-        else:
-            return 'Excellent (Dense Vegetation)'
+    def _sum_areas(self, masks, aoi, scale=ANALYSIS_SCALE):
+        """Area in m² of each named mask, from one stacked reduction
+        
+        The masks are stacked into a single multi-band image and reduced
+        together, so the whole dictionary comes back in one getInfo()
+        round-trip instead of one per mask.
+        """
+        stacked = ee.Image.cat([mask.rename(name) for name, mask in masks.items()])
+        
+        areas = stacked.multiply(ee.Image.pixelArea()).reduceRegion(
+            reducer=ee.Reducer.sum(),
+            geometry=aoi,
+            scale=scale,
+            maxPixels=1e9
+        )
+        
+        return areas.getInfo()
     
+    @cached_analysis('urban_sprawl')
     def detect_urban_sprawl(self, bounds, start_date_old, end_date_old, start_date_new, end_date_new):
         """Detect urban sprawl by comparing two time periods"""
         aoi = ee.Geometry.Rectangle([
@@ -534,20 +647,10 @@ class GEEHandler:
         ])
         
         # Get old period data
-        old_collection = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterBounds(aoi) \
-            .filterDate(start_date_old, end_date_old) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-        
-        old_image = old_collection.median().clip(aoi)
+        old_image = self._analysis_image(aoi, start_date_old, end_date_old)
         
         # Get new period data
-        new_collection = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterBounds(aoi) \
-            .filterDate(start_date_new, end_date_new) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-        
-        new_image = new_collection.median().clip(aoi)
+        new_image = self._analysis_image(aoi, start_date_new, end_date_new)
         
         # Calculate NDVI for both periods
         old_ndvi = self.calculate_ndvi(old_image.select(['B8', 'B4']))
@@ -568,31 +671,16 @@ class GEEHandler:
         # Calculate urban sprawl (new urban - old urban)
         urban_growth = new_urban.subtract(old_urban).gt(0)
         
-        # Calculate areas
-        old_urban_area = old_urban.multiply(ee.Image.pixelArea()).reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=aoi,
-            scale=10,
-            maxPixels=1e9
-        )
-        
-        new_urban_area = new_urban.multiply(ee.Image.pixelArea()).reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=aoi,
-            scale=10,
-            maxPixels=1e9
-        )
+        # Calculate all areas with a single reduction and round-trip
+        areas = self._sum_areas({
+            'old_urban': old_urban,
+            'new_urban': new_urban,
+            'urban_growth': urban_growth
+        }, aoi)
         
-        growth_area = urban_growth.multiply(ee.Image.pixelArea()).reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=aoi,
-            scale=10,
-            maxPixels=1e9
-        )
-        
-        old_area_sqkm = old_urban_area.getInfo().get('NDBI', 0) / 1000000
-        new_area_sqkm = new_urban_area.getInfo().get('NDBI', 0) / 1000000
-        growth_sqkm = growth_area.getInfo().get('NDBI', 0) / 1000000
+        old_area_sqkm = areas.get('old_urban', 0) / 1000000
+        new_area_sqkm = areas.get('new_urban', 0) / 1000000
+        growth_sqkm = areas.get('urban_growth', 0) / 1000000
         
         return {
             'old_urban_area_sqkm': old_area_sqkm,
@@ -604,6 +692,7 @@ class GEEHandler:
             'urban_growth_mask': urban_growth
         }
     
+    @cached_analysis('forest_change')
     def detect_forest_change(self, bounds, start_date_old, end_date_old, start_date_new, end_date_new):
         """Detect forest cover change between two time periods"""
         aoi = ee.Geometry.Rectangle([
@@ -612,20 +701,10 @@ class GEEHandler:
         ])
         
         # Get old period data
-        old_collection = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterBounds(aoi) \
-            .filterDate(start_date_old, end_date_old) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-        
-        old_image = old_collection.median().clip(aoi)
+        old_image = self._analysis_image(aoi, start_date_old, end_date_old)
         
         # Get new period data
-        new_collection = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterBounds(aoi) \
-            .filterDate(start_date_new, end_date_new) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-        
-        new_image = new_collection.median().clip(aoi)
+        new_image = self._analysis_image(aoi, start_date_new, end_date_new)
         
         # Calculate NDVI for both periods
         old_ndvi = self.calculate_ndvi(old_image.select(['B8', 'B4']))
@@ -639,39 +718,18 @@ class GEEHandler:
         forest_loss = old_forest.And(new_forest.Not())
         forest_gain = old_forest.Not().And(new_forest)
         
-        # Calculate areas
-        old_forest_area = old_forest.multiply(ee.Image.pixelArea()).reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=aoi,
-            scale=10,
-            maxPixels=1e9
-        )
-        
-        new_forest_area = new_forest.multiply(ee.Image.pixelArea()).reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=aoi,
-            scale=10,
-            maxPixels=1e9
-        )
-        
-        loss_area = forest_loss.multiply(ee.Image.pixelArea()).reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=aoi,
-            scale=10,
-            maxPixels=1e9
-        )
-        
-        gain_area = forest_gain.multiply(ee.Image.pixelArea()).reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=aoi,
-            scale=10,
-            maxPixels=1e9
-        )
+        # Calculate all areas with a single reduction and round-trip
+        areas = self._sum_areas({
+            'old_forest': old_forest,
+            'new_forest': new_forest,
+            'forest_loss': forest_loss,
+            'forest_gain': forest_gain
+        }, aoi)
         
-        old_area_sqkm = old_forest_area.getInfo().get('NDVI', 0) / 1000000
-        new_area_sqkm = new_forest_area.getInfo().get('NDVI', 0) / 1000000
-        loss_sqkm = loss_area.getInfo().get('NDVI', 0) / 1000000
-        gain_sqkm = gain_area.getInfo().get('NDVI', 0) / 1000000
+        old_area_sqkm = areas.get('old_forest', 0) / 1000000
+        new_area_sqkm = areas.get('new_forest', 0) / 1000000
+        loss_sqkm = areas.get('forest_loss', 0) / 1000000
+        gain_sqkm = areas.get('forest_gain', 0) / 1000000
         
         net_change = new_area_sqkm - old_area_sqkm
         
@@ -688,21 +746,20 @@ class GEEHandler:
             'forest_gain_mask': forest_gain
         }
     
+    @cached_analysis('soil_moisture')
     def calculate_soil_moisture(self, bounds, start_date, end_date):
         """Estimate soil moisture using optical indices"""
+        stats_info = self._local_statistics(bounds, start_date, end_date, indices=['NDMI', 'MSI'])
+        if stats_info is not None:
+            return self._moisture_result(stats_info)
+        
         aoi = ee.Geometry.Rectangle([
             bounds['west'], bounds['south'],
             bounds['east'], bounds['north']
         ])
         
-        # Fetch Sentinel-2 imagery
-        collection = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterBounds(aoi) \
-            .filterDate(start_date, end_date) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-        
-        # Get median composite
-        image = collection.median().clip(aoi)
+        # Median Sentinel-2 composite
+        image = self._analysis_image(aoi, start_date, end_date)
         
         # Calculate NDMI (Normalized Difference Moisture Index)
         # NDMI = (NIR - SWIR) / (NIR + SWIR)
@@ -714,46 +771,12 @@ class GEEHandler:
         # MSI = SWIR / NIR (lower values = more moisture)
         msi = swir.divide(nir).rename('MSI')
         
-        # Get statistics
-        ndmi_stats = ndmi.reduceRegion(
-            reducer=ee.Reducer.mean().combine(ee.Reducer.minMax(), '', True),
-            geometry=aoi,
-            scale=10,
-            maxPixels=1e9
-        )
-        
-        msi_stats = msi.reduceRegion(
+        # Get statistics for both indices in one reduction and round-trip
+        stats_info = ee.Image.cat([ndmi, msi]).reduceRegion(
             reducer=ee.Reducer.mean().combine(ee.Reducer.minMax(), '', True),
             geometry=aoi,
-            scale=10,
+            scale=ANALYSIS_SCALE,
             maxPixels=1e9
-        )
-        
-        ndmi_info = ndmi_stats.getInfo()
-        msi_info = msi_stats.getInfo()
-        
-        mean_ndmi = ndmi_info.get('NDMI_mean', 0)
-        mean_msi = msi_info.get('MSI_mean', 0)
+        ).getInfo()
         
-        return {
-            'ndmi_image': ndmi,
-            'msi_image': msi,
-            'mean_ndmi': mean_ndmi,
-            'min_ndmi': ndmi_info.get('NDMI_min', 0),
-            'max_ndmi': ndmi_info.get('NDMI_max', 0),
-            'mean_msi': mean_msi,
-            'min_msi': msi_info.get('MSI_min', 0),
-            'max_msi': msi_info.get('MSI_max', 0),
-            'moisture_status': self._classify_moisture(mean_ndmi, mean_msi)
-        }
-    
-    def _classify_moisture(self, ndmi, msi):
-        """Classify soil moisture status"""
-        if ndmi > 0.4 or msi < 0.5:
-            return 'High Moisture'
-        elif ndmi > 0.2 or msi < 0.8:
-            return 'Moderate Moisture'
-        elif ndmi > 0 or msi < 1.2:
-            return 'Low Moisture'
-        else:
-            return 'Very Dry'
+        return dict(self._moisture_result(stats_info), ndmi_image=ndmi, msi_image=msi)
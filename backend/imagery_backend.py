@@ -0,0 +1,136 @@
+"""
+Imagery Backends
+Interface shared by the Earth Engine handler and the offline stand-in,
+and the factory that picks one from Config.IMAGERY_BACKEND
+"""
+
+from abc import ABC, abstractmethod
+
+from config import Config
+
+
+class ImageryBackend(ABC):
+    """Source of imagery, exports and index analyses for the API
+
+    Every method takes AOI bounds as a dict with north, south, east and
+    west in degrees and returns JSON-serializable results with the same
+    keys whichever backend answers. A backend missing any of them fails
+    when it is instantiated.
+    """
+
+    # ResultCache consulted by @cached_analysis methods, if any
+    result_cache = None
+
+    @abstractmethod
+    def search_location(self, location_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_satellite_data(self, bounds, start_date, end_date, dataset_type='sentinel'):
+        raise NotImplementedError
+
+    @abstractmethod
+    def export_to_tif(self, image_id, bounds, dataset_type='sentinel', progress_callback=None,
+                      start_date=None, end_date=None, pin=False):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_modis_landcover(self, bounds, year='2022'):
+        raise NotImplementedError
+
+    @abstractmethod
+    def detect_water_bodies(self, bounds, start_date, end_date):
+        raise NotImplementedError
+
+    @abstractmethod
+    def calculate_ndvi_analysis(self, bounds, start_date, end_date):
+        raise NotImplementedError
+
+    @abstractmethod
+    def detect_urban_sprawl(self, bounds, start_date_old, end_date_old, start_date_new, end_date_new):
+        raise NotImplementedError
+
+    @abstractmethod
+    def detect_forest_change(self, bounds, start_date_old, end_date_old, start_date_new, end_date_new):
+        raise NotImplementedError
+
+    @abstractmethod
+    def calculate_soil_moisture(self, bounds, start_date, end_date):
+        raise NotImplementedError
+
+    def _water_result(self, water_area):
+        """Water analysis result from the NDWI pixel-area sum"""
+        water_area_sqm = water_area.get('NDWI', 0)
+
+        return {
+            'water_area_sqm': water_area_sqm,
+            'water_area_sqkm': water_area_sqm / 1000000,
+            'threshold': 0.3
+        }
+
+    def _ndvi_result(self, stats_info):
+        """NDVI analysis result from the NDVI statistics"""
+        # Classify vegetation health
+        # NDVI < 0.2: Barren/Urban
+        # 0.2 - 0.4: Sparse vegetation
+        # 0.4 - 0.6: Moderate vegetation
+        # > 0.6: Dense vegetation
+
+        return {
+            'mean_ndvi': stats_info.get('NDVI_mean', 0),
+            'min_ndvi': stats_info.get('NDVI_min', 0),
+            'max_ndvi': stats_info.get('NDVI_max', 0),
+            'std_ndvi': stats_info.get('NDVI_stdDev', 0),
+            'vegetation_health': self._classify_vegetation_health(stats_info.get('NDVI_mean', 0))
+        }
+
+    def _moisture_result(self, stats_info):
+        """Soil moisture result from the NDMI and MSI statistics"""
+        mean_ndmi = stats_info.get('NDMI_mean', 0)
+        mean_msi = stats_info.get('MSI_mean', 0)
+
+        return {
+            'mean_ndmi': mean_ndmi,
+            'min_ndmi': stats_info.get('NDMI_min', 0),
+            'max_ndmi': stats_info.get('NDMI_max', 0),
+            'mean_msi': mean_msi,
+            'min_msi': stats_info.get('MSI_min', 0),
+            'max_msi': stats_info.get('MSI_max', 0),
+            'moisture_status': self._classify_moisture(mean_ndmi, mean_msi)
+        }
+
+    def _classify_vegetation_health(self, mean_ndvi):
+        """Classify vegetation health based on NDVI"""
+        if mean_ndvi < 0.2:
+            return 'Poor (Barren/Urban)'
+        elif mean_ndvi < 0.4:
+            return 'Fair (Sparse Vegetation)'
+        elif mean_ndvi < 0.6:
+            return 'Good (Moderate Vegetation)'
+        else:
+            return 'Excellent (Dense Vegetation)'
+
+    def _classify_moisture(self, ndmi, msi):
+        """Classify soil moisture status"""
+        if ndmi > 0.4 or msi < 0.5:
+            return 'High Moisture'
+        elif ndmi > 0.2 or msi < 0.8:
+            return 'Moderate Moisture'
+        elif ndmi > 0 or msi < 1.2:
+            return 'Low Moisture'
+        else:
+            return 'Very Dry'
+
+
+def create_imagery_backend(name=None):
+    """Backend named by `name` or Config.IMAGERY_BACKEND ('gee' or 'local')"""
+    name = name or Config.IMAGERY_BACKEND
+
+    if name == 'gee':
+        from backend.gee_handler import GEEHandler
+        return GEEHandler()
+    if name == 'local':
+        from backend.local_backend import LocalImageryBackend
+        return LocalImageryBackend()
+
+    raise ValueError(f"Unknown imagery backend '{name}'")
@@ -0,0 +1,260 @@
+"""
+Background Jobs
+Bounded worker pool for long-running requests, with job IDs, status,
+cooperative cancellation and per-stage timings
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested"""
+
+
+class QueueFullError(Exception):
+    """Raised by submit when max_queued jobs are already waiting"""
+
+
+class Job:
+    def __init__(self, kind, params=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = QUEUED
+        self.stage_name = None
+        self.progress = 0
+        self.message = 'Queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.timings = OrderedDict()  # stage -> seconds, in the order they ran
+        self._cancel = threading.Event()
+        self._on_update = None
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested"""
+        if self._cancel.is_set():
+            raise JobCancelled(f'Job {self.id} was cancelled')
+
+    @contextmanager
+    def stage(self, name, message=None):
+        """Time a named step of the job; cancellation is checked on entry"""
+        self.check_cancelled()
+        self.stage_name = name
+        self.message = message or name
+        self._notify()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+
+    def report(self, progress=None, message=None):
+        """Record progress within the current stage
+
+        Also a cancellation point, so passing it down as a progress
+        callback lets long downloads and loops stop early.
+        """
+        if progress is not None:
+            self.progress = progress
+        if message is not None:
+            self.message = message
+        self._notify()
+        self.check_cancelled()
+
+    def progress_callback(self, stage, progress, message, data=None):
+        """Adapter for the (stage, progress, message, data) callbacks used by exports"""
+        self.report(progress, message)
+
+    def _notify(self):
+        if self._on_update is not None:
+            self._on_update(self)
+
+    def to_dict(self):
+        now = time.time()
+        if self.started_at is None:
+            queued = now - self.created_at
+            running = None
+        else:
+            queued = self.started_at - self.created_at
+            running = (self.finished_at or now) - self.started_at
+
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'stage': self.stage_name,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'timings': {
+                'queued_seconds': round(queued, 3),
+                'running_seconds': None if running is None else round(running, 3),
+                'stages': {name: round(seconds, 3) for name, seconds in self.timings.items()}
+            }
+        }
+
+
+class JobManager:
+    def __init__(self, workers=2, on_update=None, max_history=200, max_queued=None):
+        """
+        workers: Jobs that may run at once; the rest wait in the queue
+        on_update: Called with the Job on every status or progress change
+        max_history: Finished jobs kept for polling, oldest dropped first
+        max_queued: Waiting jobs allowed before submit raises QueueFullError
+            (None for no limit)
+        """
+        self.workers = workers
+        self.on_update = on_update
+        self.max_history = max_history
+        self.max_queued = max_queued
+        self._started = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # id -> Job, in submission order
+        self._futures = {}
+
+    def submit(self, kind, func, params=None):
+        """Queue func(job) and return the Job right away
+
+        func's return value becomes the job result; JobCancelled ends it as
+        cancelled and any other exception as failed. Raises QueueFullError
+        instead of queueing beyond max_queued.
+        """
+        job = Job(kind, params)
+        job._on_update = self._notify
+
+        with self._lock:
+            if self.max_queued is not None and self._queue_depth() >= self.max_queued:
+                raise QueueFullError(f'{self._queue_depth()} {kind} jobs are already queued')
+            self._jobs[job.id] = job
+            self._trim()
+        self._notify(job)
+
+        future = self._executor.submit(self._run, job, func)
+        with self._lock:
+            # A fast job may already be done and have nothing left to cancel
+            if job.status not in FINISHED:
+                self._futures[job.id] = future
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation; returns the Job, or None if it is unknown
+
+        A queued job is dropped at once. A running job stops at its next
+        stage or progress report.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job._cancel.set()
+            future = self._futures.get(job_id)
+            dropped = future is not None and future.cancel()
+
+        if dropped:
+            self._finish(job, CANCELLED, message='Cancelled')
+        return job
+
+    def stats(self):
+        """Job counts by status, queue depth and time spent waiting for a worker"""
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {
+                'workers': self.workers,
+                'queue_depth': counts[QUEUED],
+                'max_queued': self.max_queued,
+                'jobs': counts,
+                'started': self._started,
+                'wait_seconds': {
+                    'mean': round(self._wait_total / self._started, 3) if self._started else 0,
+                    'max': round(self._wait_max, 3)
+                }
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, func):
+        if job.cancel_requested:
+            self._finish(job, CANCELLED, message='Cancelled')
+            return
+
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.message = 'Running'
+        with self._lock:
+            wait = job.started_at - job.created_at
+            self._started += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        self._notify(job)
+
+        try:
+            result = func(job)
+        except JobCancelled:
+            self._finish(job, CANCELLED, message='Cancelled')
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self._finish(job, FAILED, error=str(e), message='Failed')
+        else:
+            self._finish(job, SUCCEEDED, result=result, message='Completed')
+
+    def _finish(self, job, status, result=None, error=None, message=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.message = message
+        job.finished_at = time.time()
+        if status == SUCCEEDED:
+            job.progress = 100
+        with self._lock:
+            self._futures.pop(job.id, None)
+        self._notify(job)
+
+    def _queue_depth(self):
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def _trim(self):
+        """Drop the oldest finished jobs beyond max_history (lock held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                print(f"⚠️  Job update for {job.id} not delivered: {e}")
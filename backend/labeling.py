@@ -0,0 +1,55 @@
+"""
+Spectral Labeling Engine
+Vectorized rule cascade used to generate synthetic training labels
+"""
+
+import numpy as np
+from backend.normalization import normalize_bands
+
+# Class ids in cascade order
+WATER, FOREST, GRASSLAND, URBAN, BARREN, AGRICULTURE = range(6)
+
+
+def spectral_labels(X_norm):
+    """Label normalized pixels (n_pixels, bands) with the spectral rule cascade
+
+    Bands are expected in Red, Green, Blue, NIR order. Rules are evaluated on
+    whole arrays, from the lowest to the highest priority, so later (stronger)
+    rules overwrite earlier ones exactly like the original if/elif chain:
+    water -> forest -> grassland -> urban -> barren -> agriculture.
+    """
+    labels = np.zeros(X_norm.shape[0], dtype=int)
+
+    if X_norm.shape[1] < 4:
+        return labels
+
+    red = X_norm[:, 0]
+    green = X_norm[:, 1]
+    blue = X_norm[:, 2]
+    nir = X_norm[:, 3]
+
+    # Calculate indices
+    ndvi = (nir - red) / (nir + red + 1e-8)
+    ndwi = (green - nir) / (green + nir + 1e-8)
+
+    labels[:] = AGRICULTURE
+    labels[ndvi < 0.1] = BARREN
+    labels[(red > 0.3) & (green > 0.3) & (blue > 0.3)] = URBAN
+    labels[ndvi > 0.3] = GRASSLAND
+    labels[ndvi > 0.6] = FOREST
+    labels[ndwi > 0.3] = WATER
+
+    return labels
+
+
+
+def iter_label_blocks(X, stats, block_size=1_000_000):
+    """Yield (start, end, labels) for consecutive pixel blocks of X
+
+    Each block is normalized to float32 with the per-band stats and labeled
+    on its own, so peak memory is bounded by the block size rather than
+    by the scene size.
+    """
+    for start in range(0, X.shape[0], block_size):
+        end = min(start + block_size, X.shape[0])
+        yield start, end, spectral_labels(normalize_bands(X[start:end], stats))
@@ -0,0 +1,364 @@
+"""
+Local Imagery Backend
+Offline stand-in for Earth Engine that serves Sentinel-2 and MODIS scenes
+from GeoTIFFs on disk, or synthesizes them, and computes the index
+analyses with NumPy
+"""
+
+import os
+import json
+import math
+import hashlib
+from datetime import datetime
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.transform import from_bounds
+from rasterio.windows import Window, from_bounds as window_from_bounds
+
+from backend.imagery_backend import ImageryBackend
+from backend.export_store import ExportStore
+from backend.result_cache import normalize_bounds
+from backend.raster_analytics import analyze_arrays, compute_index, pixel_areas
+from config import Config
+
+# Band order of on-disk and synthetic Sentinel-2 scenes
+SENTINEL_BANDS = ['B4', 'B3', 'B2', 'B8', 'B11']
+# Bands written by export_to_tif, matching the Earth Engine export
+EXPORT_BANDS = ['B4', 'B3', 'B2', 'B8', 'B11']
+
+METERS_PER_DEGREE = 111319.49079327357
+WGS84 = CRS.from_epsg(4326)
+
+LAND_COVERS = ['water', 'forest', 'grassland', 'urban', 'barren', 'agriculture']
+
+# Typical surface reflectance (x10000) of each land cover, in SENTINEL_BANDS order
+SURFACE_REFLECTANCE = np.array([
+    [400, 700, 800, 200, 100],       # water
+    [300, 600, 400, 3500, 1500],     # forest
+    [800, 900, 600, 2500, 2000],     # grassland
+    [2500, 2400, 2300, 2800, 3300],  # urban
+    [2800, 2500, 2000, 3000, 3800],  # barren
+    [1200, 1100, 800, 2600, 2200],   # agriculture
+], dtype=np.float32)
+
+# MODIS LC_Type1 (IGBP) class of each land cover
+MODIS_CLASSES = np.array([17, 2, 10, 13, 16, 12], dtype=np.uint8)
+
+# Small offline gazetteer for search_location
+LOCATIONS = {
+    'delhi': (28.6139, 77.2090, 'Delhi, India'),
+    'mumbai': (19.0760, 72.8777, 'Mumbai, Maharashtra, India'),
+    'bangalore': (12.9716, 77.5946, 'Bengaluru, Karnataka, India'),
+    'ahmedabad': (23.0225, 72.5714, 'Ahmedabad, Gujarat, India'),
+    'kolkata': (22.5726, 88.3639, 'Kolkata, West Bengal, India'),
+    'chennai': (13.0827, 80.2707, 'Chennai, Tamil Nadu, India'),
+}
+
+
+def _seed(*parts):
+    """Stable RNG seed from JSON-serializable parts"""
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+    return int(digest[:16], 16)
+
+
+def _smooth_field(rng, height, width, cells=6):
+    """Smooth 0-1 random field: a coarse random grid bilinearly upsampled"""
+    coarse = rng.random((cells + 1, cells + 1), dtype=np.float32)
+    rows = np.linspace(0, cells, height, dtype=np.float32)
+    cols = np.linspace(0, cells, width, dtype=np.float32)
+    r0 = np.minimum(rows.astype(int), cells - 1)
+    c0 = np.minimum(cols.astype(int), cells - 1)
+    fr = (rows - r0)[:, None]
+    fc = (cols - c0)[None, :]
+
+    top = coarse[r0][:, c0] * (1 - fc) + coarse[r0][:, c0 + 1] * fc
+    bottom = coarse[r0 + 1][:, c0] * (1 - fc) + coarse[r0 + 1][:, c0 + 1] * fc
+    return top * (1 - fr) + bottom * fr
+
+
+def scene_grid(bounds, scale):
+    """(height, width, transform, scale) of a grid over bounds near `scale` meters
+
+    The scale is coarsened when needed so no side exceeds
+    Config.LOCAL_IMAGERY_MAX_SIZE pixels.
+    """
+    mid_lat = math.radians((bounds['north'] + bounds['south']) / 2)
+    width_m = (bounds['east'] - bounds['west']) * METERS_PER_DEGREE * math.cos(mid_lat)
+    height_m = (bounds['north'] - bounds['south']) * METERS_PER_DEGREE
+
+    scale = max(scale, max(width_m, height_m) / Config.LOCAL_IMAGERY_MAX_SIZE)
+    width = max(1, math.ceil(width_m / scale))
+    height = max(1, math.ceil(height_m / scale))
+    transform = from_bounds(bounds['west'], bounds['south'], bounds['east'], bounds['north'],
+                            width, height)
+    return height, width, transform, scale
+
+
+def synthetic_land_cover(bounds, year, height, width):
+    """Land cover indices (into LAND_COVERS) for a synthetic landscape
+
+    The landscape depends only on the AOI, so every resolution and year
+    sees the same terrain; later years have more urban and less forest.
+    """
+    rng = np.random.default_rng(_seed('landscape', bounds))
+    terrain = _smooth_field(rng, height, width)
+    moisture = _smooth_field(rng, height, width)
+    development = _smooth_field(rng, height, width)
+    growth = 0.01 * (year - 2015)
+
+    cover = np.full((height, width), LAND_COVERS.index('agriculture'), dtype=np.uint8)
+    cover[moisture > 0.55] = LAND_COVERS.index('grassland')
+    cover[moisture > 0.65 + growth] = LAND_COVERS.index('forest')
+    cover[terrain > 0.75] = LAND_COVERS.index('barren')
+    cover[development > 0.7 - growth] = LAND_COVERS.index('urban')
+    cover[terrain < 0.25] = LAND_COVERS.index('water')
+    return cover
+
+
+def synthetic_sentinel(bounds, year, height, width):
+    """(bands, height, width) uint16 reflectances in SENTINEL_BANDS order"""
+    cover = synthetic_land_cover(bounds, year, height, width)
+    rng = np.random.default_rng(_seed('sentinel', bounds, year))
+
+    data = SURFACE_REFLECTANCE[cover].transpose(2, 0, 1)
+    data += rng.normal(0, 100, size=data.shape).astype(np.float32)
+    return np.clip(data, 1, 10000).astype(np.uint16)
+
+
+class Scene:
+    """Bands of one AOI and period, with the grid they sit on"""
+
+    def __init__(self, bands, transform, scale, crs=WGS84):
+        self.bands = bands  # band name -> float32 (height, width)
+        self.transform = transform
+        self.scale = scale
+        self.crs = crs
+
+    def band(self, name):
+        if name not in self.bands:
+            raise ValueError(f"Local imagery has no {name} band")
+        return self.bands[name]
+
+    @property
+    def shape(self):
+        return next(iter(self.bands.values())).shape
+
+    def statistics(self, indices=(), masks=None):
+        """Earth Engine style index statistics and mask areas (see analyze_blocks)"""
+        return analyze_arrays(self.bands, self.transform, self.crs, indices, masks)
+
+    def area_sqkm(self, mask):
+        """Area in km² of the True pixels of a (height, width) mask"""
+        areas = pixel_areas(self.transform, self.crs, 0, mask.shape[0])
+        return float((mask * areas).sum() / 1000000)
+
+
+class LocalImageryBackend(ImageryBackend):
+    def __init__(self, imagery_dir=None):
+        """
+        imagery_dir: Directory searched for sentinel2_<year>.tif, sentinel2.tif,
+            modis_landcover_<year>.tif and modis_landcover.tif before falling
+            back to synthetic scenes (default Config.LOCAL_IMAGERY_DIR)
+        """
+        self.imagery_dir = imagery_dir or Config.LOCAL_IMAGERY_DIR
+        self.export_store = ExportStore(Config.EXPORTS_DIR, Config.EXPORT_STORE_BYTES,
+                                        Config.EXPORT_STORE_MAX_AGE)
+        self.initialized = True
+
+    def _local_file(self, prefix, year):
+        for name in (f'{prefix}_{year}.tif', f'{prefix}.tif'):
+            path = os.path.join(self.imagery_dir, name)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _read_file(self, path, bounds):
+        """Window of an on-disk GeoTIFF covering bounds, as {band name: array}"""
+        with rasterio.open(path) as src:
+            window = window_from_bounds(bounds['west'], bounds['south'], bounds['east'],
+                                        bounds['north'], src.transform)
+            window = window.round_offsets().round_lengths().intersection(
+                Window(0, 0, src.width, src.height)
+            )
+            data = src.read(window=window).astype(np.float32)
+            # Band names come from the descriptions, else SENTINEL_BANDS order
+            names = [desc or (SENTINEL_BANDS[i] if i < len(SENTINEL_BANDS) else f'band_{i + 1}')
+                     for i, desc in enumerate(src.descriptions)]
+            transform = src.window_transform(window)
+            scale = abs(src.res[0]) * METERS_PER_DEGREE
+            crs = src.crs
+
+        return dict(zip(names, data)), transform, scale, crs
+
+    def sentinel_scene(self, bounds, date):
+        """Sentinel-2 bands for an AOI and the year of `date`"""
+        bounds = normalize_bounds(bounds, Config.GEE_BOUNDS_TOLERANCE)
+        year = int(str(date)[:4])
+
+        path = self._local_file('sentinel2', year)
+        if path:
+            return Scene(*self._read_file(path, bounds))
+
+        height, width, transform, scale = scene_grid(bounds, Config.DEFAULT_SCALE)
+        data = synthetic_sentinel(bounds, year, height, width).astype(np.float32)
+        return Scene(dict(zip(SENTINEL_BANDS, data)), transform, scale)
+
+    def modis_scene(self, bounds, year):
+        """MODIS LC_Type1 classes for an AOI and year"""
+        bounds = normalize_bounds(bounds, Config.GEE_BOUNDS_TOLERANCE)
+
+        path = self._local_file('modis_landcover', year)
+        if path:
+            bands, transform, scale, crs = self._read_file(path, bounds)
+            return Scene({'LC_Type1': next(iter(bands.values()))}, transform, scale, crs)
+
+        height, width, transform, scale = scene_grid(bounds, 500)
+        cover = MODIS_CLASSES[synthetic_land_cover(bounds, int(year), height, width)]
+        return Scene({'LC_Type1': cover.astype(np.float32)}, transform, scale)
+
+    def search_location(self, location_name):
+        """Look up a location in the offline gazetteer"""
+        match = LOCATIONS.get(location_name.strip().lower())
+        if match is None:
+            raise ValueError(f"Location '{location_name}' not found")
+        lat, lon, display_name = match
+        return {'lat': lat, 'lon': lon, 'display_name': display_name}
+
+    def fetch_satellite_data(self, bounds, start_date, end_date, dataset_type='sentinel'):
+        """Describe the local scene for an AOI and date range"""
+        if dataset_type == 'modis':
+            scene = self.modis_scene(bounds, str(end_date)[:4])
+            image_id, dataset = 'MODIS_MCD12Q1', 'MODIS'
+        else:
+            scene = self.sentinel_scene(bounds, end_date)
+            image_id, dataset = 'sentinel2_composite', 'Sentinel-2'
+
+        return {
+            'image_id': image_id,
+            'download_url': None,
+            'bounds': bounds,
+            'date_range': {'start': start_date, 'end': end_date},
+            'dataset': dataset,
+            'resolution': f'{round(scene.scale)}m',
+            'cloud_cover': 0,
+            'image_count': 1
+        }
+
+    def export_to_tif(self, image_id, bounds, dataset_type='sentinel', progress_callback=None,
+                      start_date=None, end_date=None, pin=False):
+        """Write the local scene for an AOI to exports/, reusing an identical export
+
+        The scene is the one for end_date's year, by default the current year.
+        With pin, the export is kept from eviction until export_store.release(path).
+        """
+        bounds = normalize_bounds(bounds, Config.GEE_BOUNDS_TOLERANCE)
+        year = str(end_date)[:4] if end_date else str(datetime.now().year)
+        dates = [start_date, end_date] if start_date and end_date else year
+
+        if dataset_type == 'modis':
+            spec = {'bounds': bounds, 'collection': 'local/modis_landcover',
+                    'bands': ['LC_Type1'], 'dates': dates}
+            prefix = 'modis_landcover'
+        else:
+            spec = {'bounds': bounds, 'collection': 'local/sentinel2',
+                    'bands': EXPORT_BANDS, 'dates': dates}
+            prefix = 'satellite_image'
+
+        def write(path):
+            if dataset_type == 'modis':
+                scene = self.modis_scene(bounds, year)
+                data, dtype = scene.band('LC_Type1')[None], 'uint8'
+            else:
+                scene = self.sentinel_scene(bounds, year)
+                data, dtype = np.stack([scene.band(b) for b in EXPORT_BANDS]), 'uint16'
+
+            profile = {
+                'driver': 'GTiff', 'height': data.shape[1], 'width': data.shape[2],
+                'count': data.shape[0], 'dtype': dtype, 'crs': 'EPSG:4326',
+                'transform': scene.transform, 'tiled': True, 'compress': 'deflate'
+            }
+            with rasterio.open(path, 'w', **profile) as dst:
+                dst.write(data.astype(dtype))
+                dst.descriptions = tuple(spec['bands'])
+
+            if progress_callback:
+                progress_callback('downloading', 100, 'Local scene written', {})
+
+        return self.export_store.fetch(spec, write, prefix, pin)
+
+    def get_modis_landcover(self, bounds, year='2022'):
+        """Histogram of MODIS land cover classes for an AOI and year"""
+        classes = self.modis_scene(bounds, year).band('LC_Type1')
+        values, counts = np.unique(classes, return_counts=True)
+
+        return {
+            'statistics': {'LC_Type1': {str(int(v)): int(c) for v, c in zip(values, counts)}},
+            'year': year,
+            'dataset': 'MODIS MCD12Q1',
+            'resolution': '500m'
+        }
+
+    def detect_water_bodies(self, bounds, start_date, end_date):
+        """Detect water bodies using NDWI (Normalized Difference Water Index)"""
+        scene = self.sentinel_scene(bounds, end_date)
+        return self._water_result(scene.statistics(masks={'NDWI': ('NDWI', 0.3)}))
+
+    def calculate_ndvi_analysis(self, bounds, start_date, end_date):
+        """Calculate NDVI for vegetation health analysis"""
+        scene = self.sentinel_scene(bounds, end_date)
+        return self._ndvi_result(scene.statistics(indices=['NDVI']))
+
+    def calculate_soil_moisture(self, bounds, start_date, end_date):
+        """Estimate soil moisture using optical indices"""
+        scene = self.sentinel_scene(bounds, end_date)
+        return self._moisture_result(scene.statistics(indices=['NDMI', 'MSI']))
+
+    def detect_urban_sprawl(self, bounds, start_date_old, end_date_old, start_date_new, end_date_new):
+        """Detect urban sprawl by comparing two time periods"""
+        def urban(scene):
+            ndvi = compute_index('NDVI', scene.bands)
+            ndbi = compute_index('NDBI', scene.bands)
+            return (ndbi > 0) & (ndvi < 0.2)
+
+        old_scene = self.sentinel_scene(bounds, end_date_old)
+        new_scene = self.sentinel_scene(bounds, end_date_new)
+        old_urban, new_urban = urban(old_scene), urban(new_scene)
+
+        old_area_sqkm = new_scene.area_sqkm(old_urban)
+        new_area_sqkm = new_scene.area_sqkm(new_urban)
+        growth_sqkm = new_scene.area_sqkm(new_urban & ~old_urban)
+
+        return {
+            'old_urban_area_sqkm': old_area_sqkm,
+            'new_urban_area_sqkm': new_area_sqkm,
+            'urban_growth_sqkm': growth_sqkm,
+            'growth_percentage': (growth_sqkm / old_area_sqkm * 100) if old_area_sqkm > 0 else 0,
+            'old_period': f"{start_date_old} to {end_date_old}",
+            'new_period': f"{start_date_new} to {end_date_new}"
+        }
+
+    def detect_forest_change(self, bounds, start_date_old, end_date_old, start_date_new, end_date_new):
+        """Detect forest cover change between two time periods"""
+        old_scene = self.sentinel_scene(bounds, end_date_old)
+        new_scene = self.sentinel_scene(bounds, end_date_new)
+        old_forest = compute_index('NDVI', old_scene.bands) > 0.6
+        new_forest = compute_index('NDVI', new_scene.bands) > 0.6
+
+        old_area_sqkm = new_scene.area_sqkm(old_forest)
+        new_area_sqkm = new_scene.area_sqkm(new_forest)
+        loss_sqkm = new_scene.area_sqkm(old_forest & ~new_forest)
+        gain_sqkm = new_scene.area_sqkm(~old_forest & new_forest)
+
+        net_change = new_area_sqkm - old_area_sqkm
+
+        return {
+            'old_forest_area_sqkm': old_area_sqkm,
+            'new_forest_area_sqkm': new_area_sqkm,
+            'forest_loss_sqkm': loss_sqkm,
+            'forest_gain_sqkm': gain_sqkm,
+            'net_change_sqkm': net_change,
+            'change_percentage': (net_change / old_area_sqkm * 100) if old_area_sqkm > 0 else 0,
+            'old_period': f"{start_date_old} to {end_date_old}",
+            'new_period': f"{start_date_new} to {end_date_new}"
+        }
@@ -1,10 +1,17 @@
 import numpy as np
 import rasterio
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.model_selection import train_test_split
-import joblib
 import os
 from backend.utils import generate_filename, calculate_metrics, normalize_image
+from backend.labeling import iter_label_blocks
+from backend.normalization import compute_band_stats, get_band_stats, stats_distance
+from backend.sampling import stratified_sample
+from backend.features import UINT8_ENCODING, encode_features, model_encoding_stats
+from backend.raster_io import band_names, iter_windows, classified_profile, write_cog
+from backend.parallel_inference import classify_parallel
+from backend.model_registry import ModelRegistry
+from config import Config
 
 # TensorFlow is optional - only import if available
 try:
@@ -16,9 +23,18 @@ except ImportError:
     TENSORFLOW_AVAILABLE = False
     print("Warning: TensorFlow not available. CNN model will be disabled.")
 
+# Pixel classifiers kept in the model registry and reused for compatible images
+REUSABLE_MODEL_TYPES = ('random_forest', 'hist_gb')
+
 class MLClassifier:
-    def __init__(self):
-        self.rf_model = None
+    def __init__(self, registry=None):
+        """
+        registry: ModelRegistry that trained models are saved to and loaded
+            from (by default one over Config.MODELS_DIR)
+        """
+        self.registry = registry or ModelRegistry(Config.MODELS_DIR, Config.MODEL_CACHE_ENTRIES,
+                                                  Config.MODEL_CACHE_BYTES, Config.MODEL_STORE_ENTRIES,
+                                                  Config.MODEL_STORE_BYTES)
         self.cnn_model = None
         self.class_names = ['Water', 'Forest', 'Grassland', 'Urban', 'Barren', 'Agriculture']
     
@@ -33,7 +49,7 @@ class MLClassifier:
         image = np.transpose(image, (1, 2, 0))
         return image, profile, transform
     
-    def prepare_training_data(self, image):
+    def prepare_training_data(self, image, stats=None):
         """Prepare training data with synthetic labels"""
         height, width, bands = image.shape
         
@@ -42,68 +58,98 @@ class MLClassifier:
         
         # Generate synthetic labels based on spectral characteristics
         # This is a simplified approach - in production, use labeled training data
-        y = self.generate_synthetic_labels(X)
+        y = self.generate_synthetic_labels(X, stats)
         
         return X, y
     
-    def generate_synthetic_labels(self, X):
+    def generate_synthetic_labels(self, X, stats=None):
         """Generate synthetic labels based on spectral indices"""
-        labels = np.zeros(X.shape[0], dtype=int)
-        
-        # Normalize bands
-        X_norm = normalize_image(X)
-        
-        for i in range(X.shape[0]):
-            if X.shape[1] >= 4:
-                red = X_norm[i, 0]
-                green = X_norm[i, 1]
-                blue = X_norm[i, 2]
-                nir = X_norm[i, 3]
-                
-                # Calculate indices
-                ndvi = (nir - red) / (nir + red + 1e-8)
-                ndwi = (green - nir) / (green + nir + 1e-8)
-                
-                # Simple classification rules
-                if ndwi > 0.3:
-                    labels[i] = 0  # Water
-                elif ndvi > 0.6:
-                    labels[i] = 1  # Forest
-                elif ndvi > 0.3:
-                    labels[i] = 2  # Grassland
-                elif red > 0.3 and green > 0.3 and blue > 0.3:
-                    labels[i] = 3  # Urban
-                elif ndvi < 0.1:
-                    labels[i] = 4  # Barren
-                else:
-                    labels[i] = 5  # Agriculture
+        if stats is None:
+            stats = compute_band_stats(X, Config.LABEL_BLOCK_SIZE)
+        
+        # Normalize per band and label one block at a time
+        labels = np.empty(X.shape[0], dtype=np.uint8)  # class ids, one byte a pixel
+        for start, end, block_labels in iter_label_blocks(X, stats, Config.LABEL_BLOCK_SIZE):
+            labels[start:end] = block_labels
         
         return labels
     
-    def train_random_forest(self, X, y):
-        """Train Random Forest classifier"""
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-        
-        self.rf_model = RandomForestClassifier(
+    def train_random_forest(self, X, y, metadata=None):
+        """Train Random Forest classifier and register it under a new model ID
+        
+        metadata: Extra training details stored with the model (bands,
+            normalization stats, source image, feature encoding)
+        Returns (model_id, metrics). Nothing is kept on the classifier, so
+        concurrent requests sharing it never see each other's models.
+        """
+        model = RandomForestClassifier(
             n_estimators=100,
             max_depth=20,
+            min_samples_leaf=Config.RF_MIN_SAMPLES_LEAF,
+            max_leaf_nodes=Config.RF_MAX_LEAF_NODES,
             random_state=42,
-            n_jobs=-1
+            n_jobs=Config.THREADS_PER_JOB
+        )
+        
+        return self._fit_and_register(model, 'random_forest', X, y, metadata)
+    
+    def train_hist_gradient_boosting(self, X, y, metadata=None):
+        """Train a histogram gradient boosting classifier and register it
+        
+        Features are binned into at most 255 buckets once, trees are grown
+        on the bin histograms with OpenMP threads, and boosting stops when
+        the held-out loss no longer improves (or runs all max_iter rounds
+        when a class has a single training pixel). Much faster to fit and to
+        predict than the random forest on a handful of bands.
+        Returns (model_id, metrics), like train_random_forest.
+        """
+        model = HistGradientBoostingClassifier(
+            max_iter=Config.HGB_MAX_ITER,
+            learning_rate=Config.HGB_LEARNING_RATE,
+            max_leaf_nodes=Config.HGB_MAX_LEAF_NODES,
+            early_stopping=True,
+            validation_fraction=0.1,
+            n_iter_no_change=10,
+            random_state=42
         )
         
-        self.rf_model.fit(X_train, y_train)
+        return self._fit_and_register(model, 'hist_gb', X, y, metadata)
+    
+    def _fit_and_register(self, model, model_type, X, y, metadata=None):
+        """Fit on a class-stratified sample, evaluate on held-out pixels and register
+        
+        X holds raw band values; only the sampled rows are encoded, as the
+        metadata's feature_encoding asks. Returns (model_id, metrics).
+        """
+        # Class-stratified, size-capped sample instead of every pixel
+        train_idx, test_idx = stratified_sample(
+            y, Config.TRAINING_SAMPLES_PER_CLASS, Config.EVALUATION_SAMPLES_PER_CLASS, Config.SAMPLING_SEED
+        )
+        encoding_stats = model_encoding_stats(metadata or {})
+        X_train, y_train = encode_features(X[train_idx], encoding_stats), y[train_idx]
+        X_test, y_test = encode_features(X[test_idx], encoding_stats), y[test_idx]
+        
+        # Early stopping holds out a stratified split, which needs two rows of every class
+        if model_type == 'hist_gb' and np.unique(y_train, return_counts=True)[1].min() < 2:
+            model.set_params(early_stopping=False)
+        
+        model.fit(X_train, y_train)
         
         # Evaluate
-        y_pred = self.rf_model.predict(X_test)
+        y_pred = model.predict(X_test)
         metrics = calculate_metrics(y_test, y_pred)
         
-        # Save model
-        model_path = os.path.join('models', 'saved_models', 'random_forest.pkl')
-        joblib.dump(self.rf_model, model_path)
-        
-        return metrics
+        # Save model under its own versioned ID
+        model_id = self.registry.register(model, model_type, dict(
+            metadata or {},
+            params=model.get_params(),
+            class_names=self.class_names,
+            training_samples=int(len(X_train)),
+            evaluation_samples=int(len(X_test)),
+            metrics=metrics
+        ))
+        
+        return model_id, metrics
     
     def build_cnn_model(self, input_shape, num_classes):
         """Build CNN model for land cover classification"""
@@ -195,54 +241,151 @@ class MLClassifier:
         
         return metrics
     
-    def classify(self, image_path, model_type='random_forest'):
-        """Classify land cover using trained model"""
-        image, profile, transform = self.load_image(image_path)
-        height, width, bands = image.shape
-        
-        X = image.reshape(-1, bands)
-        
-        if model_type == 'random_forest':
-            if self.rf_model is None:
-                model_path = os.path.join('models', 'saved_models', 'random_forest.pkl')
-                if os.path.exists(model_path):
-                    self.rf_model = joblib.load(model_path)
-                else:
-                    raise ValueError("Model not trained. Train first.")
-            
-            predictions = self.rf_model.predict(X)
-        else:
-            raise ValueError(f"Model type '{model_type}' not supported yet")
-        
-        # Reshape predictions
-        classified_image = predictions.reshape(height, width)
+    def classify(self, image_path, model_type='random_forest', tile_size=None, workers=None,
+                 model_id=None):
+        """Classify land cover using trained model
+        
+        model_id selects a registered model, served from memory when it is
+        resident. Without it the newest registered model of model_type is
+        used. Pixels are encoded the way the
+        model's training features were (see backend.features).
+        
+        The image is processed one window at a time (tile_size squares, by
+        default Config.INFERENCE_TILE_SIZE, or the file's native blocks when
+        set to 0) and each window is written straight to the output, so
+        peak memory depends on the window size rather than the scene size.
+        With more than one worker (Config.INFERENCE_WORKERS by default) the
+        windows are classified in a process pool.
+        """
+        if model_id is None:
+            if model_type not in REUSABLE_MODEL_TYPES:
+                raise ValueError(f"Model type '{model_type}' not supported yet")
+            model_id = self.registry.latest(model_type)
+            if model_id is None:
+                raise ValueError("Model not trained. Train first.")
+        
+        model_path = self.registry.model_path(model_id)
+        encoding_stats = model_encoding_stats(self.registry.metadata(model_id))
+        
+        if tile_size is None:
+            tile_size = Config.INFERENCE_TILE_SIZE
+        if workers is None:
+            workers = Config.INFERENCE_WORKERS
         
         # Save classified image
         output_path = generate_filename('classified_map', 'tif')
         output_path = os.path.join('exports', output_path)
         
-        profile.update(dtype=rasterio.uint8, count=1)
-        with rasterio.open(output_path, 'w', **profile) as dst:
-            dst.write(classified_image.astype(rasterio.uint8), 1)
+        # Classify into a plain tiled GeoTIFF, then lay it out as a COG
+        partial_path = output_path + '.partial.tif'
+        try:
+            if workers > 1:
+                # Workers load the saved model file themselves
+                counts = classify_parallel(model_path, image_path, partial_path, len(self.class_names),
+                                           tile_size, workers, encoding_stats)
+            else:
+                counts = self._classify_windows(self.registry.get(model_id), image_path, partial_path, tile_size,
+                                                encoding_stats)
+            
+            write_cog(partial_path, output_path, Config.COG_COMPRESSION,
+                      Config.COG_OVERVIEW_RESAMPLING, Config.COG_BLOCK_SIZE)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
         
         return {
             'output_path': output_path,
+            'model_id': model_id,
             'class_distribution': {
-                self.class_names[i]: int(np.sum(classified_image == i))
+                self.class_names[i]: int(counts[i])
                 for i in range(len(self.class_names))
             }
         }
     
-    def train_and_classify(self, image_path, model_type='random_forest'):
-        """Complete workflow: train model and classify"""
+    def _classify_windows(self, model, image_path, output_path, tile_size, encoding_stats=None):
+        """Classify windows sequentially in this process"""
+        counts = np.zeros(len(self.class_names), dtype=np.int64)
+        
+        with rasterio.open(image_path) as src:
+            profile = classified_profile(src.profile)
+            
+            with rasterio.open(output_path, 'w', **profile) as dst:
+                for window in iter_windows(src, tile_size):
+                    block = src.read(window=window)
+                    bands, height, width = block.shape
+                    
+                    X = np.transpose(block, (1, 2, 0)).reshape(-1, bands)
+                    predictions = model.predict(encode_features(X, encoding_stats)).astype(rasterio.uint8)
+                    
+                    dst.write(predictions.reshape(height, width), 1, window=window)
+                    counts += np.bincount(predictions, minlength=len(self.class_names))[:len(self.class_names)]
+        
+        return counts
+    
+    def find_compatible_model(self, bands, stats, sensor=None, tolerance=None, model_type='random_forest'):
+        """ID of the registered model of model_type best suited to an image, or None
+        
+        A model qualifies when it was trained on the same bands (and sensor,
+        if given) and every band's min and max lie within tolerance (a
+        fraction of the band's range, Config.MODEL_REUSE_TOLERANCE by
+        default) of the image's, so its synthetic labels would be the same.
+        The closest qualifying model wins; ties go to the newest.
+        """
+        if tolerance is None:
+            tolerance = Config.MODEL_REUSE_TOLERANCE
+        
+        best_id, best_distance = None, None
+        for info in self.registry.list_models(model_type):
+            if info.get('bands') != bands or 'band_stats' not in info:
+                continue
+            if sensor is not None and info.get('sensor') != sensor:
+                continue
+            
+            distance = stats_distance(info['band_stats'], stats)
+            if distance <= tolerance and (best_distance is None or distance < best_distance):
+                best_id, best_distance = info['model_id'], distance
+        
+        return best_id
+    
+    def train_and_classify(self, image_path, model_type='random_forest', sensor=None, retrain=False,
+                           model_id=None):
+        """Complete workflow: train model and classify
+        
+        Predict-only when model_id names a registered model, or when a
+        registered model of model_type is compatible with the image (see
+        find_compatible_model) and retrain is not set; otherwise a new
+        model is trained first.
+        """
+        bands = band_names(image_path)
+        stats = get_band_stats(image_path)
+        
+        if model_id is None and model_type in REUSABLE_MODEL_TYPES and not retrain:
+            model_id = self.find_compatible_model(bands, stats, sensor, model_type=model_type)
+        
+        if model_id is not None:
+            return {
+                'model_id': model_id,
+                'reused_model': True,
+                'metrics': self.registry.metadata(model_id).get('metrics', {}),
+                'classification': self.classify(image_path, model_type, model_id=model_id)
+            }
+        
         image, profile, transform = self.load_image(image_path)
         
         # Prepare data
-        X, y = self.prepare_training_data(image)
+        X, y = self.prepare_training_data(image, stats)
         
         # Train model
+        model_id = None
+        metadata = {'source_image': image_path, 'sensor': sensor, 'bands': bands, 'band_stats': stats}
+        if model_type in REUSABLE_MODEL_TYPES and Config.FEATURE_ENCODING == UINT8_ENCODING:
+            # Sampled rows and prediction windows are quantized as they are used,
+            # never the whole scene; labels come from the raw values
+            metadata['feature_encoding'] = UINT8_ENCODING
         if model_type == 'random_forest':
-            metrics = self.train_random_forest(X, y)
+            model_id, metrics = self.train_random_forest(X, y, metadata)
+        elif model_type == 'hist_gb':
+            model_id, metrics = self.train_hist_gradient_boosting(X, y, metadata)
         elif model_type == 'cnn':
             if not TENSORFLOW_AVAILABLE:
                 raise RuntimeError("TensorFlow is not available. CNN training is disabled. Use 'random_forest' instead.")
@@ -251,10 +394,15 @@ class MLClassifier:
         else:
             raise ValueError(f"Model type '{model_type}' not supported")
         
-        # Classify
-        classification_result = self.classify(image_path, model_type)
+        # Release the full scene before the windowed classification pass
+        del image, X, y
+        
+        # Classify with this model, even if another request has trained one since
+        classification_result = self.classify(image_path, model_type, model_id=model_id)
         
         return {
+            'model_id': model_id,
+            'reused_model': False,
             'metrics': metrics,
             'classification': classification_result
         }
@@ -0,0 +1,246 @@
+"""
+Model Registry
+Trained models stored under versioned IDs with their training metadata,
+an in-memory index of that metadata, a retention cap on stored models and
+an in-memory, size-aware LRU of loaded models shared across requests
+
+Models are loaded with mmap_mode='r', which needs joblib's default
+uncompressed dumps: large NumPy arrays are mapped from the file instead of
+read into a buffer and copied, so a load makes no transient second copy.
+scikit-learn trees still copy their node arrays while unpickling, so each
+process ends up with its own copy of a forest.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import tempfile
+import threading
+from collections import OrderedDict
+import joblib
+
+MODEL_SUFFIX = '.pkl'
+METADATA_SUFFIX = '.json'
+MODEL_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class ModelRegistry:
+    def __init__(self, root_dir, max_models=4, max_bytes=1024 ** 3, max_stored=20,
+                 max_stored_bytes=2 * 1024 ** 3):
+        """
+        root_dir: Directory holding <model_id>.pkl and <model_id>.json files
+        max_models: Loaded models kept in memory
+        max_bytes: Memory budget for loaded models, measured by their file size;
+            least recently used models are dropped beyond either limit
+        max_stored: Models kept on disk
+        max_stored_bytes: Disk budget for stored models; the oldest models
+            that are not loaded are deleted beyond either limit
+        """
+        # Resolved once so the registry stays put if the working directory changes
+        self.root_dir = os.path.abspath(root_dir)
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.max_stored = max_stored
+        self.max_stored_bytes = max_stored_bytes
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._resident = OrderedDict()  # model_id -> (model, size), least recently used first
+        self._resident_bytes = 0
+        self._loads = {}  # model_id -> load time and memory of its last load
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._index = self._load_index()  # model_id -> metadata of every stored model
+
+    def _load_index(self):
+        """Metadata of the models on disk, read once at startup"""
+        index = {}
+        for name in os.listdir(self.root_dir):
+            if name.endswith(METADATA_SUFFIX):
+                model_id = name[:-len(METADATA_SUFFIX)]
+                if os.path.exists(os.path.join(self.root_dir, model_id + MODEL_SUFFIX)):
+                    try:
+                        with open(os.path.join(self.root_dir, name)) as f:
+                            index[model_id] = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+        return index
+
+    def model_path(self, model_id):
+        """Path of a model's joblib file; raises ValueError for unknown IDs"""
+        if not MODEL_ID_PATTERN.match(model_id or ''):
+            raise ValueError(f"Invalid model ID '{model_id}'")
+        path = os.path.join(self.root_dir, model_id + MODEL_SUFFIX)
+        if not os.path.exists(path):
+            raise ValueError(f"Model '{model_id}' not found")
+        return path
+
+    def register(self, model, model_type, metadata=None):
+        """Save a trained model under a new versioned ID and return the ID
+
+        metadata: JSON-serializable training details (feature bands,
+            normalization stats, sample counts, metrics, source image, ...)
+        """
+        model_id = f"{model_type}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(self.root_dir, model_id + MODEL_SUFFIX)
+
+        # Written to a temporary file and renamed, so readers never see a partial model
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(model, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        size = os.path.getsize(path)
+        # Round-tripped through JSON so the index holds what the file holds
+        info = json.loads(json.dumps(dict(metadata or {}, model_id=model_id, model_type=model_type,
+                                          created=time.time(), size_bytes=size),
+                                     default=_json_default))
+        self._write_metadata(model_id, info)
+
+        with self._lock:
+            self._index[model_id] = info
+            # A freshly trained model is about to be used; keep it warm
+            self._remember(model_id, model, size)
+            self._prune()
+        return model_id
+
+    def _write_metadata(self, model_id, info):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(info, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.root_dir, model_id + METADATA_SUFFIX))
+
+    def metadata(self, model_id):
+        self.model_path(model_id)
+        with self._lock:
+            return dict(self._index.get(model_id) or {'model_id': model_id})
+
+    def list_models(self, model_type=None):
+        """Metadata of the registered models, newest first"""
+        with self._lock:
+            models = [dict(info) for info in self._index.values()
+                      if model_type is None or info.get('model_type') == model_type]
+        return sorted(models, key=lambda info: info.get('created', 0), reverse=True)
+
+    def latest(self, model_type=None):
+        """ID of the newest registered model (of model_type), or None"""
+        models = self.list_models(model_type)
+        return models[0]['model_id'] if models else None
+
+    def get(self, model_id):
+        """The loaded model, from memory when it is resident"""
+        path = self.model_path(model_id)
+
+        with self._lock:
+            if model_id in self._resident:
+                self._resident.move_to_end(model_id)
+                self.hits += 1
+                return self._resident[model_id][0]
+            load_lock = self._load_locks.setdefault(model_id, threading.Lock())
+
+        # Concurrent requests for the same model wait for a single load
+        with load_lock:
+            with self._lock:
+                if model_id in self._resident:
+                    self._resident.move_to_end(model_id)
+                    self.hits += 1
+                    return self._resident[model_id][0]
+
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            model = joblib.load(path, mmap_mode='r')
+            load_seconds = time.perf_counter() - start
+            rss_after = _rss_bytes()
+
+            with self._lock:
+                self._loads[model_id] = {
+                    'load_seconds': round(load_seconds, 4),
+                    'rss_bytes': None if rss_before is None else rss_after - rss_before,
+                    'file_bytes': os.path.getsize(path)
+                }
+                self.misses += 1
+                self._remember(model_id, model, os.path.getsize(path))
+                self._load_locks.pop(model_id, None)
+        return model
+
+    def _remember(self, model_id, model, size):
+        """Make a model resident and evict down to the limits (lock held)
+
+        The newest model always stays, even if it alone exceeds max_bytes.
+        """
+        if model_id in self._resident:
+            self._resident_bytes -= self._resident.pop(model_id)[1]
+        self._resident[model_id] = (model, size)
+        self._resident_bytes += size
+
+        while len(self._resident) > 1 and (len(self._resident) > self.max_models or
+                                           self._resident_bytes > self.max_bytes):
+            _, (_, evicted_size) = self._resident.popitem(last=False)
+            self._resident_bytes -= evicted_size
+
+    def _prune(self):
+        """Delete the oldest stored models beyond the disk limits (lock held)
+
+        Loaded models are skipped, so a model a request is using (and the
+        newest one, which is always loaded) is never deleted under it.
+        """
+        stored = sorted(self._index.values(), key=lambda info: info.get('created', 0))
+        count = len(stored)
+        total = sum(info.get('size_bytes', 0) for info in stored)
+
+        for info in stored:
+            if count <= self.max_stored and total <= self.max_stored_bytes:
+                break
+            model_id = info['model_id']
+            if model_id in self._resident:
+                continue
+            for suffix in (MODEL_SUFFIX, METADATA_SUFFIX):
+                try:
+                    os.remove(os.path.join(self.root_dir, model_id + suffix))
+                except OSError:
+                    pass
+            del self._index[model_id]
+            self._loads.pop(model_id, None)
+            count -= 1
+            total -= info.get('size_bytes', 0)
+            self.pruned += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stored': len(self._index),
+                'stored_bytes': sum(info.get('size_bytes', 0) for info in self._index.values()),
+                'max_stored': self.max_stored,
+                'max_stored_bytes': self.max_stored_bytes,
+                'pruned': self.pruned,
+                'resident': list(self._resident),
+                'resident_bytes': self._resident_bytes,
+                'max_models': self.max_models,
+                'max_bytes': self.max_bytes,
+                'loads': dict(self._loads)
+            }
+
+
+def _rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _json_default(value):
+    """Serialize NumPy arrays and scalars in metadata"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
@@ -0,0 +1,133 @@
+"""
+Per-band Normalization
+Streaming per-band statistics, dtype-preserving normalization and a
+per-file statistics cache shared by training, labeling and inference
+"""
+
+import os
+import json
+import threading
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+STATS_SUFFIX = '.stats.json'
+
+_stats_cache = {}
+_stats_lock = threading.Lock()
+
+
+def compute_band_stats(X, block_size=1_000_000):
+    """Per-band min/max of (n_pixels, bands) in a single pass over pixel blocks"""
+    band_min = None
+    band_max = None
+
+    for start in range(0, X.shape[0], block_size):
+        block = X[start:start + block_size]
+        block_min = block.min(axis=0)
+        block_max = block.max(axis=0)
+        band_min = block_min if band_min is None else np.minimum(band_min, block_min)
+        band_max = block_max if band_max is None else np.maximum(band_max, block_max)
+
+    return {'min': band_min.astype(np.float64), 'max': band_max.astype(np.float64)}
+
+
+def compute_file_band_stats(image_path, block_size=1_000_000):
+    """Per-band min/max of a GeoTIFF, read in row strips of about block_size pixels"""
+    band_min = None
+    band_max = None
+
+    with rasterio.open(image_path) as src:
+        rows = max(1, block_size // src.width)
+        for row in range(0, src.height, rows):
+            window = Window(0, row, src.width, min(rows, src.height - row))
+            data = src.read(window=window)
+            block_min = data.min(axis=(1, 2))
+            block_max = data.max(axis=(1, 2))
+            band_min = block_min if band_min is None else np.minimum(band_min, block_min)
+            band_max = block_max if band_max is None else np.maximum(band_max, block_max)
+
+    return {'min': band_min.astype(np.float64), 'max': band_max.astype(np.float64)}
+
+
+def _file_signature(image_path):
+    """Identify a file version by path, size and modification time"""
+    stat = os.stat(image_path)
+    return [os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns]
+
+
+def get_band_stats(image_path, block_size=1_000_000):
+    """Per-band statistics for an exported file, cached in memory and in a sidecar JSON
+
+    Exports never change after they are written, so the statistics are
+    computed once per file and then reused by every trainer and classifier.
+    """
+    signature = _file_signature(image_path)
+    key = tuple(signature)
+
+    with _stats_lock:
+        if key in _stats_cache:
+            return _stats_cache[key]
+
+    sidecar_path = image_path + STATS_SUFFIX
+    stats = None
+
+    if os.path.exists(sidecar_path):
+        try:
+            with open(sidecar_path) as f:
+                cached = json.load(f)
+            if cached.get('signature') == signature:
+                stats = {'min': np.array(cached['min']), 'max': np.array(cached['max'])}
+        except (ValueError, KeyError, OSError):
+            stats = None
+
+    if stats is None:
+        stats = compute_file_band_stats(image_path, block_size)
+        try:
+            with open(sidecar_path, 'w') as f:
+                json.dump({
+                    'signature': signature,
+                    'min': stats['min'].tolist(),
+                    'max': stats['max'].tolist()
+                }, f)
+        except OSError as e:
+            print(f"Warning: could not write band stats cache {sidecar_path}: {e}")
+
+    with _stats_lock:
+        _stats_cache[key] = stats
+
+    return stats
+
+
+def stats_distance(reference, stats):
+    """Largest per-band min/max difference between two stats, as a fraction of reference's range
+
+    Both are {'min': [...], 'max': [...]} (lists or arrays); inf if their
+    band counts differ.
+    """
+    ref_min, ref_max = np.asarray(reference['min'], float), np.asarray(reference['max'], float)
+    band_min, band_max = np.asarray(stats['min'], float), np.asarray(stats['max'], float)
+    if ref_min.shape != band_min.shape:
+        return float('inf')
+
+    scale = np.maximum(ref_max - ref_min, 1e-8)
+    return float(np.max(np.maximum(np.abs(band_min - ref_min), np.abs(band_max - ref_max)) / scale))
+
+
+def normalize_bands(X, stats, dtype=np.float32, out=None):
+    """Normalize the last axis of X to 0-1 with per-band min/max
+
+    The result is written in `dtype` (float32 by default) instead of a
+    float64 copy. Pass out=X to normalize a float array in place.
+    """
+    if out is not None:
+        dtype = out.dtype
+
+    band_min = stats['min'].astype(dtype)
+    scale = (stats['max'] - stats['min'] + 1e-8).astype(dtype)
+
+    if out is None:
+        out = np.empty(X.shape, dtype=dtype)
+    np.subtract(X, band_min, out=out, casting='unsafe')
+    out /= scale
+    return out
@@ -0,0 +1,94 @@
+"""
+Parallel Raster Inference
+Shards a raster into windows and classifies them in a process pool whose
+workers each load the saved model once, read-only
+"""
+
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import joblib
+import rasterio
+from threadpoolctl import threadpool_limits
+
+from backend.raster_io import iter_windows, classified_profile
+from backend.features import encode_features
+
+# Workers start from a clean server process (or a fresh interpreter where
+# forkserver is unavailable), never by forking this multithreaded one, whose
+# held locks (logging, BLAS, sqlite) a forked child could inherit and deadlock on
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Per-worker state, set once by _init_worker
+_worker_model = None
+_worker_src = None
+_worker_encoding_stats = None
+
+
+def _init_worker(model_path, image_path, encoding_stats=None):
+    """Load the model (memory-mapped) and open the input once per worker process"""
+    global _worker_model, _worker_src, _worker_encoding_stats
+
+    _worker_model = joblib.load(model_path, mmap_mode='r')
+    # Parallelism comes from the pool; keep each worker single-threaded
+    if hasattr(_worker_model, 'n_jobs'):
+        _worker_model.n_jobs = 1
+    threadpool_limits(1)  # OpenMP models such as HistGradientBoostingClassifier
+
+    _worker_src = rasterio.open(image_path)
+    _worker_encoding_stats = encoding_stats
+
+
+def _predict_window(window):
+    """Read and classify one window inside a worker"""
+    block = _worker_src.read(window=window)
+    bands, height, width = block.shape
+
+    X = np.transpose(block, (1, 2, 0)).reshape(-1, bands)
+    predictions = _worker_model.predict(encode_features(X, _worker_encoding_stats)).astype(np.uint8)
+
+    return predictions.reshape(height, width)
+
+
+def classify_parallel(model_path, image_path, output_path, num_classes, tile_size=1024, workers=None,
+                      encoding_stats=None):
+    """Classify image_path with the joblib model at model_path using a process pool
+
+    encoding_stats: Band stats the model's uint8 features were quantized
+        with (None for a model trained on raw band values)
+
+    Windows are submitted in order with at most two in flight per worker and
+    written to output_path in that same order. Returns per-class pixel counts.
+    """
+    workers = workers or os.cpu_count()
+    counts = np.zeros(num_classes, dtype=np.int64)
+
+    with rasterio.open(image_path) as src:
+        profile = classified_profile(src.profile)
+        windows = iter_windows(src, tile_size)
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                                 initializer=_init_worker,
+                                 initargs=(model_path, image_path, encoding_stats)) as pool, \
+                rasterio.open(output_path, 'w', **profile) as dst:
+            pending = deque()
+
+            for window in windows:
+                pending.append((window, pool.submit(_predict_window, window)))
+
+                if len(pending) >= workers * 2:
+                    counts += _write_result(dst, *pending.popleft(), num_classes)
+
+            while pending:
+                counts += _write_result(dst, *pending.popleft(), num_classes)
+
+    return counts
+
+
+def _write_result(dst, window, future, num_classes):
+    """Write a finished window and return its class counts"""
+    predictions = future.result()
+    dst.write(predictions, 1, window=window)
+    return np.bincount(predictions.ravel(), minlength=num_classes)[:num_classes]
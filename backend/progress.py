@@ -0,0 +1,61 @@
+"""
+Progress Throttling
+Rate-limits progress updates per session, coalescing the ones in between
+while always delivering stage changes and completions
+"""
+
+import time
+
+
+class ProgressThrottle:
+    def __init__(self, emit, max_per_second=4, clock=time.monotonic):
+        """
+        emit: Called with each update dict that gets through
+        max_per_second: Updates allowed per second within a stage (0 = no limit)
+        clock: Time source, replaceable in tests
+        """
+        self.emit = emit
+        self.interval = 1.0 / max_per_second if max_per_second else 0
+        self.clock = clock
+        self.emitted = 0
+        self.coalesced = 0
+        self._last_emit = None
+        self._last_stage = None
+        self._pending = None
+
+    def __call__(self, update):
+        """Emit the update now, or hold it until a later one supersedes it
+
+        The first update of a stage and any update at 100% always go out
+        at once, preceded by a held update from another stage if there is one.
+        """
+        now = self.clock()
+        stage = update.get('stage')
+        forced = stage != self._last_stage or update.get('progress', 0) >= 100
+
+        if forced and self._pending is not None and self._pending.get('stage') != stage:
+            self.flush()
+
+        if forced or self._last_emit is None or now - self._last_emit >= self.interval:
+            self._drop_pending()
+            self._send(update, now)
+        else:
+            self._drop_pending()
+            self._pending = update
+
+    def flush(self):
+        """Deliver the held update, if any"""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._send(pending, self.clock())
+
+    def _drop_pending(self):
+        if self._pending is not None:
+            self._pending = None
+            self.coalesced += 1
+
+    def _send(self, update, now):
+        self._last_emit = now
+        self._last_stage = update.get('stage')
+        self.emitted += 1
+        self.emit(update)
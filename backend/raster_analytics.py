@@ -0,0 +1,204 @@
+"""
+Raster Analytics
+Single-pass, block-streaming spectral index statistics and masked areas
+for GeoTIFFs and in-memory scenes, mirroring the Earth Engine reductions
+"""
+
+import math
+import numpy as np
+import rasterio
+from rasterio.windows import Window, from_bounds as window_from_bounds
+
+# Band names assumed when a file has no band descriptions (Earth Engine export order)
+DEFAULT_BANDS = ['B4', 'B3', 'B2', 'B8', 'B11']
+
+EARTH_RADIUS = 6371008.8  # mean radius in meters
+
+# Normalized differences (a - b) / (a + b)
+NORMALIZED_DIFFERENCES = {
+    'NDVI': ('B8', 'B4'),
+    'NDWI': ('B3', 'B8'),
+    'NDBI': ('B11', 'B8'),
+    'NDMI': ('B8', 'B11'),
+}
+
+# Band ratios a / b
+RATIOS = {
+    'MSI': ('B11', 'B8'),
+}
+
+
+def index_bands(name):
+    """Bands an index needs"""
+    if name in NORMALIZED_DIFFERENCES:
+        return NORMALIZED_DIFFERENCES[name]
+    if name in RATIOS:
+        return RATIOS[name]
+    raise ValueError(f"Unknown index '{name}'")
+
+
+def compute_index(name, bands):
+    """Index values (float32, NaN where undefined) from {band name: array}"""
+    missing = [band for band in index_bands(name) if band not in bands]
+    if missing:
+        raise ValueError(f"{name} needs the {', '.join(missing)} band")
+    a, b = (bands[band].astype(np.float32, copy=False) for band in index_bands(name))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if name in RATIOS:
+            values = a / b
+        else:
+            values = (a - b) / (a + b)
+    values[~np.isfinite(values)] = np.nan
+    return values
+
+
+class RunningStats:
+    """Count, mean, variance, min and max merged block by block
+
+    Each block's statistics are folded in with Chan's parallel form of
+    Welford's update, so the result matches a single pass over all the
+    values without holding them in memory. NaNs are ignored.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        n = values.size
+        if n == 0:
+            return
+
+        block_mean = float(values.mean(dtype=np.float64))
+        block_m2 = float(np.square(values - block_mean, dtype=np.float64).sum())
+
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += block_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def as_dict(self, prefix):
+        """Earth Engine style {prefix_mean, prefix_min, prefix_max, prefix_stdDev}"""
+        if self.count == 0:
+            return {f'{prefix}_{key}': None for key in ('mean', 'min', 'max', 'stdDev')}
+        return {
+            f'{prefix}_mean': self.mean,
+            f'{prefix}_min': self.min,
+            f'{prefix}_max': self.max,
+            f'{prefix}_stdDev': math.sqrt(self.m2 / self.count)
+        }
+
+
+def pixel_areas(transform, crs, row_off, height):
+    """Area in m² of one pixel in each of `height` rows, shaped (height, 1)
+
+    For geographic coordinates the area shrinks with latitude and is the
+    exact spherical area of the row's cells; otherwise it is constant.
+    """
+    if crs is None or crs.is_geographic:
+        top = transform.f + transform.e * np.arange(row_off, row_off + height, dtype=np.float64)
+        bottom = top + transform.e
+        width = math.radians(abs(transform.a))
+        areas = EARTH_RADIUS ** 2 * width * np.abs(np.sin(np.radians(top)) - np.sin(np.radians(bottom)))
+        return areas[:, None]
+    return np.full((height, 1), abs(transform.a * transform.e))
+
+
+def analyze_blocks(blocks, transform, crs, indices=(), masks=None):
+    """Statistics of indices and areas of masks over (row_off, bands) blocks
+
+    indices: Index names whose mean/min/max/stdDev are wanted
+    masks: {name: (index, threshold)}; the area in m² where index > threshold
+        is returned under `name`, as Earth Engine's pixel-area sums are
+    """
+    masks = masks or {}
+    stats = {name: RunningStats() for name in indices}
+    areas = {name: 0.0 for name in masks}
+    pixel_count = 0
+
+    for row_off, bands in blocks:
+        height = next(iter(bands.values())).shape[0]
+        pixel_count += next(iter(bands.values())).size
+        values = {}
+
+        for name in set(indices) | {index for index, _ in masks.values()}:
+            values[name] = compute_index(name, bands)
+        for name in indices:
+            stats[name].update(values[name])
+
+        if masks:
+            row_areas = pixel_areas(transform, crs, row_off, height)
+            for name, (index, threshold) in masks.items():
+                with np.errstate(invalid='ignore'):
+                    areas[name] += float(((values[index] > threshold) * row_areas).sum())
+
+    result = {'pixel_count': pixel_count}
+    for name in indices:
+        result.update(stats[name].as_dict(name))
+    result.update(areas)
+    return result
+
+
+def _needed_bands(indices, masks):
+    needed = set()
+    for name in set(indices) | {index for index, _ in (masks or {}).values()}:
+        needed.update(index_bands(name))
+    return needed
+
+
+def analyze_raster(path, indices=(), masks=None, bounds=None, block_pixels=1_000_000):
+    """analyze_blocks over a GeoTIFF read in row strips of about block_pixels
+
+    Only the bands the indices need are read. With bounds, only the
+    window covering them is read.
+    """
+    needed = _needed_bands(indices, masks)
+
+    with rasterio.open(path) as src:
+        names = [desc or (DEFAULT_BANDS[i] if i < len(DEFAULT_BANDS) else f'band_{i + 1}')
+                 for i, desc in enumerate(src.descriptions)]
+        missing = needed - set(names)
+        if missing:
+            raise ValueError(f"{path} has no {', '.join(sorted(missing))} band")
+        band_indexes = {name: names.index(name) + 1 for name in needed}
+
+        window = Window(0, 0, src.width, src.height)
+        if bounds is not None:
+            window = window_from_bounds(bounds['west'], bounds['south'], bounds['east'],
+                                        bounds['north'], src.transform)
+            window = window.round_offsets().round_lengths().intersection(
+                Window(0, 0, src.width, src.height)
+            )
+        transform = src.window_transform(window)
+        rows = max(1, block_pixels // max(1, window.width))
+
+        def blocks():
+            for row in range(0, window.height, rows):
+                strip = Window(window.col_off, window.row_off + row, window.width,
+                               min(rows, window.height - row))
+                yield row, {name: src.read(i, window=strip) for name, i in band_indexes.items()}
+
+        return analyze_blocks(blocks(), transform, src.crs, indices, masks)
+
+
+def analyze_arrays(bands, transform, crs, indices=(), masks=None, block_pixels=1_000_000):
+    """analyze_blocks over in-memory {band name: (height, width)} arrays"""
+    needed = _needed_bands(indices, masks)
+    missing = needed - set(bands)
+    if missing:
+        raise ValueError(f"Scene has no {', '.join(sorted(missing))} band")
+    height, width = next(iter(bands.values())).shape
+    rows = max(1, block_pixels // width)
+
+    blocks = (
+        (row, {name: bands[name][row:row + rows] for name in needed})
+        for row in range(0, height, rows)
+    )
+    return analyze_blocks(blocks, transform, crs, indices, masks)
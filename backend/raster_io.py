@@ -0,0 +1,77 @@
+"""
+Raster I/O Helpers
+Window iteration, output profiles and Cloud-Optimized GeoTIFF writing
+"""
+
+import rasterio
+import rasterio.shutil
+from rasterio.io import MemoryFile
+from rasterio.windows import Window
+
+
+def iter_windows(src, tile_size=None):
+    """Yield read windows covering src
+
+    With tile_size, the raster is walked in tile_size x tile_size squares
+    (row-major); otherwise the file's native block windows are used.
+    """
+    if not tile_size:
+        for _, window in src.block_windows(1):
+            yield window
+        return
+
+    for row in range(0, src.height, tile_size):
+        for col in range(0, src.width, tile_size):
+            yield Window(col, row, min(tile_size, src.width - col), min(tile_size, src.height - row))
+
+
+def band_names(image_path):
+    """Band descriptions of a raster, band_<n> where a band has none"""
+    with rasterio.open(image_path) as src:
+        return [desc or f'band_{i + 1}' for i, desc in enumerate(src.descriptions)]
+
+
+def classified_profile(profile, block_size=256):
+    """Single-band uint8, internally tiled, uncompressed profile derived from an input profile"""
+    profile = profile.copy()
+    for key in ('compress', 'predictor', 'photometric'):
+        profile.pop(key, None)
+    profile.update(
+        dtype=rasterio.uint8,
+        count=1,
+        tiled=True,
+        blockxsize=block_size,
+        blockysize=block_size
+    )
+    return profile
+
+
+def write_cog(src, dst_path, compress='DEFLATE', overview_resampling='MODE', block_size=512):
+    """Copy a dataset (or path) to a tiled, compressed Cloud-Optimized GeoTIFF
+
+    GDAL's COG driver lays out the tiles and builds the internal overviews
+    (MODE keeps class values intact, NEAREST is the cheap alternative), so
+    tile servers and range requests only read the bytes they need.
+    """
+    rasterio.shutil.copy(
+        src, dst_path,
+        driver='COG',
+        COMPRESS=compress,
+        BLOCKSIZE=block_size,
+        OVERVIEW_RESAMPLING=overview_resampling,
+        OVERVIEWS='AUTO'
+    )
+    return dst_path
+
+
+def write_classified_cog(classified_image, profile, output_path, **cog_options):
+    """Write an in-memory class array as a COG (see write_cog)"""
+    profile = classified_profile(profile)
+
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dataset:
+            dataset.write(classified_image.astype(rasterio.uint8), 1)
+        with memfile.open() as dataset:
+            write_cog(dataset, output_path, **cog_options)
+
+    return output_path
@@ -6,20 +6,34 @@ Trains model and sends progress updates via WebSocket
 import numpy as np
 import rasterio
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-import joblib
 import os
 import json
+import time
 from datetime import datetime
+from config import Config
+from backend.labeling import iter_label_blocks
+from backend.normalization import compute_band_stats, get_band_stats
+from backend.sampling import stratified_sample
+from backend.colorize import build_palette, paletted_image
+from backend.raster_io import band_names, write_classified_cog
+from backend.model_registry import ModelRegistry
+from backend.progress import ProgressThrottle
+from backend.features import UINT8_ENCODING, encode_features, model_encoding_stats
 
 class RealtimeTrainer:
-    def __init__(self, progress_callback=None):
+    def __init__(self, progress_callback=None, registry=None):
         """
         Initialize real-time trainer
         progress_callback: Function to call with progress updates
+        registry: ModelRegistry the trained model is saved to (by default one
+            over Config.MODELS_DIR)
         """
         self.progress_callback = progress_callback
+        self.registry = registry or ModelRegistry(Config.MODELS_DIR, Config.MODEL_CACHE_ENTRIES,
+                                                  Config.MODEL_CACHE_BYTES, Config.MODEL_STORE_ENTRIES,
+                                                  Config.MODEL_STORE_BYTES)
         self.model = None
+        self.model_id = None
         self.class_names = ['Water', 'Forest', 'Grassland', 'Urban', 'Barren', 'Agriculture']
         self.class_colors = {
             0: [52, 152, 219],   # Water - Blue
@@ -29,21 +43,24 @@ class RealtimeTrainer:
             4: [149, 165, 166],  # Barren - Gray
             5: [243, 156, 18]    # Agriculture - Orange
         }
+        self.palette = build_palette(self.class_colors)
+        self.throttle = ProgressThrottle(self._deliver, Config.PROGRESS_EVENTS_PER_SECOND)
     
     def send_progress(self, stage, progress, message, data=None):
-        """Send progress update"""
-        update = {
+        """Send progress update (rate-limited; stage changes and completions always go out)"""
+        self.throttle({
             'stage': stage,
             'progress': progress,
             'message': message,
             'timestamp': datetime.now().isoformat(),
             'data': data or {}
-        }
-        
+        })
+    
+    def _deliver(self, update):
         if self.progress_callback:
             self.progress_callback(update)
         
-        print(f"[{stage}] {progress}% - {message}")
+        print(f"[{update['stage']}] {update['progress']}% - {update['message']}")
     
     def load_and_prepare_data(self, image_path):
         """Load image and prepare training data with progress updates"""
@@ -68,75 +85,59 @@ class RealtimeTrainer:
         self.send_progress('loading', 75, 'Preparing training data...')
         
         # Generate labels based on spectral characteristics
-        y = self.generate_labels_with_progress(X)
+        stats = get_band_stats(image_path)
+        y = self.generate_labels_with_progress(X, stats)
         
         self.send_progress('loading', 100, 'Data preparation complete!')
         
         return X, y, image, profile, transform, bounds
     
-    def generate_labels_with_progress(self, X):
+    def generate_labels_with_progress(self, X, stats=None):
         """Generate synthetic labels with progress updates"""
         
         self.send_progress('labeling', 0, 'Generating training labels...')
         
-        labels = np.zeros(X.shape[0], dtype=int)
         total_pixels = X.shape[0]
+        labels = np.empty(total_pixels, dtype=np.uint8)  # class ids, one byte a pixel
+        counts = np.zeros(len(self.class_names), dtype=np.int64)
         
-        # Normalize bands
-        X_norm = (X - np.min(X, axis=0)) / (np.max(X, axis=0) - np.min(X, axis=0) + 1e-8)
-        
-        # Process in chunks for progress updates
-        chunk_size = total_pixels // 10
+        # Per-band min/max, then normalize and label one block at a time
+        if stats is None:
+            stats = compute_band_stats(X, Config.LABEL_BLOCK_SIZE)
         
-        for i in range(0, total_pixels, chunk_size):
-            end_idx = min(i + chunk_size, total_pixels)
-            
-            for j in range(i, end_idx):
-                if X.shape[1] >= 4:
-                    red = X_norm[j, 0]
-                    green = X_norm[j, 1]
-                    blue = X_norm[j, 2]
-                    nir = X_norm[j, 3]
-                    
-                    # Calculate indices
-                    ndvi = (nir - red) / (nir + red + 1e-8)
-                    ndwi = (green - nir) / (green + nir + 1e-8)
-                    
-                    # Classification rules
-                    if ndwi > 0.3:
-                        labels[j] = 0  # Water
-                    elif ndvi > 0.6:
-                        labels[j] = 1  # Forest
-                    elif ndvi > 0.3:
-                        labels[j] = 2  # Grassland
-                    elif red > 0.3 and green > 0.3 and blue > 0.3:
-                        labels[j] = 3  # Urban
-                    elif ndvi < 0.1:
-                        labels[j] = 4  # Barren
-                    else:
-                        labels[j] = 5  # Agriculture
+        last_update = time.monotonic()
+        for start, end, block_labels in iter_label_blocks(X, stats, Config.LABEL_BLOCK_SIZE):
+            labels[start:end] = block_labels
+            counts += np.bincount(block_labels, minlength=len(self.class_names))
             
-            progress = int((end_idx / total_pixels) * 100)
-            self.send_progress('labeling', progress, f'Labeled {end_idx:,} / {total_pixels:,} pixels')
+            now = time.monotonic()
+            if now - last_update >= Config.PROGRESS_INTERVAL and end < total_pixels:
+                last_update = now
+                progress = int((end / total_pixels) * 100)
+                self.send_progress('labeling', progress, f'Labeled {end:,} / {total_pixels:,} pixels')
         
         # Calculate class distribution
-        unique, counts = np.unique(labels, return_counts=True)
-        class_dist = {self.class_names[i]: int(counts[np.where(unique == i)[0][0]]) 
-                      for i in unique if i < len(self.class_names)}
+        class_dist = {self.class_names[i]: int(count) for i, count in enumerate(counts) if count > 0}
         
         self.send_progress('labeling', 100, 'Label generation complete!', 
                           {'class_distribution': class_dist})
         
         return labels
     
-    def train_model_with_progress(self, X, y):
-        """Train Random Forest model with progress updates"""
+    def train_model_with_progress(self, X, y, metadata=None):
+        """Train Random Forest model with progress updates and register it
+        
+        Only the sampled rows of X are encoded, as metadata's feature_encoding asks.
+        """
         
-        self.send_progress('splitting', 0, 'Splitting data into train/test sets...')
+        self.send_progress('splitting', 0, 'Sampling train/test pixels per class...')
         
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
+        train_idx, test_idx = stratified_sample(
+            y, Config.TRAINING_SAMPLES_PER_CLASS, Config.EVALUATION_SAMPLES_PER_CLASS, Config.SAMPLING_SEED
         )
+        encoding_stats = model_encoding_stats(metadata or {})
+        X_train, y_train = encode_features(X[train_idx], encoding_stats), y[train_idx]
+        X_test, y_test = encode_features(X[test_idx], encoding_stats), y[test_idx]
         
         self.send_progress('splitting', 100, 
                           f'Train: {len(X_train):,} samples, Test: {len(X_test):,} samples')
@@ -147,8 +148,10 @@ class RealtimeTrainer:
         self.model = RandomForestClassifier(
             n_estimators=100,
             max_depth=20,
+            min_samples_leaf=Config.RF_MIN_SAMPLES_LEAF,
+            max_leaf_nodes=Config.RF_MAX_LEAF_NODES,
             random_state=42,
-            n_jobs=-1,
+            n_jobs=Config.THREADS_PER_JOB,
             verbose=0
         )
         
@@ -179,26 +182,32 @@ class RealtimeTrainer:
         
         self.send_progress('training', 100, 'Model evaluation complete!', {'metrics': metrics})
         
-        # Save model
-        model_path = os.path.join('models', 'saved_models', 'random_forest_realtime.pkl')
-        joblib.dump(self.model, model_path)
+        # Save model under its own versioned ID
+        self.model_id = self.registry.register(self.model, 'random_forest', dict(
+            metadata or {},
+            params=self.model.get_params(),
+            class_names=self.class_names,
+            training_samples=int(len(X_train)),
+            evaluation_samples=int(len(X_test)),
+            metrics=metrics
+        ))
         
-        self.send_progress('saving', 100, f'Model saved to {model_path}')
+        self.send_progress('saving', 100, f'Model saved as {self.model_id}', {'model_id': self.model_id})
         
         return metrics
     
-    def classify_with_progress(self, X, image_shape):
-        """Classify image with progress updates"""
+    def classify_with_progress(self, X, image_shape, encoding_stats=None):
+        """Classify image with progress updates, encoding each chunk with encoding_stats"""
         
         self.send_progress('classifying', 0, 'Starting classification...')
         
         total_pixels = X.shape[0]
-        chunk_size = total_pixels // 10
-        predictions = np.zeros(total_pixels, dtype=int)
+        chunk_size = max(1, -(-total_pixels // 10))  # ten chunks, at least one pixel each
+        predictions = np.zeros(total_pixels, dtype=np.uint8)
         
         for i in range(0, total_pixels, chunk_size):
             end_idx = min(i + chunk_size, total_pixels)
-            predictions[i:end_idx] = self.model.predict(X[i:end_idx])
+            predictions[i:end_idx] = self.model.predict(encode_features(X[i:end_idx], encoding_stats))
             
             progress = int((end_idx / total_pixels) * 100)
             self.send_progress('classifying', progress, 
@@ -222,10 +231,10 @@ class RealtimeTrainer:
         
         self.send_progress('saving', 0, 'Saving classified image...')
         
-        profile.update(dtype=rasterio.uint8, count=1)
-        
-        with rasterio.open(output_path, 'w', **profile) as dst:
-            dst.write(classified_image.astype(rasterio.uint8), 1)
+        write_classified_cog(classified_image, profile, output_path,
+                             compress=Config.COG_COMPRESSION,
+                             overview_resampling=Config.COG_OVERVIEW_RESAMPLING,
+                             block_size=Config.COG_BLOCK_SIZE)
         
         self.send_progress('saving', 100, f'Classified image saved to {output_path}')
         
@@ -238,18 +247,11 @@ class RealtimeTrainer:
         
         os.makedirs(output_dir, exist_ok=True)
         
-        # Create RGB image from classified data
+        # Paletted image from classified data (one byte per pixel)
         height, width = classified_image.shape
-        rgb_image = np.zeros((height, width, 3), dtype=np.uint8)
-        
-        for class_id, color in self.class_colors.items():
-            mask = classified_image == class_id
-            rgb_image[mask] = color
+        img = paletted_image(classified_image, self.palette)
         
         # Save as PNG for web display
-        from PIL import Image
-        img = Image.fromarray(rgb_image, 'RGB')
-        
         tile_path = os.path.join(output_dir, 'classification_overlay.png')
         img.save(tile_path)
         
@@ -286,11 +288,22 @@ class RealtimeTrainer:
         # 1. Load and prepare data
         X, y, image, profile, transform, bounds = self.load_and_prepare_data(image_path)
         
+        metadata = {
+            'source_image': image_path,
+            'bands': band_names(image_path),
+            'band_stats': get_band_stats(image_path)
+        }
+        image_shape = image.shape
+        if Config.FEATURE_ENCODING == UINT8_ENCODING:
+            # Train and classify on one byte per band, quantizing sampled rows and
+            # prediction chunks as they are used rather than copying the scene
+            metadata['feature_encoding'] = UINT8_ENCODING
+        
         # 2. Train model
-        metrics = self.train_model_with_progress(X, y)
+        metrics = self.train_model_with_progress(X, y, metadata)
         
         # 3. Classify
-        classified_image, class_dist = self.classify_with_progress(X, image.shape)
+        classified_image, class_dist = self.classify_with_progress(X, image_shape, model_encoding_stats(metadata))
         
         # 4. Save classified image
         saved_path = self.save_classified_image(classified_image, profile, output_path)
@@ -299,6 +312,7 @@ class RealtimeTrainer:
         tile_path, metadata = self.generate_map_tiles(classified_image, bounds)
         
         self.send_progress('complete', 100, 'Workflow complete!', {
+            'model_id': self.model_id,
             'metrics': metrics,
             'class_distribution': class_dist,
             'output_path': saved_path,
@@ -307,6 +321,7 @@ class RealtimeTrainer:
         })
         
         return {
+            'model_id': self.model_id,
             'metrics': metrics,
             'classification': {
                 'output_path': saved_path,
@@ -0,0 +1,191 @@
+"""
+Analysis Result Cache
+Two-tier (in-process LRU + on-disk SQLite) cache for Earth Engine analysis
+results, keyed by normalized AOI, dates and analysis parameters
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+
+
+def normalize_bounds(bounds, tolerance):
+    """AOI bounds rounded to a multiple of tolerance degrees"""
+    return {
+        side: round(round(float(bounds[side]) / tolerance) * tolerance, 10)
+        for side in ('north', 'south', 'east', 'west')
+    }
+
+
+def json_safe(value):
+    """Copy of a result keeping only JSON-serializable values
+
+    Analysis results also carry lazy ee.Image objects, which can be neither
+    stored nor returned through jsonify; they are dropped.
+    """
+    if isinstance(value, dict):
+        return {str(k): json_safe(v) for k, v in value.items() if _is_plain(v)}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value if _is_plain(v)]
+    return value
+
+
+def _is_plain(value):
+    if isinstance(value, (dict, list, tuple)):
+        return True
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+class SQLiteStore:
+    """On-disk result store shared by all worker processes"""
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, value TEXT, expires_at REAL, accessed_at REAL)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        """(value, expires_at) for key, or None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT value, expires_at FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                conn.execute('DELETE FROM results WHERE key = ?', (key,))
+                return None
+            conn.execute('UPDATE results SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO results (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), expires_at, time.time())
+            )
+            conn.execute('DELETE FROM results WHERE expires_at < ?', (time.time(),))
+            conn.execute(
+                'DELETE FROM results WHERE key NOT IN '
+                '(SELECT key FROM results ORDER BY accessed_at DESC LIMIT ?)',
+                (self.max_entries,)
+            )
+
+
+class ResultCache:
+    def __init__(self, disk_store=None, max_entries=256, ttl=86400, bounds_tolerance=1e-4):
+        """
+        disk_store: Optional persistent store (e.g. SQLiteStore) behind the in-process LRU
+        max_entries: Number of results kept in memory
+        ttl: Default seconds before a result expires
+        bounds_tolerance: AOI coordinates are rounded to this many degrees for the key
+        """
+        self.disk_store = disk_store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bounds_tolerance = bounds_tolerance
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def make_key(self, analysis, bounds, params=()):
+        """Stable key from the analysis name, rounded bounds and parameters"""
+        rounded = normalize_bounds(bounds, self.bounds_tolerance)
+        payload = json.dumps([analysis, rounded, list(params)], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] >= time.time():
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+        entry = self.disk_store.get(key) if self.disk_store else None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, *entry)
+        return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self.disk_store:
+            self.disk_store.set(key, value, expires_at)
+
+    def _remember(self, key, value, expires_at):
+        """Insert into the memory LRU (lock held)"""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_or_compute(self, analysis, bounds, params, compute, ttl=None):
+        """Cached JSON-safe result of compute(), computing and storing it on a miss"""
+        key = self.make_key(analysis, bounds, params)
+        value = self.get(key)
+        if value is None:
+            value = json_safe(compute())
+            self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        """Hit/miss counters"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+                'persistent': self.disk_store is not None
+            }
+
+
+def cached_analysis(analysis, ttl=None):
+    """Cache a GEEHandler method(bounds, ...) in self.result_cache
+
+    The key covers the bounds plus every other argument, defaults included.
+    A hit returns the stored result without touching Earth Engine; results
+    are returned in JSON-safe form whether they were cached or not.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, bounds, *args, **kwargs):
+            cache = getattr(self, 'result_cache', None)
+            if cache is None:
+                return json_safe(method(self, bounds, *args, **kwargs))
+
+            bound = signature.bind(self, bounds, *args, **kwargs)
+            bound.apply_defaults()
+            params = list(bound.arguments.items())[2:]
+
+            return cache.get_or_compute(analysis, bounds, params,
+                                        lambda: method(self, bounds, *args, **kwargs), ttl)
+        return wrapper
+    return decorator
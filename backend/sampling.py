@@ -0,0 +1,40 @@
+"""
+Training Data Sampling
+Class-stratified, size-capped pixel samples for model training
+"""
+
+import numpy as np
+
+
+def stratified_sample(y, samples_per_class, eval_samples_per_class, seed=42):
+    """Draw disjoint training and evaluation pixel indices per class
+
+    Up to samples_per_class pixels of every class are used for training and
+    up to eval_samples_per_class more are held out for evaluation, so the
+    training set size no longer grows with the scene. Classes with fewer
+    pixels than requested are split between the two in the same ratio,
+    holding out at least one pixel of every class that has two or more.
+
+    Returns (train_idx, eval_idx) as sorted index arrays into y.
+    """
+    rng = np.random.default_rng(seed)
+    train_idx = []
+    eval_idx = []
+    eval_fraction = eval_samples_per_class / float(samples_per_class + eval_samples_per_class)
+
+    for cls in np.unique(y):
+        class_idx = np.flatnonzero(y == cls)
+        n_train = samples_per_class
+        n_eval = eval_samples_per_class
+
+        if len(class_idx) < n_train + n_eval:
+            n_eval = int(len(class_idx) * eval_fraction)
+            if n_eval == 0 and eval_samples_per_class > 0 and len(class_idx) > 1:
+                n_eval = 1
+            n_train = len(class_idx) - n_eval
+
+        chosen = rng.choice(class_idx, size=n_train + n_eval, replace=False)
+        train_idx.append(chosen[:n_train])
+        eval_idx.append(chosen[n_train:])
+
+    return np.sort(np.concatenate(train_idx)), np.sort(np.concatenate(eval_idx))
@@ -0,0 +1,154 @@
+"""
+Rendered Tile Cache
+On-disk cache of rendered PNGs keyed by source file content and render
+parameters, with a byte budget and least-recently-used eviction
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+FILE_HASH_ENTRIES = 1024  # source file hashes remembered
+STALE_TMP_SECONDS = 3600  # temp files older than this were left by a failed write
+
+
+class TileCache:
+    def __init__(self, cache_dir, max_bytes):
+        """
+        cache_dir: Directory holding one <key>.png file per rendered tile
+        max_bytes: Total size budget; least recently used entries are evicted beyond it
+        """
+        # Resolved once so the cache stays put if the working directory changes
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._total_bytes = 0
+        self._file_hashes = OrderedDict()  # (path, size, mtime) -> hash, least recently used first
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU order from files left by earlier runs (oldest mtime first)
+
+        Temporary files from writes that never finished are deleted; recent
+        ones are left alone in case another worker is still writing them.
+        """
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                if name.endswith('.png'):
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+                elif name.endswith('.tmp') and now - stat.st_mtime > STALE_TMP_SECONDS:
+                    os.remove(path)
+            except OSError:
+                continue
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+        with self._lock:
+            self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.png')
+
+    def file_hash(self, file_path):
+        """SHA-256 of a file's content, computed once per (path, size, mtime)"""
+        stat = os.stat(file_path)
+        signature = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            if signature in self._file_hashes:
+                self._file_hashes.move_to_end(signature)
+                return self._file_hashes[signature]
+
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+
+        with self._lock:
+            self._file_hashes[signature] = digest.hexdigest()
+            while len(self._file_hashes) > FILE_HASH_ENTRIES:
+                self._file_hashes.popitem(last=False)
+        return digest.hexdigest()
+
+    def key(self, file_path, *params):
+        """Cache key (also used as a strong ETag) for rendering file_path with params"""
+        payload = json.dumps([self.file_hash(file_path), list(params)])
+        return hashlib.sha256(payload.encode()).hexdigest()[:40]
+
+    def get(self, key):
+        """Cached bytes for key, or None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            # Removed behind our back (e.g. evicted by another worker)
+            with self._lock:
+                size = self._entries.pop(key, 0)
+                self._total_bytes -= size
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store bytes for key atomically and evict down to the byte budget"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until under budget (lock held)"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,103 @@
+"""
+Tiled Exports
+Splits an AOI into a pixel-aligned grid of sub-requests small enough for
+the Earth Engine download limit, fetches them concurrently and mosaics
+them into a single tiled GeoTIFF
+"""
+
+import os
+import math
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import rasterio
+from rasterio.transform import Affine
+from rasterio.windows import Window
+
+from backend.downloader import download_file
+
+# Earth Engine treats `scale` in EPSG:4326 as meters at the equator
+METERS_PER_DEGREE = 111319.49079327357
+
+
+def plan_grid(bounds, scale, tile_pixels):
+    """Pixel grid covering bounds at scale (m) split into tile_pixels squares
+
+    Returns (transform, width, height, windows). The grid origin is snapped
+    to a multiple of the pixel size so neighbouring tiles share edges
+    exactly and the mosaic has no seams or overlaps.
+    """
+    res = scale / METERS_PER_DEGREE
+    west = math.floor(bounds['west'] / res) * res
+    north = math.ceil(bounds['north'] / res) * res
+    width = max(1, math.ceil((bounds['east'] - west) / res))
+    height = max(1, math.ceil((north - bounds['south']) / res))
+
+    transform = Affine(res, 0, west, 0, -res, north)
+    windows = [
+        Window(col, row, min(tile_pixels, width - col), min(tile_pixels, height - row))
+        for row in range(0, height, tile_pixels)
+        for col in range(0, width, tile_pixels)
+    ]
+    return transform, width, height, windows
+
+
+def tile_request(transform, window):
+    """crs_transform and dimensions selecting window of the grid"""
+    x, y = transform * (window.col_off, window.row_off)
+    return {
+        'crs': 'EPSG:4326',
+        'crs_transform': [transform.a, 0, x, 0, transform.e, y],
+        'dimensions': f'{window.width}x{window.height}'
+    }
+
+
+def download_tiled(tile_url, output_path, transform, width, height, windows,
+                   workers=4, progress_callback=None):
+    """Fetch every window concurrently and mosaic them into output_path
+
+    tile_url(window) returns the download URL of one window; it and the
+    download run in a pool of `workers` threads, while this thread writes
+    each finished tile into its place in a tiled GeoTIFF and deletes it.
+    Downloads do not wait for the mosaic, so when writing falls behind,
+    finished tiles queue up on disk (in the worst case the whole scene)
+    until they are written.
+    """
+    tile_dir = tempfile.mkdtemp(dir=os.path.dirname(output_path) or '.', suffix='.tiles')
+    dst = None
+
+    def fetch(index, window):
+        path = os.path.join(tile_dir, f'{index}.tif')
+        download_file(tile_url(window), path)
+        return window, path
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(fetch, i, window) for i, window in enumerate(windows)]
+
+        for done, future in enumerate(as_completed(futures), 1):
+            window, path = future.result()
+
+            with rasterio.open(path) as src:
+                if dst is None:
+                    dst = rasterio.open(
+                        output_path, 'w', driver='GTiff', width=width, height=height,
+                        count=src.count, dtype=src.dtypes[0], crs=src.crs, transform=transform,
+                        tiled=True, blockxsize=512, blockysize=512, compress='deflate',
+                        BIGTIFF='IF_SAFER'
+                    )
+                dst.write(src.read(), window=window)
+            os.remove(path)
+
+            if progress_callback:
+                progress_callback('downloading', int(done * 100 / len(windows)),
+                                  f'Downloaded tile {done}/{len(windows)}',
+                                  {'tiles_done': done, 'tiles_total': len(windows)})
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if dst is not None:
+            dst.close()
+        shutil.rmtree(tile_dir, ignore_errors=True)
+
+    return output_path
@@ -0,0 +1,86 @@
+"""
+XYZ Map Tiles
+Renders 256x256 Web Mercator tiles from classified GeoTIFFs, reading only
+the window (and overview level) a tile needs
+"""
+
+import math
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_bounds
+from rasterio.warp import reproject, transform_bounds
+from rasterio.windows import Window, from_bounds as window_from_bounds
+
+from backend.colorize import MAP_PALETTE, render_png
+
+TILE_SIZE = 256
+# Palette index for pixels outside the raster, rendered transparent
+TRANSPARENT_INDEX = 255
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+
+def tile_bounds(z, x, y):
+    """Web Mercator (left, bottom, right, top) of an XYZ tile"""
+    tile_span = 2 * WEB_MERCATOR_EXTENT / (2 ** z)
+    left = -WEB_MERCATOR_EXTENT + x * tile_span
+    top = WEB_MERCATOR_EXTENT - y * tile_span
+    return left, top - tile_span, left + tile_span, top
+
+
+def is_valid_tile(z, x, y):
+    """Whether z/x/y addresses an existing tile"""
+    return 0 <= z <= 30 and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def read_tile(src, z, x, y, tile_size=TILE_SIZE):
+    """Class values of one tile as a (tile_size, tile_size) uint8 array
+
+    The tile footprint is mapped into the source grid, only that window is
+    read, and it is decimated to roughly tile resolution during the read so
+    GDAL can serve zoomed-out tiles from overviews. The small result is then
+    reprojected onto the tile grid.
+    """
+    bounds = tile_bounds(z, x, y)
+    tile = np.full((tile_size, tile_size), TRANSPARENT_INDEX, dtype=np.uint8)
+
+    src_bounds = transform_bounds('EPSG:3857', src.crs, *bounds, densify_pts=21)
+    footprint = window_from_bounds(*src_bounds, transform=src.transform)
+
+    col_off = max(0, math.floor(footprint.col_off))
+    row_off = max(0, math.floor(footprint.row_off))
+    col_end = min(src.width, math.ceil(footprint.col_off + footprint.width))
+    row_end = min(src.height, math.ceil(footprint.row_off + footprint.height))
+    if col_end <= col_off or row_end <= row_off:
+        return tile
+    window = Window(col_off, row_off, col_end - col_off, row_end - row_off)
+
+    # Source pixels per tile pixel; only ever decimate, never upsample the read
+    ratio = max(1.0, min(footprint.width, footprint.height) / tile_size)
+    out_height = max(1, int(round(window.height / ratio)))
+    out_width = max(1, int(round(window.width / ratio)))
+
+    data = src.read(1, window=window, out_shape=(out_height, out_width), resampling=Resampling.nearest)
+    read_transform = src.window_transform(window) * rasterio.Affine.scale(
+        window.width / out_width, window.height / out_height
+    )
+
+    reproject(
+        source=data,
+        destination=tile,
+        src_transform=read_transform,
+        src_crs=src.crs,
+        src_nodata=src.nodata,
+        dst_transform=from_bounds(*bounds, tile_size, tile_size),
+        dst_crs='EPSG:3857',
+        dst_nodata=TRANSPARENT_INDEX,
+        resampling=Resampling.nearest
+    )
+    return tile
+
+
+def render_tile(file_path, z, x, y, palette=MAP_PALETTE):
+    """PNG bytes of one XYZ tile of a classified GeoTIFF"""
+    with rasterio.open(file_path) as src:
+        tile = read_tile(src, z, x, y)
+    return render_png(tile, palette, transparent_index=TRANSPARENT_INDEX)
@@ -1,6 +1,8 @@
 import os
+import uuid
 import numpy as np
 from datetime import datetime
+from backend.normalization import compute_band_stats, normalize_bands
 
 def create_directories():
     """Create necessary directories for the project"""
@@ -9,13 +11,25 @@ def create_directories():
         os.makedirs(directory, exist_ok=True)
 
 def generate_filename(prefix, extension='tif'):
-    """Generate unique filename with timestamp"""
+    """Generate unique filename with timestamp
+
+    A random suffix keeps names distinct for requests finishing in the same second.
+    """
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    return f"{prefix}_{timestamp}.{extension}"
+    return f"{prefix}_{timestamp}_{uuid.uuid4().hex[:8]}.{extension}"
+
+def rectangle_area_sqkm(bounds):
+    """Area (km²) of a lat/lon rectangle on a spherical Earth"""
+    radius = 6371.0088  # mean Earth radius in km
+    width = np.radians(abs(bounds['east'] - bounds['west']))
+    height = abs(np.sin(np.radians(bounds['north'])) - np.sin(np.radians(bounds['south'])))
+    return float(radius ** 2 * width * height)
 
-def normalize_image(image):
-    """Normalize image data to 0-1 range"""
-    return (image - np.min(image)) / (np.max(image) - np.min(image) + 1e-8)
+def normalize_image(image, stats=None, dtype=np.float32):
+    """Normalize image data to 0-1 range per band (last axis)"""
+    if stats is None:
+        stats = compute_band_stats(image.reshape(-1, image.shape[-1]))
+    return normalize_bands(image, stats, dtype=dtype)
 
 def calculate_metrics(y_true, y_pred):
     """Calculate classification metrics"""
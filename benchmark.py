@@ -0,0 +1,373 @@
+"""
+Performance benchmarks for the processing pipeline
+Run with: python benchmark.py <name> [int arguments]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+from backend.labeling import spectral_labels
+from backend.utils import normalize_image
+
+
+def timed(func, *args, **kwargs):
+    """Run func once and return (result, seconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _loop_labels(X_norm):
+    """Original per-pixel labeling loop (baseline)"""
+    labels = np.zeros(X_norm.shape[0], dtype=int)
+    for i in range(X_norm.shape[0]):
+        red, green, blue, nir = X_norm[i, 0], X_norm[i, 1], X_norm[i, 2], X_norm[i, 3]
+        ndvi = (nir - red) / (nir + red + 1e-8)
+        ndwi = (green - nir) / (green + nir + 1e-8)
+        if ndwi > 0.3:
+            labels[i] = 0
+        elif ndvi > 0.6:
+            labels[i] = 1
+        elif ndvi > 0.3:
+            labels[i] = 2
+        elif red > 0.3 and green > 0.3 and blue > 0.3:
+            labels[i] = 3
+        elif ndvi < 0.1:
+            labels[i] = 4
+        else:
+            labels[i] = 5
+    return labels
+
+
+def bench_labeling(*sizes, loop_sample=1_000_000):
+    """Vectorized vs per-pixel labeling
+
+    The loop is timed on at most `loop_sample` pixels and extrapolated
+    linearly, otherwise the 50M case alone takes the better part of an hour.
+    """
+    sizes = sizes or (1_000_000, 10_000_000, 50_000_000)
+    rng = np.random.default_rng(42)
+
+    print(f"{'pixels':>12} {'loop (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+    for n_pixels in sizes:
+        X = rng.integers(0, 10000, size=(n_pixels, 4), dtype=np.uint16)
+        X_norm = normalize_image(X)
+
+        labels, vec_time = timed(spectral_labels, X_norm)
+
+        sample = min(n_pixels, loop_sample)
+        loop_labels, loop_time = timed(_loop_labels, X_norm[:sample])
+        assert np.array_equal(loop_labels, labels[:sample]), 'labels differ'
+        loop_time *= n_pixels / sample
+
+        marker = '' if sample == n_pixels else '*'
+        print(f"{n_pixels:>12,} {loop_time:>11.1f}{marker:1} {vec_time:>15.2f} {loop_time / vec_time:>8.0f}x")
+
+        del X, X_norm, labels
+
+    print(f"* extrapolated from a {loop_sample:,} pixel run")
+
+
+def write_synthetic_raster(path, size, bands=4, block_rows=1024, seed=0):
+    """Write a size x size uint16 GeoTIFF of smooth random land cover, strip by strip"""
+    import rasterio
+    from rasterio.transform import from_bounds
+
+    rng = np.random.default_rng(seed)
+    profile = {
+        'driver': 'GTiff', 'height': size, 'width': size, 'count': bands, 'dtype': 'uint16',
+        'crs': 'EPSG:4326', 'transform': from_bounds(72.5, 23.0, 73.0, 23.5, size, size),
+        'tiled': True, 'blockxsize': 256, 'blockysize': 256
+    }
+    # A small palette of per-band reflectance profiles, one per "surface"
+    surfaces = rng.integers(200, 6000, size=(16, bands))
+
+    with rasterio.open(path, 'w', **profile) as dst:
+        for row in range(0, size, block_rows):
+            rows = min(block_rows, size - row)
+            patch = rng.integers(0, len(surfaces), size=(rows // 64 + 1, size // 64 + 1))
+            patch = np.kron(patch, np.ones((64, 64), dtype=int))[:rows, :size]
+            noise = rng.integers(0, 400, size=(bands, rows, size))
+            data = np.moveaxis(surfaces[patch], -1, 0) + noise
+            dst.write(data.astype(np.uint16), window=rasterio.windows.Window(0, row, size, rows))
+
+
+def bench_parallel(size=20000, tile_size=1024):
+    """Process-pool classification scaling at 1/2/4/8 workers"""
+    import joblib
+    import rasterio
+    from sklearn.ensemble import RandomForestClassifier
+    from backend.parallel_inference import classify_parallel
+    from backend.labeling import spectral_labels
+    from backend.normalization import compute_file_band_stats, normalize_bands
+    from config import Config
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, 'scene.tif')
+        _, write_time = timed(write_synthetic_raster, image_path, size)
+        print(f"Synthetic raster: {size}x{size}x4 written in {write_time:.1f}s")
+
+        # Production-sized forest fitted on a sample of the scene
+        with rasterio.open(image_path) as src:
+            sample = src.read(window=rasterio.windows.Window(0, 0, min(size, 1024), min(size, 1024)))
+        X = np.transpose(sample, (1, 2, 0)).reshape(-1, 4)
+        y = spectral_labels(normalize_bands(X, compute_file_band_stats(image_path)))
+        model = RandomForestClassifier(n_estimators=Config.RANDOM_FOREST_ESTIMATORS,
+                                       max_depth=Config.RANDOM_FOREST_MAX_DEPTH, random_state=42)
+        model.fit(X[:200_000], y[:200_000])
+        model_path = os.path.join(tmp, 'model.pkl')
+        joblib.dump(model, model_path)
+
+        print(f"{'workers':>8} {'seconds':>10} {'Mpx/s':>8} {'speedup':>8}")
+        baseline = None
+        for workers in (1, 2, 4, 8):
+            output_path = os.path.join(tmp, f'classified_{workers}.tif')
+            _, seconds = timed(classify_parallel, model_path, image_path, output_path, 6, tile_size, workers)
+            baseline = baseline or seconds
+            print(f"{workers:>8} {seconds:>10.1f} {size * size / seconds / 1e6:>8.2f} {baseline / seconds:>7.2f}x")
+
+
+def bench_colorize(size=10000):
+    """Mask-per-class RGB PNG vs LUT colorization and paletted PNG"""
+    import io
+    from PIL import Image
+    from backend.colorize import MAP_COLORS, colorize, render_png
+
+    # Blocky class map, similar to a real classification
+    rng = np.random.default_rng(0)
+    blocks = rng.integers(0, 6, size=(size // 16 + 1, size // 16 + 1)).astype(np.uint8)
+    data = np.kron(blocks, np.ones((16, 16), dtype=np.uint8))[:size, :size]
+
+    def masks_rgb_png():
+        rgb_image = np.zeros((size, size, 3), dtype=np.uint8)
+        for class_id, color in MAP_COLORS.items():
+            rgb_image[data == class_id] = color
+        img_io = io.BytesIO()
+        Image.fromarray(rgb_image, 'RGB').save(img_io, 'PNG')
+        return img_io.getvalue()
+
+    def lut_rgb_png():
+        img_io = io.BytesIO()
+        Image.fromarray(colorize(data), 'RGB').save(img_io, 'PNG')
+        return img_io.getvalue()
+
+    print(f"{size}x{size} classified map")
+    print(f"{'method':>20} {'seconds':>9} {'PNG MB':>8}")
+    for name, render in (('masks + RGB PNG', masks_rgb_png),
+                         ('LUT + RGB PNG', lut_rgb_png),
+                         ('LUT + paletted PNG', lambda: render_png(data))):
+        png, seconds = timed(render)
+        print(f"{name:>20} {seconds:>9.2f} {len(png) / 1e6:>8.2f}")
+
+
+def bench_cog(size=10000, reads=50):
+    """Classified map written the old way (input profile) vs as a COG"""
+    import rasterio
+    from rasterio.transform import from_bounds
+    from rasterio.windows import Window
+    from backend.raster_io import write_classified_cog
+    from config import Config
+
+    rng = np.random.default_rng(0)
+    blocks = rng.integers(0, 6, size=(size // 16 + 1, size // 16 + 1)).astype(np.uint8)
+    data = np.kron(blocks, np.ones((16, 16), dtype=np.uint8))[:size, :size]
+    profile = {
+        'driver': 'GTiff', 'height': size, 'width': size, 'count': 1, 'dtype': 'uint8',
+        'crs': 'EPSG:4326', 'transform': from_bounds(72.5, 23.0, 73.0, 23.5, size, size)
+    }
+
+    def write_plain(path):
+        with rasterio.open(path, 'w', **profile) as dst:
+            dst.write(data, 1)
+
+    def window_reads(path):
+        offsets = np.random.default_rng(1).integers(0, size - 256, size=(reads, 2))
+        with rasterio.open(path) as src:
+            for row, col in offsets:
+                src.read(1, window=Window(int(col), int(row), 256, 256))
+
+    def zoomed_out_read(path):
+        with rasterio.open(path) as src:
+            src.read(1, out_shape=(256, 256))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_path = os.path.join(tmp, 'plain.tif')
+        cog_path = os.path.join(tmp, 'cog.tif')
+
+        print(f"{size}x{size} classified map, {Config.COG_COMPRESSION} / {Config.COG_OVERVIEW_RESAMPLING} overviews")
+        print(f"{'output':>8} {'write s':>8} {'MB':>8} {f'{reads} tiles ms':>13} {'zoomed-out ms':>14}")
+        for name, path, write in (('plain', plain_path, lambda: write_plain(plain_path)),
+                                  ('COG', cog_path, lambda: write_classified_cog(
+                                      data, profile, cog_path,
+                                      compress=Config.COG_COMPRESSION,
+                                      overview_resampling=Config.COG_OVERVIEW_RESAMPLING,
+                                      block_size=Config.COG_BLOCK_SIZE))):
+            _, write_time = timed(write)
+            _, tiles_time = timed(window_reads, path)
+            _, overview_time = timed(zoomed_out_read, path)
+            print(f"{name:>8} {write_time:>8.1f} {os.path.getsize(path) / 1e6:>8.1f} "
+                  f"{tiles_time * 1000:>13.1f} {overview_time * 1000:>14.1f}")
+
+
+def bench_analytics(size=5000):
+    """NDVI statistics and NDWI water area: whole-array NumPy vs streaming engine"""
+    import rasterio
+    from backend.raster_analytics import analyze_raster
+
+    def whole_array(path):
+        with rasterio.open(path) as src:
+            red, green, _, nir = src.read().astype(np.float64)
+        ndvi = (nir - red) / (nir + red)
+        ndwi = (green - nir) / (green + nir)
+        return ndvi.mean(), ndvi.std(), np.count_nonzero(ndwi > 0.3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'scene.tif')
+        write_synthetic_raster(path, size)
+
+        print(f"{size}x{size} scene, 4 bands")
+        _, whole_time = timed(whole_array, path)
+        print(f"whole array: {whole_time * 1000:8.0f} ms")
+        _, stream_time = timed(analyze_raster, path, indices=['NDVI'], masks={'water': ('NDWI', 0.3)})
+        print(f"streaming:   {stream_time * 1000:8.0f} ms")
+
+
+_LOAD_SCRIPT = """
+import sys, time, joblib
+import sklearn.ensemble
+from backend.model_registry import _rss_bytes
+before = _rss_bytes()
+start = time.perf_counter()
+model = joblib.load(sys.argv[1], mmap_mode=sys.argv[2] or None)
+print(time.perf_counter() - start, _rss_bytes() - before)
+"""
+
+
+def bench_models(n_pixels=3_000_000, *leaf_floors):
+    """Saved forest size and cold load time/RSS, read into memory vs memory-mapped
+
+    Each load runs in a fresh interpreter so RSS growth is the model's alone.
+    """
+    import subprocess
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from backend.labeling import iter_label_blocks
+    from backend.normalization import compute_band_stats
+    from backend.sampling import stratified_sample
+
+    rng = np.random.default_rng(42)
+    X = rng.integers(0, 10000, size=(n_pixels, 4)).astype(np.float32)
+    y = np.concatenate([labels for _, _, labels in iter_label_blocks(X, compute_band_stats(X))])
+    train_idx, test_idx = stratified_sample(y, 20000, 5000, seed=42)
+
+    print(f"{'min leaf':>8} {'accuracy':>9} {'file (MB)':>10} {'mode':>6} {'load (ms)':>10} {'RSS (MB)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'forest.pkl')
+        for min_samples_leaf in leaf_floors or (1, 5):
+            model = RandomForestClassifier(n_estimators=100, max_depth=20, random_state=42, n_jobs=-1,
+                                           min_samples_leaf=min_samples_leaf).fit(X[train_idx], y[train_idx])
+            accuracy = model.score(X[test_idx], y[test_idx])
+            joblib.dump(model, path)
+            del model
+
+            for mode in ('', 'r'):
+                out = subprocess.run([sys.executable, '-c', _LOAD_SCRIPT, path, mode], check=True,
+                                     capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+                seconds, rss = out.stdout.split()
+                print(f"{min_samples_leaf:>8} {accuracy:>9.4f} {os.path.getsize(path) / 1e6:>10.1f} "
+                      f"{mode or 'read':>6} {float(seconds) * 1000:>10.0f} {int(rss) / 1e6:>9.1f}")
+
+
+def bench_classifiers(n_pixels=4_000_000, predict_pixels=1_000_000):
+    """random_forest vs hist_gb: fit time, predict throughput and accuracy
+
+    Both fit on the same class-stratified sample of a synthetic scene and
+    use all cores; accuracy is agreement with the spectral labels of the
+    held-out sample and of predict_pixels unseen pixels.
+    """
+    from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+    from backend.labeling import iter_label_blocks
+    from backend.normalization import compute_band_stats
+    from backend.sampling import stratified_sample
+    from config import Config
+
+    rng = np.random.default_rng(42)
+    X = rng.integers(0, 10000, size=(n_pixels, 4)).astype(np.float32)
+    y = np.concatenate([labels for _, _, labels in iter_label_blocks(X, compute_band_stats(X))])
+    train_idx, test_idx = stratified_sample(y, Config.TRAINING_SAMPLES_PER_CLASS,
+                                            Config.EVALUATION_SAMPLES_PER_CLASS, seed=42)
+    X_unseen, y_unseen = X[-predict_pixels:], y[-predict_pixels:]
+
+    models = {
+        'random_forest': RandomForestClassifier(n_estimators=100, max_depth=20, random_state=42, n_jobs=-1),
+        'hist_gb': HistGradientBoostingClassifier(
+            max_iter=Config.HGB_MAX_ITER, learning_rate=Config.HGB_LEARNING_RATE,
+            max_leaf_nodes=Config.HGB_MAX_LEAF_NODES, early_stopping=True,
+            validation_fraction=0.1, n_iter_no_change=10, random_state=42
+        ),
+    }
+
+    print(f"{len(train_idx):,} training pixels, {predict_pixels:,} pixels predicted, {os.cpu_count()} cores")
+    print(f"{'model':>14} {'fit (s)':>8} {'pixels/s':>12} {'held-out':>9} {'unseen':>8}")
+    for name, model in models.items():
+        _, fit_time = timed(model.fit, X[train_idx], y[train_idx])
+        held_out = model.score(X[test_idx], y[test_idx])
+        predictions, predict_time = timed(model.predict, X_unseen)
+        unseen = np.mean(predictions == y_unseen)
+        print(f"{name:>14} {fit_time:>8.1f} {predict_pixels / predict_time:>12,.0f} {held_out:>9.4f} {unseen:>8.4f}")
+
+
+def bench_features(n_pixels=4_000_000, predict_pixels=1_000_000):
+    """Raw float32 vs quantized uint8 features: matrix size, fit, predict and accuracy
+
+    A random forest is fitted on the same class-stratified sample of a
+    synthetic scene in both encodings and scored against the spectral
+    labels of predict_pixels unseen pixels.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from backend.features import quantize_bands
+    from backend.labeling import iter_label_blocks
+    from backend.normalization import compute_band_stats
+    from backend.sampling import stratified_sample
+    from config import Config
+
+    rng = np.random.default_rng(42)
+    X = rng.integers(0, 10000, size=(n_pixels, 4)).astype(np.float32)
+    stats = compute_band_stats(X)
+    y = np.concatenate([labels for _, _, labels in iter_label_blocks(X, stats)])
+    train_idx, _ = stratified_sample(y, Config.TRAINING_SAMPLES_PER_CLASS,
+                                     Config.EVALUATION_SAMPLES_PER_CLASS, seed=42)
+    features, encode_time = timed(quantize_bands, X, stats)
+
+    print(f"{n_pixels:,} pixels encoded in {encode_time:.2f}s, {predict_pixels:,} predicted, {os.cpu_count()} cores")
+    print(f"{'features':>9} {'matrix MB':>10} {'fit (s)':>8} {'pixels/s':>12} {'unseen':>8}")
+    for name, data in (('float32', X), ('uint8', features)):
+        model = RandomForestClassifier(n_estimators=100, max_depth=20, random_state=42, n_jobs=-1)
+        _, fit_time = timed(model.fit, data[train_idx], y[train_idx])
+        predictions, predict_time = timed(model.predict, data[-predict_pixels:])
+        unseen = np.mean(predictions == y[-predict_pixels:])
+        print(f"{name:>9} {data.nbytes / 1e6:>10.1f} {fit_time:>8.1f} "
+              f"{predict_pixels / predict_time:>12,.0f} {unseen:>8.4f}")
+
+
+BENCHMARKS = {
+    'labeling': bench_labeling,
+    'parallel': bench_parallel,
+    'colorize': bench_colorize,
+    'cog': bench_cog,
+    'analytics': bench_analytics,
+    'models': bench_models,
+    'classifiers': bench_classifiers,
+    'features': bench_features,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python benchmark.py [{'|'.join(BENCHMARKS)}]")
+        sys.exit(1)
+
+    BENCHMARKS[sys.argv[1]](*[int(arg) for arg in sys.argv[2:]])
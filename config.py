@@ -18,11 +18,49 @@ class Config:
     # Google Earth Engine
     GEE_PROJECT_ID = os.getenv('GEE_PROJECT_ID', '')
     
+    # Imagery backend: 'gee' (Earth Engine) or 'local' (offline GeoTIFFs / synthetic scenes)
+    IMAGERY_BACKEND = os.getenv('IMAGERY_BACKEND', 'gee')
+    LOCAL_IMAGERY_DIR = os.getenv('LOCAL_IMAGERY_DIR', 'data/local_imagery')
+    LOCAL_IMAGERY_MAX_SIZE = 1024  # max pixels per side of a synthetic scene
+    
     # File paths
     DATA_DIR = 'data'
     EXPORTS_DIR = 'exports'
+    EXPORT_STORE_BYTES = int(os.getenv('EXPORT_STORE_MB', 10240)) * 1024 * 1024  # reused exports, LRU beyond
+    EXPORT_STORE_MAX_AGE = int(os.getenv('EXPORT_STORE_DAYS', 30)) * 24 * 3600  # older exports are fetched again
     MODELS_DIR = 'models/saved_models'
+    MODEL_CACHE_ENTRIES = int(os.getenv('MODEL_CACHE_ENTRIES', 4))  # trained models kept loaded
+    MODEL_CACHE_BYTES = int(os.getenv('MODEL_CACHE_MB', 1024)) * 1024 * 1024  # budget for loaded models
+    MODEL_STORE_ENTRIES = int(os.getenv('MODEL_STORE_ENTRIES', 20))  # trained models kept on disk
+    MODEL_STORE_BYTES = int(os.getenv('MODEL_STORE_MB', 2048)) * 1024 * 1024  # disk budget, oldest pruned first
     LOGS_DIR = 'logs'
+    TILE_CACHE_DIR = 'cache/tiles'
+    
+    # Rendered tile cache
+    TILE_CACHE_MAX_BYTES = int(os.getenv('TILE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    
+    # Earth Engine analysis result cache
+    GEE_RESULT_CACHE_PATH = os.getenv('GEE_RESULT_CACHE_PATH', 'cache/gee_results.sqlite')
+    GEE_RESULT_CACHE_TTL = int(os.getenv('GEE_RESULT_CACHE_TTL', 24 * 3600))  # seconds
+    GEE_RESULT_CACHE_MEMORY_ENTRIES = 256
+    GEE_RESULT_CACHE_DISK_ENTRIES = 10000
+    GEE_DOWNLOAD_URL_TTL = 3600  # download URLs expire; cache imagery lookups for less time
+    GEE_BOUNDS_TOLERANCE = 1e-4  # degrees (about 10 m) when matching AOIs
+    
+    # GeoTIFF downloads from Earth Engine
+    DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # bytes
+    DOWNLOAD_CONNECT_TIMEOUT = 10  # seconds
+    DOWNLOAD_READ_TIMEOUT = 60  # seconds without data before retrying
+    DOWNLOAD_MAX_RETRIES = 5
+    DOWNLOAD_BACKOFF = 1.0  # seconds, doubled after each failed attempt
+    
+    # Large AOIs are exported as a grid of tiles at full resolution and mosaicked
+    EXPORT_TILED = os.getenv('EXPORT_TILED', 'true').lower() == 'true'
+    EXPORT_TILE_PIXELS = 1024  # tile side; 4 bands x 1024² stays well under the request size limit
+    EXPORT_WORKERS = 4  # concurrent tile downloads
+    # Tiled exports keep full resolution up to this many pixels, then coarsen;
+    # training reads the whole scene into memory
+    EXPORT_MAX_PIXELS = int(os.getenv('EXPORT_MAX_PIXELS', 25_000_000))
     
     # Satellite imagery settings
     DEFAULT_SCALE = 10  # meters per pixel
@@ -34,6 +72,48 @@ class Config:
     CNN_EPOCHS = 20
     CNN_BATCH_SIZE = 32
     CNN_PATCH_SIZE = 32
+    LABEL_BLOCK_SIZE = 1_000_000  # pixels labeled per block
+    TRAINING_SAMPLES_PER_CLASS = 20000  # training pixels drawn per class
+    EVALUATION_SAMPLES_PER_CLASS = 5000  # held-out pixels per class for metrics
+    SAMPLING_SEED = 42
+    INFERENCE_TILE_SIZE = 1024  # window side for block-wise classification (0 = native blocks)
+    INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 1))  # >1 classifies windows in a process pool
+    # Random forest size: raising the leaf floor or capping leaves shrinks the
+    # saved model (and load time) at a small accuracy cost; defaults grow full trees
+    RF_MIN_SAMPLES_LEAF = int(os.getenv('RF_MIN_SAMPLES_LEAF', 1))
+    RF_MAX_LEAF_NODES = int(os.getenv('RF_MAX_LEAF_NODES', 0)) or None
+    # Histogram gradient boosting (model_type 'hist_gb'); stops early on a 10% validation split
+    # A high rate and wide trees converge in a few dozen rounds; each round is one tree per class
+    HGB_MAX_ITER = 100
+    HGB_LEARNING_RATE = 0.3
+    HGB_MAX_LEAF_NODES = 127
+    # Pixel classifiers train and predict on 'uint8' features (256 bins per band
+    # from the scene's band stats) or on 'raw' band values
+    FEATURE_ENCODING = os.getenv('FEATURE_ENCODING', 'uint8')
+    MODEL_REUSE_TOLERANCE = 0.1  # max per-band min/max shift (fraction of range) for reusing a trained forest
+    
+    # Classified map output (Cloud-Optimized GeoTIFF)
+    COG_COMPRESSION = 'DEFLATE'  # or 'LZW'
+    COG_OVERVIEW_RESAMPLING = 'MODE'  # or 'NEAREST'
+    COG_BLOCK_SIZE = 512
+    
+    # Progress reporting
+    PROGRESS_INTERVAL = 1.0  # seconds between progress updates within a stage
+    PROGRESS_EVENTS_PER_SECOND = 4  # Socket.IO updates per training session; the rest are coalesced
+    
+    # Background jobs (/api/process-complete)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # workflows run at once; the rest queue
+    JOB_HISTORY = 200  # finished jobs kept for polling
+    
+    # Real-time training (/api/train-realtime)
+    TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', 1))  # trainings run at once
+    TRAINING_QUEUE_SIZE = int(os.getenv('TRAINING_QUEUE_SIZE', 4))  # waiting trainings before HTTP 429
+    
+    # Threads one job may use for model fitting (joblib) and BLAS/OpenMP, so
+    # concurrent jobs share the cores instead of each claiming all of them
+    THREADS_PER_JOB = int(os.getenv(
+        'THREADS_PER_JOB', max(1, (os.cpu_count() or 1) // (JOB_WORKERS + TRAINING_WORKERS))
+    ))
     
     # Land cover classes
     LAND_COVER_CLASSES = {
@@ -5,6 +5,18 @@ import ControlPanel from './components/ControlPanel';
 import ResultsPanel from './components/ResultsPanel';
 import axios from 'axios';
 
+const JOB_POLL_INTERVAL = 2000;
+
+const waitForJob = async (jobId) => {
+  for (;;) {
+    const { data: job } = await axios.get(`/api/jobs/${jobId}`);
+    if (['succeeded', 'failed', 'cancelled'].includes(job.status)) {
+      return job;
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL));
+  }
+};
+
 function App() {
   const [selectedBounds, setSelectedBounds] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -30,10 +42,17 @@ function App() {
         dataset_type: params.datasetType || 'sentinel'
       });
 
-      if (response.data.success) {
-        setResults(response.data);
-      } else {
+      if (!response.data.success) {
         setError(response.data.error || 'Processing failed');
+        return;
+      }
+
+      // Processing runs as a background job; poll until it finishes
+      const job = await waitForJob(response.data.job_id);
+      if (job.status === 'succeeded') {
+        setResults(job.result);
+      } else {
+        setError(job.error || `Processing ${job.status}`);
       }
     } catch (err) {
       setError(err.response?.data?.error || err.message || 'An error occurred');
@@ -125,6 +125,7 @@ const ControlPanel = ({ onProcess, onLocationSearch, loading }) => {
               className="model-select"
             >
               <option value="random_forest">Random Forest (ML)</option>
+              <option value="hist_gb">Gradient Boosting (fast)</option>
             </select>
           </div>
         )}
@@ -4,4 +4,4 @@
 mkdir -p data exports models/saved_models logs reports map_tiles
 
 # Start the application
-gunicorn app:app --bind 0.0.0.0:$PORT --timeout 600 --workers 2 --worker-class eventlet
+gunicorn app:app --bind 0.0.0.0:$PORT --timeout 120 --workers 1 --threads 8
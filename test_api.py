@@ -3,6 +3,7 @@ Simple script to test the API endpoints
 """
 import requests
 import json
+import time
 
 BASE_URL = "http://localhost:5000/api"
 
@@ -58,8 +59,19 @@ def test_complete_workflow():
     response = requests.post(f"{BASE_URL}/process-complete", json=data)
     print(f"Status: {response.status_code}")
     
-    if response.status_code == 200:
-        result = response.json()
+    if response.status_code == 202:
+        job_id = response.json()['job_id']
+        print(f"Job: {job_id}")
+        while True:
+            job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+            if job['status'] in ('succeeded', 'failed', 'cancelled'):
+                break
+            time.sleep(5)
+        print(f"Timings: {json.dumps(job['timings'], indent=2)}")
+        if job['status'] != 'succeeded':
+            print(f"Error: {job['error'] or job['status']}")
+            return
+        result = job['result']
         print("Success!")
         print(f"Accuracy: {result['classification']['metrics']['accuracy']:.2%}")
         print(f"Output file: {result['classification']['classification']['output_path']}")
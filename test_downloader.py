@@ -0,0 +1,202 @@
+"""
+Offline tests for the GeoTIFF downloader against a local HTTP server
+Run with: python -m pytest test_downloader.py
+"""
+
+import os
+import time
+import functools
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler, SimpleHTTPRequestHandler
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.transform import from_bounds
+
+from backend.downloader import download_file, DownloadError, PART_SUFFIX
+from backend.jobs import JobCancelled
+from backend.tiled_export import plan_grid, download_tiled
+
+
+def geotiff_bytes(size=64):
+    """A small uint16 GeoTIFF as bytes"""
+    profile = {
+        'driver': 'GTiff', 'height': size, 'width': size, 'count': 4,
+        'dtype': 'uint16', 'crs': 'EPSG:4326',
+        'transform': from_bounds(77.1, 28.5, 77.3, 28.7, size, size)
+    }
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
+            dst.write(np.arange(4 * size * size, dtype=np.uint16).reshape(4, size, size))
+        return memfile.read()
+
+
+class Server:
+    """Local stand-in for the Earth Engine download endpoint
+
+    Honours Range requests and can drop the connection part-way through
+    the first response, stall before sending, or answer with a status.
+    """
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.drop_after = None
+        self.stall = 0
+        self.status = 200
+        self.ranges = []
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.ranges.append(self.headers.get('Range'))
+                if server.status != 200:
+                    self.send_error(server.status)
+                    return
+
+                start = 0
+                if self.headers.get('Range'):
+                    start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+                body = server.payload[start:]
+
+                self.send_response(206 if start else 200)
+                self.send_header('Content-Length', str(len(body)))
+                if start:
+                    self.send_header('Content-Range', f'bytes {start}-{len(server.payload) - 1}/{len(server.payload)}')
+                self.end_headers()
+
+                time.sleep(server.stall)
+                if server.drop_after is not None:
+                    body, server.drop_after = body[:server.drop_after], None
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/download.tif'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = Server(geotiff_bytes())
+    yield server
+    server.close()
+
+
+def test_download_streams_and_reports_progress(server, tmp_path, monkeypatch):
+    monkeypatch.setattr('config.Config.PROGRESS_INTERVAL', 0)
+    updates = []
+    dest = str(tmp_path / 'scene.tif')
+
+    download_file(server.url, dest, lambda *update: updates.append(update), chunk_size=4096)
+
+    assert open(dest, 'rb').read() == server.payload
+    assert not os.path.exists(dest + PART_SUFFIX)
+    stage, progress, message, data = updates[-1]
+    assert (stage, progress) == ('downloading', 100)
+    assert data['bytes'] == data['total_bytes'] == len(server.payload)
+    assert data['bytes_per_second'] > 0
+
+
+def test_dropped_connection_resumes_with_range(server, tmp_path):
+    server.drop_after = 10000
+    dest = str(tmp_path / 'scene.tif')
+
+    download_file(server.url, dest, backoff=0)
+
+    assert server.ranges == [None, 'bytes=10000-']
+    assert open(dest, 'rb').read() == server.payload
+
+
+def test_stalled_server_times_out(server, tmp_path):
+    server.stall = 2
+    dest = str(tmp_path / 'scene.tif')
+
+    started = time.monotonic()
+    with pytest.raises(DownloadError, match='after 2 attempts'):
+        download_file(server.url, dest, read_timeout=0.2, max_retries=1, backoff=0)
+
+    assert time.monotonic() - started < 2
+    assert not os.path.exists(dest) and not os.path.exists(dest + PART_SUFFIX)
+
+
+def test_cancelled_download_removes_partial_file(server, tmp_path, monkeypatch):
+    monkeypatch.setattr('config.Config.PROGRESS_INTERVAL', 0)
+    dest = str(tmp_path / 'scene.tif')
+
+    def cancel(*update):
+        raise JobCancelled('cancelled')
+
+    with pytest.raises(JobCancelled):
+        download_file(server.url, dest, cancel, chunk_size=1024)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_client_errors_are_not_retried(server, tmp_path):
+    server.status = 404
+
+    with pytest.raises(DownloadError, match='HTTP 404'):
+        download_file(server.url, str(tmp_path / 'scene.tif'), backoff=0)
+
+    assert len(server.ranges) == 1
+
+
+def test_unreadable_download_is_not_published(server, tmp_path):
+    server.payload = b'<html>quota exceeded</html>'
+    dest = str(tmp_path / 'scene.tif')
+
+    with pytest.raises(DownloadError, match='not a readable GeoTIFF'):
+        download_file(server.url, dest)
+
+    assert not os.path.exists(dest) and not os.path.exists(dest + PART_SUFFIX)
+
+
+def test_tiled_download_mosaics_the_full_grid(tmp_path):
+    bounds = {'north': 23.02, 'south': 23.0, 'east': 72.53, 'west': 72.5}
+    transform, width, height, windows = plan_grid(bounds, 10, tile_pixels=128)
+    assert len(windows) == 6
+    assert all(w.width <= 128 and w.height <= 128 for w in windows)
+
+    # Serve each window of a known scene as its own GeoTIFF
+    scene = np.arange(3 * height * width, dtype=np.uint16).reshape(3, height, width)
+    tile_dir = tmp_path / 'tiles'
+    tile_dir.mkdir()
+    for window in windows:
+        profile = {'driver': 'GTiff', 'width': window.width, 'height': window.height, 'count': 3,
+                   'dtype': 'uint16', 'crs': 'EPSG:4326',
+                   'transform': rasterio.windows.transform(window, transform)}
+        with rasterio.open(tile_dir / f'{window.col_off}_{window.row_off}.tif', 'w', **profile) as dst:
+            dst.write(scene[:, window.row_off:window.row_off + window.height,
+                            window.col_off:window.col_off + window.width])
+
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(tile_dir))
+    handler.log_message = lambda *args: None
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{httpd.server_port}'
+
+    updates = []
+    output = str(tmp_path / 'mosaic.tif')
+    try:
+        download_tiled(lambda w: f'{base}/{w.col_off}_{w.row_off}.tif', output, transform,
+                       width, height, windows, workers=3,
+                       progress_callback=lambda *update: updates.append(update))
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    with rasterio.open(output) as src:
+        assert src.transform == transform
+        assert src.block_shapes[0] == (512, 512)
+        assert np.array_equal(src.read(), scene)
+    assert updates[-1][1] == 100
+    assert sorted(os.listdir(tmp_path)) == ['mosaic.tif', 'tiles']
@@ -0,0 +1,389 @@
+"""
+Offline tests for GEEHandler against a fake Earth Engine module
+Run with: python -m pytest test_gee_handler.py
+"""
+
+import os
+import time
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import Affine, from_bounds
+
+from types import SimpleNamespace
+
+from backend import export_store, gee_handler, tiled_export
+from backend.export_store import ExportStore
+from backend.gee_handler import GEEHandler
+from backend.result_cache import ResultCache, SQLiteStore, normalize_bounds
+
+BOUNDS = {'north': 23.5, 'south': 23.0, 'east': 73.0, 'west': 72.5}
+SMALL_BOUNDS = {'north': 23.02, 'south': 23.0, 'east': 72.52, 'west': 72.5}
+
+
+class FakeEE:
+    """Stand-in for the `ee` module that builds no real computations
+
+    Every attribute access and call returns another lazy object; only
+    getInfo() and getDownloadURL() count as server round-trips.
+    """
+
+    class Node:
+        def __init__(self, fake):
+            self._fake = fake
+
+        def __getattr__(self, name):
+            return FakeEE.Node(self._fake)
+
+        def __call__(self, *args, **kwargs):
+            return FakeEE.Node(self._fake)
+
+        def getInfo(self):
+            self._fake.round_trips += 1
+            return self._fake.info
+
+        def getDownloadURL(self, params=None):
+            self._fake.round_trips += 1
+            self._fake.download_params.append(params)
+            return self._fake.download_url
+
+    def __init__(self, info=None):
+        self.round_trips = 0
+        self.info = info if info is not None else {}
+        self.download_url = 'http://localhost/download.tif'
+        self.download_params = []
+
+    def __getattr__(self, name):
+        return FakeEE.Node(self)
+
+    def Initialize(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def fake_ee(monkeypatch):
+    fake = FakeEE()
+    monkeypatch.setattr(gee_handler, 'ee', fake)
+    monkeypatch.delenv('GEE_CREDENTIALS', raising=False)
+    return fake
+
+
+@pytest.fixture
+def handler(fake_ee, tmp_path, monkeypatch):
+    # Keep the on-disk result cache out of the working tree and between tests
+    monkeypatch.chdir(tmp_path)
+    return GEEHandler()
+
+
+def test_forest_change_uses_one_round_trip(handler, fake_ee):
+    fake_ee.info = {'old_forest': 5e6, 'new_forest': 4e6, 'forest_loss': 1.5e6, 'forest_gain': 0.5e6}
+    result = handler.detect_forest_change(BOUNDS, '2020-01-01', '2020-12-31', '2023-01-01', '2023-12-31')
+
+    assert fake_ee.round_trips == 1
+    assert result['old_forest_area_sqkm'] == 5
+    assert result['forest_loss_sqkm'] == 1.5
+    assert result['net_change_sqkm'] == -1
+    assert result['change_percentage'] == -20
+
+
+def test_urban_sprawl_uses_one_round_trip(handler, fake_ee):
+    fake_ee.info = {'old_urban': 2e6, 'new_urban': 3e6, 'urban_growth': 1e6}
+    result = handler.detect_urban_sprawl(BOUNDS, '2020-01-01', '2020-12-31', '2023-01-01', '2023-12-31')
+
+    assert fake_ee.round_trips == 1
+    assert result['urban_growth_sqkm'] == 1
+    assert result['growth_percentage'] == 50
+
+
+def test_water_bodies_use_one_round_trip(handler, fake_ee):
+    fake_ee.info = {'NDWI': 2.5e6}
+    result = handler.detect_water_bodies(BOUNDS, '2023-01-01', '2023-12-31')
+
+    assert fake_ee.round_trips == 1
+    assert result['water_area_sqkm'] == 2.5
+
+
+def test_index_statistics_use_one_round_trip(handler, fake_ee):
+    fake_ee.info = {'NDMI_mean': 0.3, 'NDMI_min': -0.1, 'NDMI_max': 0.6,
+                    'MSI_mean': 0.7, 'MSI_min': 0.2, 'MSI_max': 1.4,
+                    'NDVI_mean': 0.5}
+    moisture = handler.calculate_soil_moisture(BOUNDS, '2023-01-01', '2023-12-31')
+    assert fake_ee.round_trips == 1
+    assert moisture['max_msi'] == 1.4
+    assert moisture['moisture_status'] == 'Moderate Moisture'
+
+    ndvi = handler.calculate_ndvi_analysis(BOUNDS, '2023-01-01', '2023-12-31')
+    assert fake_ee.round_trips == 2
+    assert ndvi['vegetation_health'] == 'Good (Moderate Vegetation)'
+
+
+def test_repeated_analysis_skips_earth_engine(handler, fake_ee):
+    fake_ee.info = {'NDWI': 2.5e6}
+    first = handler.detect_water_bodies(BOUNDS, '2023-01-01', '2023-12-31')
+
+    # Same AOI within the rounding tolerance
+    nearby = dict(BOUNDS, north=BOUNDS['north'] + 1e-6)
+    second = handler.detect_water_bodies(nearby, '2023-01-01', '2023-12-31')
+
+    assert fake_ee.round_trips == 1
+    assert second == first
+    assert 'water_mask' not in second
+    assert handler.result_cache.stats()['hits'] == 1
+    assert handler.result_cache.stats()['misses'] == 1
+
+    handler.detect_water_bodies(BOUNDS, '2022-01-01', '2022-12-31')
+    assert fake_ee.round_trips == 2
+
+
+def test_cached_results_persist_across_handlers(handler, fake_ee):
+    fake_ee.info = {'old_urban': 2e6, 'new_urban': 3e6, 'urban_growth': 1e6}
+    args = (BOUNDS, '2020-01-01', '2020-12-31', '2023-01-01', '2023-12-31')
+    handler.detect_urban_sprawl(*args)
+
+    result = GEEHandler().detect_urban_sprawl(*args)
+
+    assert fake_ee.round_trips == 1
+    assert result['urban_growth_sqkm'] == 1
+
+
+def test_expired_results_are_recomputed(handler, fake_ee, tmp_path):
+    handler.result_cache = ResultCache(SQLiteStore(str(tmp_path / 'results.sqlite')), ttl=-1)
+    fake_ee.info = {'NDWI': 2.5e6}
+    handler.detect_water_bodies(BOUNDS, '2023-01-01', '2023-12-31')
+    handler.detect_water_bodies(BOUNDS, '2023-01-01', '2023-12-31')
+
+    assert fake_ee.round_trips == 2
+    assert handler.result_cache.stats()['misses'] == 2
+
+
+@pytest.fixture
+def downloads(monkeypatch, fake_ee):
+    """Replace the HTTP download with a local write and record each call
+
+    Tile requests get a GeoTIFF of the requested dimensions; anything
+    else gets a few placeholder bytes.
+    """
+    calls = []
+
+    def fake_download(url, path, progress_callback=None):
+        calls.append(path)
+        params = fake_ee.download_params[-1]  # one export worker: each URL is fetched at once
+        if 'dimensions' not in params:
+            with open(path, 'wb') as f:
+                f.write(b'scene')
+            return
+        width, height = map(int, params['dimensions'].split('x'))
+        bands = len(gee_handler.EXPORT_BANDS)
+        profile = {'driver': 'GTiff', 'width': width, 'height': height, 'count': bands,
+                   'dtype': 'uint16', 'crs': 'EPSG:4326',
+                   'transform': Affine(*params['crs_transform'])}
+        with rasterio.open(path, 'w', **profile) as dst:
+            dst.write(np.full((bands, height, width), len(calls), dtype=np.uint16))
+
+    monkeypatch.setattr(gee_handler, 'download_file', fake_download)
+    monkeypatch.setattr(tiled_export, 'download_file', fake_download)
+    monkeypatch.setattr('config.Config.EXPORT_TILE_PIXELS', 100)
+    monkeypatch.setattr('config.Config.EXPORT_WORKERS', 1)
+    return calls
+
+
+def test_identical_exports_share_one_download(handler, fake_ee, downloads):
+    fake_ee.info = 12
+    first = handler.export_to_tif('sentinel2_composite', SMALL_BOUNDS)
+    round_trips = fake_ee.round_trips
+    tiles = len(downloads)
+
+    second = GEEHandler().export_to_tif('sentinel2_composite', dict(SMALL_BOUNDS, west=72.500001))
+
+    assert second == first
+    assert len(downloads) == tiles
+    assert fake_ee.round_trips == round_trips
+    assert not [name for name in os.listdir('exports') if name.endswith(('.tmp', '.tiles'))]
+
+    modis = handler.export_to_tif('modis_landcover', SMALL_BOUNDS, 'modis')
+    assert modis != first
+    assert len(downloads) == tiles + 1
+
+
+def test_large_exports_are_tiled_at_full_resolution(handler, fake_ee, downloads):
+    fake_ee.info = 12
+    path = handler.export_to_tif('sentinel2_composite', SMALL_BOUNDS)
+
+    # 0.02 degrees at 10 m is about 223 pixels a side: a 3 x 3 grid of 100 px tiles
+    assert len(downloads) == 9
+    assert all(p['crs'] == 'EPSG:4326' for p in fake_ee.download_params)
+    with rasterio.open(path) as src:
+        assert src.res[0] == pytest.approx(10 / tiled_export.METERS_PER_DEGREE)
+        assert src.width < 225 and src.height < 225
+        assert src.bounds.left <= SMALL_BOUNDS['west'] and src.bounds.right >= SMALL_BOUNDS['east']
+        assert src.bounds.bottom <= SMALL_BOUNDS['south'] and src.bounds.top >= SMALL_BOUNDS['north']
+        data = src.read(1)
+    # Every tile landed in its own window and the grid has no gaps
+    assert sorted(np.unique(data)) == list(range(1, 10))
+
+
+def test_tiled_exports_coarsen_beyond_the_pixel_limit(handler, fake_ee, downloads, monkeypatch):
+    # SMALL_BOUNDS is about 45,000 pixels at 10 m
+    monkeypatch.setattr('config.Config.EXPORT_MAX_PIXELS', 10000)
+    fake_ee.info = 12
+    path = handler.export_to_tif('sentinel2_composite', SMALL_BOUNDS)
+
+    with rasterio.open(path) as src:
+        assert src.res[0] == pytest.approx(50 / tiled_export.METERS_PER_DEGREE)
+        assert src.width * src.height <= 10000
+
+
+def test_failed_export_leaves_nothing_behind(handler, fake_ee, monkeypatch):
+    def failing_download(url, path, progress_callback=None):
+        with open(path, 'wb') as f:
+            f.write(b'sce')
+        raise gee_handler.DownloadError('connection reset')
+
+    monkeypatch.setattr(gee_handler, 'download_file', failing_download)
+    monkeypatch.setattr(tiled_export, 'download_file', failing_download)
+    fake_ee.info = 12
+
+    with pytest.raises(Exception, match='connection reset'):
+        handler.export_to_tif('sentinel2_composite', SMALL_BOUNDS)
+
+    assert [name for name in os.listdir('exports') if name != 'index.json'] == []
+    assert handler.export_store._key_locks == {}
+
+
+def test_export_store_evicts_least_recently_used_and_stale_exports(tmp_path, monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(export_store, 'time', SimpleNamespace(time=lambda: clock.now))
+    downloads = []
+
+    def write(path):
+        downloads.append(path)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+
+    store = ExportStore(str(tmp_path), max_bytes=250, max_age=100)
+    first = store.fetch({'n': 1}, write)
+    clock.now += 1
+    second = store.fetch({'n': 2}, write)
+    open(second + '.stats.json', 'w').close()
+    clock.now += 1
+    assert store.fetch({'n': 1}, write) == first  # reuse makes it recently used
+    clock.now += 1
+    third = store.fetch({'n': 3}, write)
+
+    assert os.path.exists(first) and os.path.exists(third)
+    assert not os.path.exists(second) and not os.path.exists(second + '.stats.json')
+    assert store.stats()['bytes'] == 200 and len(downloads) == 3
+
+    # Past max_age an export is downloaded again
+    clock.now += 200
+    store.fetch({'n': 3}, write)
+    assert len(downloads) == 4
+    assert store.stats()['entries'] == 1
+
+
+def test_pinned_exports_survive_eviction_until_released(tmp_path, monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(export_store, 'time', SimpleNamespace(time=lambda: clock.now))
+
+    def write(path):
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+
+    store = ExportStore(str(tmp_path), max_bytes=150, max_age=100)
+    held = store.fetch({'n': 1}, write, pin=True)
+    clock.now += 1
+    store.fetch({'n': 2}, write)
+
+    # Over budget, yet the older export is still being read by its job
+    assert os.path.exists(held)
+    assert store.stats()['bytes'] == 200 and store.stats()['pinned'] == 1
+
+    # Nor is it deleted for its age while pinned
+    clock.now += 200
+    assert store.lookup(store.key({'n': 1}), 'export') is None and os.path.exists(held)
+
+    store.release(held)
+    clock.now += 1
+    third = store.fetch({'n': 3}, write)
+    assert sorted(os.listdir(tmp_path)) == sorted(['index.json', os.path.basename(third)])
+    assert store.stats()['pinned'] == 0
+
+
+def test_matching_export_is_analyzed_locally(handler, fake_ee):
+    def write(path):
+        data = np.empty((4, 30, 30), dtype=np.uint16)
+        data[:] = np.array([1000, 2000, 900, 3000])[:, None, None]  # B4, B3, B2, B8
+        profile = {'driver': 'GTiff', 'width': 30, 'height': 30, 'count': 4, 'dtype': 'uint16',
+                   'crs': 'EPSG:4326', 'transform': from_bounds(72.5, 23.0, 72.52, 23.02, 30, 30)}
+        with rasterio.open(path, 'w', **profile) as dst:
+            dst.write(data)
+
+    spec = dict(gee_handler.SENTINEL_COMPOSITE, **{
+        'bounds': normalize_bounds(SMALL_BOUNDS, 1e-4),
+        'bands': ['B4', 'B3', 'B2', 'B8'],
+        'scale': gee_handler.ANALYSIS_SCALE,
+        'dates': ['2023-01-01', '2023-12-31']
+    })
+    # Same pixels from another collection or at a coarser scale are not comparable
+    handler.export_store.fetch(dict(spec, scale=30), write)
+    handler.export_store.fetch(dict(spec, collection='COPERNICUS/S2_SR'), write)
+    assert handler._local_statistics(SMALL_BOUNDS, '2023-01-01', '2023-12-31', ['NDVI']) is None
+    handler.export_store.fetch(spec, write)
+
+    ndvi = handler.calculate_ndvi_analysis(SMALL_BOUNDS, '2023-01-01', '2023-12-31')
+    water = handler.detect_water_bodies(SMALL_BOUNDS, '2023-01-01', '2023-12-31')
+
+    assert fake_ee.round_trips == 0
+    assert ndvi['mean_ndvi'] == pytest.approx(0.5) and ndvi['std_ndvi'] == pytest.approx(0)
+    assert water['water_area_sqkm'] == 0
+
+    # This export has no SWIR band, so moisture still goes to Earth Engine
+    fake_ee.info = {'NDMI_mean': 0.3, 'MSI_mean': 0.7}
+    handler.calculate_soil_moisture(SMALL_BOUNDS, '2023-01-01', '2023-12-31')
+    assert fake_ee.round_trips == 1
+
+    # Other dates are not answered from this export
+    fake_ee.info = {'NDVI_mean': 0.1}
+    handler.calculate_ndvi_analysis(SMALL_BOUNDS, '2022-01-01', '2022-12-31')
+    assert fake_ee.round_trips == 2
+
+
+def wait_for_job(client, response):
+    """Final state of the job a 202 response queued"""
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    deadline = time.time() + 120
+    job = client.get(status_url).get_json()
+    while job['status'] in ('queued', 'running'):
+        assert time.time() < deadline
+        time.sleep(0.05)
+        job = client.get(status_url).get_json()
+    assert job['status'] == 'succeeded', job['error']
+    return job['result']
+
+
+def test_classification_export_answers_later_analyses(handler, fake_ee, downloads, monkeypatch):
+    os.makedirs(os.path.join('models', 'saved_models'))
+    import app
+    monkeypatch.setattr(app, 'gee_handler', handler)
+    client = app.app.test_client()
+    request = {'bounds': SMALL_BOUNDS, 'start_date': '2023-01-01', 'end_date': '2023-12-31'}
+
+    fake_ee.info = 12
+    classified = wait_for_job(client, client.post('/api/process-complete', json=request))
+    with rasterio.open(classified['export_path']) as src:
+        assert src.count == len(gee_handler.EXPORT_BANDS)
+
+    # The downloaded tiles have equal bands: NDVI and NDMI 0, MSI 1, no water
+    round_trips = fake_ee.round_trips
+    ndvi = wait_for_job(client, client.post('/api/process-complete', json=dict(request, analysis_type='ndvi')))
+    water = wait_for_job(client, client.post('/api/process-complete', json=dict(request, analysis_type='water')))
+    moisture = wait_for_job(client, client.post('/api/process-complete',
+                                                json=dict(request, analysis_type='moisture')))
+
+    assert fake_ee.round_trips == round_trips
+    assert ndvi['analysis']['mean_ndvi'] == pytest.approx(0)
+    assert water['analysis']['water_area_sqkm'] == 0
+    assert moisture['analysis']['mean_ndmi'] == pytest.approx(0)
+    assert moisture['analysis']['mean_msi'] == pytest.approx(1)
+    assert handler.export_store.stats()['pinned'] == 0
@@ -0,0 +1,193 @@
+"""
+Tests for the background job manager
+Run with: python -m pytest test_jobs.py
+"""
+
+import threading
+import time
+import pytest
+
+from backend.jobs import JobManager, QueueFullError, CANCELLED, FAILED, SUCCEEDED, QUEUED
+
+
+def wait_for(job, timeout=5):
+    deadline = time.time() + timeout
+    while job.status not in (SUCCEEDED, FAILED, CANCELLED):
+        assert time.time() < deadline, f'job still {job.status}'
+        time.sleep(0.01)
+    return job
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(workers=1)
+    yield manager
+    manager.shutdown(wait=False)
+
+
+def test_job_result_and_stage_timings(manager):
+    def work(job):
+        with job.stage('fetch'):
+            time.sleep(0.02)
+        with job.stage('classify'):
+            job.report(50, 'halfway')
+        return {'value': 42}
+
+    job = wait_for(manager.submit('test', work))
+
+    assert job.status == SUCCEEDED
+    assert job.result == {'value': 42}
+    info = job.to_dict()
+    assert list(info['timings']['stages']) == ['fetch', 'classify']
+    assert info['timings']['stages']['fetch'] >= 0.02
+    assert info['timings']['running_seconds'] >= info['timings']['stages']['fetch']
+    assert info['progress'] == 100
+
+
+def test_failure_is_recorded(manager):
+    def work(job):
+        raise RuntimeError('export failed')
+
+    job = wait_for(manager.submit('test', work))
+    assert job.status == FAILED
+    assert job.error == 'export failed'
+
+
+def test_concurrency_is_bounded_and_queued_jobs_cancel(manager):
+    release = threading.Event()
+    running = []
+
+    def work(job):
+        running.append(job.id)
+        release.wait(5)
+        return job.id
+
+    first = manager.submit('test', work)
+    second = manager.submit('test', work)
+    time.sleep(0.05)
+
+    assert running == [first.id]
+    assert second.status == QUEUED
+    assert manager.stats()['jobs']['queued'] == 1
+
+    manager.cancel(second.id)
+    assert second.status == CANCELLED
+    release.set()
+
+    assert wait_for(first).status == SUCCEEDED
+    assert running == [first.id]
+
+
+def test_running_job_stops_at_next_report(manager):
+    started = threading.Event()
+    steps = []
+
+    def work(job):
+        with job.stage('download'):
+            started.set()
+            for step in range(500):
+                job.report(step / 5)
+                steps.append(step)
+                time.sleep(0.01)
+
+    job = manager.submit('test', work)
+    started.wait(5)
+    manager.cancel(job.id)
+
+    assert wait_for(job).status == CANCELLED
+    assert len(steps) < 500
+    assert 'download' in job.to_dict()['timings']['stages']
+
+
+def test_updates_are_published():
+    updates = []
+    manager = JobManager(workers=1, on_update=lambda job: updates.append(job.status))
+    wait_for(manager.submit('test', lambda job: None))
+    manager.shutdown()
+
+    assert updates[0] == QUEUED
+    assert updates[-1] == SUCCEEDED
+
+
+def test_finished_jobs_are_trimmed():
+    manager = JobManager(workers=1, max_history=2)
+    jobs = [wait_for(manager.submit('test', lambda job: None)) for _ in range(4)]
+    manager.submit('test', lambda job: None)
+    manager.shutdown()
+
+    assert manager.get(jobs[0].id) is None
+    assert manager.get(jobs[-1].id) is not None
+
+
+def test_full_queue_refuses_and_wait_is_measured():
+    manager = JobManager(workers=1, max_queued=1)
+    release = threading.Event()
+    running = manager.submit('test', lambda job: release.wait(5))
+    time.sleep(0.05)
+    waiting = manager.submit('test', lambda job: None)
+
+    with pytest.raises(QueueFullError):
+        manager.submit('test', lambda job: None)
+    assert manager.stats()['queue_depth'] == 1
+
+    time.sleep(0.05)
+    release.set()
+    wait_for(running)
+    wait_for(waiting)
+    manager.shutdown()
+
+    stats = manager.stats()
+    assert stats['queue_depth'] == 0
+    assert stats['started'] == 2
+    assert stats['wait_seconds']['max'] >= 0.05
+
+
+def test_train_realtime_applies_backpressure(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import app
+
+    release = threading.Event()
+
+    class BlockingTrainer:
+        def __init__(self, progress_callback=None, registry=None):
+            self.progress_callback = progress_callback
+
+        def complete_workflow(self, image_path, output_path):
+            self.progress_callback({'stage': 'training', 'progress': 10, 'message': 'fitting'})
+            release.wait(5)
+            return {'output_path': output_path}
+
+    executor = JobManager(workers=1, max_queued=1, on_update=app.track_training_session)
+    monkeypatch.setattr(app, 'RealtimeTrainer', BlockingTrainer)
+    monkeypatch.setattr(app, 'training_executor', executor)
+    image_path = tmp_path / 'scene.tif'
+    image_path.write_bytes(b'scene')
+    client = app.app.test_client()
+
+    def train(session_id):
+        return client.post('/api/train-realtime', json={'image_path': str(image_path),
+                                                        'session_id': session_id})
+
+    first = train('a').get_json()
+    time.sleep(0.05)
+    second = train('b')
+    assert second.status_code == 200
+    refused = train('c')
+    assert refused.status_code == 429
+    assert refused.headers['Retry-After']
+
+    stats = client.get('/api/jobs').get_json()['training']
+    assert stats['queue_depth'] == 1 and stats['jobs']['running'] == 1
+    assert app.training_sessions['b'] == second.get_json()['job_id']
+
+    # A training cancelled in the queue never runs, yet its session is forgotten
+    assert client.delete(second.get_json()['status_url']).get_json()['status'] == CANCELLED
+    assert 'b' not in app.training_sessions
+
+    release.set()
+    job = wait_for(executor.get(first['job_id']))
+    executor.shutdown()
+    assert job.status == SUCCEEDED
+    assert client.get(first['status_url']).get_json()['status'] == SUCCEEDED
+    # Finished sessions are forgotten
+    assert 'a' not in app.training_sessions
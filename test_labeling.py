@@ -0,0 +1,119 @@
+"""
+Offline tests for synthetic label generation
+Run with: python -m pytest test_labeling.py
+"""
+
+import os
+import numpy as np
+import rasterio
+from rasterio.transform import from_bounds
+
+from backend.labeling import spectral_labels, iter_label_blocks
+from backend.ml_classifier import MLClassifier
+from backend.normalization import compute_band_stats, get_band_stats, normalize_bands, STATS_SUFFIX
+from backend.realtime_trainer import RealtimeTrainer
+from backend.utils import normalize_image
+
+
+def reference_labels(X):
+    """Per-pixel rule cascade on per-band normalized values, kept as the ground truth"""
+    labels = np.zeros(X.shape[0], dtype=int)
+    X_norm = normalize_image(X)
+
+    for i in range(X.shape[0]):
+        if X.shape[1] >= 4:
+            red, green, blue, nir = X_norm[i, 0], X_norm[i, 1], X_norm[i, 2], X_norm[i, 3]
+            ndvi = (nir - red) / (nir + red + 1e-8)
+            ndwi = (green - nir) / (green + nir + 1e-8)
+
+            if ndwi > 0.3:
+                labels[i] = 0
+            elif ndvi > 0.6:
+                labels[i] = 1
+            elif ndvi > 0.3:
+                labels[i] = 2
+            elif red > 0.3 and green > 0.3 and blue > 0.3:
+                labels[i] = 3
+            elif ndvi < 0.1:
+                labels[i] = 4
+            else:
+                labels[i] = 5
+
+    return labels
+
+
+def synthetic_pixels(n_pixels=20000, bands=4, seed=0):
+    """Random uint16 reflectances covering every class"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 10000, size=(n_pixels, bands), dtype=np.uint16)
+
+
+def test_labels_match_reference():
+    X = synthetic_pixels()
+    labels = MLClassifier().generate_synthetic_labels(X)
+
+    assert labels.dtype == np.uint8
+    assert np.array_equal(labels, reference_labels(X))
+    assert set(np.unique(labels)) == set(range(6))
+
+
+def test_labels_with_too_few_bands():
+    X = synthetic_pixels(bands=3)
+    assert np.array_equal(spectral_labels(normalize_image(X)), np.zeros(len(X), dtype=int))
+
+
+def write_scene(path, height=64, width=80, bands=4, seed=0):
+    """Write a random uint16 GeoTIFF and return its pixels as (n_pixels, bands)"""
+    data = synthetic_pixels(height * width, bands, seed).T.reshape(bands, height, width)
+    profile = {
+        'driver': 'GTiff', 'height': height, 'width': width, 'count': bands,
+        'dtype': 'uint16', 'crs': 'EPSG:4326',
+        'transform': from_bounds(77.1, 28.5, 77.3, 28.7, width, height)
+    }
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data)
+    return np.transpose(data, (1, 2, 0)).reshape(-1, bands)
+
+
+def test_block_labels_match_full_scene():
+    X = synthetic_pixels(n_pixels=10007)
+    stats = compute_band_stats(X, block_size=1000)
+    expected = spectral_labels(normalize_bands(X, stats))
+
+    blocks = list(iter_label_blocks(X, stats, block_size=1000))
+
+    assert len(blocks) == 11
+    assert np.array_equal(np.concatenate([labels for _, _, labels in blocks]), expected)
+
+
+def test_both_trainers_label_identically():
+    X = synthetic_pixels()
+    labels = RealtimeTrainer().generate_labels_with_progress(X)
+
+    assert labels.dtype == np.uint8
+    assert np.array_equal(MLClassifier().generate_synthetic_labels(X), labels)
+
+
+def test_normalization_is_float32_per_band():
+    X = synthetic_pixels(n_pixels=1000)
+    X[:, 3] //= 10
+    X_norm = normalize_image(X)
+
+    assert X_norm.dtype == np.float32
+    assert np.allclose(X_norm.min(axis=0), 0) and np.allclose(X_norm.max(axis=0), 1)
+
+    X_float = X.astype(np.float32)
+    assert normalize_bands(X_float, compute_band_stats(X), out=X_float) is X_float
+    assert np.array_equal(X_float, X_norm)
+
+
+def test_file_band_stats_are_cached(tmp_path):
+    path = str(tmp_path / 'scene.tif')
+    X = write_scene(path)
+
+    stats = get_band_stats(path, block_size=500)
+    assert os.path.exists(path + STATS_SUFFIX)
+    assert np.array_equal(stats['min'], X.min(axis=0))
+    assert np.array_equal(stats['max'], X.max(axis=0))
+    assert get_band_stats(path) is stats
+
@@ -0,0 +1,150 @@
+"""
+Offline tests for the local imagery backend, raster analytics and the API running on them
+Run with: python -m pytest test_local_backend.py
+"""
+
+import os
+import time
+import numpy as np
+import pytest
+import rasterio
+from rasterio.crs import CRS
+from rasterio.transform import from_bounds
+
+from backend.imagery_backend import ImageryBackend, create_imagery_backend
+from backend.local_backend import LocalImageryBackend, SENTINEL_BANDS, WGS84
+from backend.raster_analytics import analyze_arrays, analyze_raster, pixel_areas
+from backend.utils import rectangle_area_sqkm
+
+BOUNDS = {'north': 23.05, 'south': 23.0, 'east': 72.55, 'west': 72.5}
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return LocalImageryBackend(imagery_dir=str(tmp_path / 'imagery'))
+
+
+def test_factory_selects_local_backend(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert isinstance(create_imagery_backend('local'), LocalImageryBackend)
+    with pytest.raises(ValueError):
+        create_imagery_backend('sentinel-hub')
+
+
+def test_incomplete_backend_fails_when_created():
+    class WaterOnly(ImageryBackend):
+        def detect_water_bodies(self, bounds, start_date, end_date):
+            return {}
+
+    with pytest.raises(TypeError, match='calculate_ndvi_analysis'):
+        WaterOnly()
+
+
+def test_synthetic_analyses_are_stable_and_plausible(backend):
+    water = backend.detect_water_bodies(BOUNDS, '2023-01-01', '2023-12-31')
+    assert water == backend.detect_water_bodies(BOUNDS, '2023-01-01', '2023-12-31')
+    assert 0 < water['water_area_sqkm'] < rectangle_area_sqkm(BOUNDS)
+
+    ndvi = backend.calculate_ndvi_analysis(BOUNDS, '2023-01-01', '2023-12-31')
+    assert -1 <= ndvi['min_ndvi'] < ndvi['mean_ndvi'] < ndvi['max_ndvi'] <= 1
+
+    urban = backend.detect_urban_sprawl(BOUNDS, '2018-01-01', '2018-12-31', '2023-01-01', '2023-12-31')
+    assert urban['new_urban_area_sqkm'] > urban['old_urban_area_sqkm']
+
+    forest = backend.detect_forest_change(BOUNDS, '2018-01-01', '2018-12-31', '2023-01-01', '2023-12-31')
+    assert forest['forest_loss_sqkm'] > 0 and forest['net_change_sqkm'] < 0
+
+    moisture = backend.calculate_soil_moisture(BOUNDS, '2023-01-01', '2023-12-31')
+    assert moisture['moisture_status'] in ('High Moisture', 'Moderate Moisture', 'Low Moisture', 'Very Dry')
+
+
+def test_on_disk_scene_is_used(backend, tmp_path):
+    os.makedirs(backend.imagery_dir)
+    data = np.empty((5, 40, 50), dtype=np.uint16)
+    data[:] = np.array([1000, 1200, 900, 3000, 2000])[:, None, None]  # uniform NDVI of 0.5
+    profile = {'driver': 'GTiff', 'height': 40, 'width': 50, 'count': 5, 'dtype': 'uint16',
+               'crs': 'EPSG:4326', 'transform': from_bounds(72.4, 22.9, 72.6, 23.1, 50, 40)}
+    with rasterio.open(os.path.join(backend.imagery_dir, 'sentinel2_2023.tif'), 'w', **profile) as dst:
+        dst.write(data)
+        dst.descriptions = tuple(SENTINEL_BANDS)
+
+    ndvi = backend.calculate_ndvi_analysis(BOUNDS, '2023-01-01', '2023-12-31')
+    assert ndvi['mean_ndvi'] == pytest.approx(0.5)
+    assert ndvi['std_ndvi'] == pytest.approx(0)
+
+    # Other years fall back to the synthetic scene
+    assert backend.calculate_ndvi_analysis(BOUNDS, '2022-01-01', '2022-12-31')['std_ndvi'] > 0
+
+
+def test_process_complete_runs_offline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join('models', 'saved_models'))
+
+    import app
+    monkeypatch.setattr(app, 'gee_handler', LocalImageryBackend())
+    client = app.app.test_client()
+
+    response = client.post('/api/process-complete', json={'bounds': BOUNDS})
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+
+    deadline = time.time() + 120
+    job = client.get(status_url).get_json()
+    while job['status'] in ('queued', 'running'):
+        assert time.time() < deadline
+        time.sleep(0.1)
+        job = client.get(status_url).get_json()
+    assert job['status'] == 'succeeded', job['error']
+    assert set(job['timings']['stages']) == {'fetch', 'export', 'classify'}
+
+    body = job['result']
+    with rasterio.open(body['export_path']) as src:
+        assert src.count == 5
+    distribution = body['classification']['classification']['class_distribution']
+    assert sum(distribution.values()) > 0
+
+    response = client.post('/api/detect-water', json={
+        'bounds': BOUNDS, 'start_date': '2023-01-01', 'end_date': '2023-12-31'
+    })
+    assert response.status_code == 200
+    assert response.get_json()['data']['water_area_sqkm'] > 0
+
+
+def test_streaming_statistics_match_numpy(tmp_path):
+    rng = np.random.default_rng(1)
+    bands = {name: rng.integers(0, 3000, size=(90, 70)).astype(np.float32) for name in ('B8', 'B4', 'B3')}
+    bands['B8'][:5] = bands['B4'][:5] = 0  # undefined NDVI, ignored like masked pixels
+    transform = from_bounds(72.5, 23.0, 72.6, 23.1, 70, 90)
+
+    stats = analyze_arrays(bands, transform, WGS84, indices=['NDVI'],
+                           masks={'water': ('NDWI', 0.3)}, block_pixels=333)
+
+    with np.errstate(invalid='ignore'):
+        ndvi = (bands['B8'] - bands['B4']) / (bands['B8'] + bands['B4'])
+    assert stats['NDVI_mean'] == pytest.approx(np.nanmean(ndvi))
+    assert stats['NDVI_stdDev'] == pytest.approx(np.nanstd(ndvi))
+    assert (stats['NDVI_min'], stats['NDVI_max']) == pytest.approx((np.nanmin(ndvi), np.nanmax(ndvi)))
+
+    # The same scene streamed from disk gives the same answer
+    path = str(tmp_path / 'scene.tif')
+    profile = {'driver': 'GTiff', 'height': 90, 'width': 70, 'count': 3, 'dtype': 'float32',
+               'crs': 'EPSG:4326', 'transform': transform}
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(np.stack([bands['B4'], bands['B3'], bands['B8']]))
+        dst.descriptions = ('B4', 'B3', 'B8')
+    from_file = analyze_raster(path, indices=['NDVI'], masks={'water': ('NDWI', 0.3)}, block_pixels=500)
+    assert from_file == pytest.approx(stats)
+
+
+def test_pixel_areas_follow_latitude():
+    transform = from_bounds(72.5, 23.0, 72.6, 23.1, 70, 90)
+    areas = pixel_areas(transform, WGS84, 0, 90)
+
+    assert areas.shape == (90, 1)
+    assert np.all(np.diff(areas[:, 0]) > 0)  # rows get larger towards the equator
+    assert areas.sum() * 70 == pytest.approx(rectangle_area_sqkm(
+        {'north': 23.1, 'south': 23.0, 'east': 72.6, 'west': 72.5}) * 1e6)
+
+    utm = from_bounds(500000, 2540000, 500700, 2540900, 70, 90)
+    assert np.all(pixel_areas(utm, CRS.from_epsg(32643), 10, 5) == 100)
@@ -0,0 +1,191 @@
+"""
+Offline tests for classified map rendering
+Run with: python -m pytest test_map_tiles.py
+"""
+
+import io
+import os
+import numpy as np
+import pytest
+import rasterio
+from PIL import Image
+from rasterio.transform import from_bounds
+
+from backend.colorize import MAP_COLORS, colorize, render_png
+from backend.realtime_trainer import RealtimeTrainer
+from backend import tile_cache
+from backend.tile_cache import TileCache
+from backend.tiles import TRANSPARENT_INDEX, read_tile, render_tile
+
+# Delhi, inside XYZ tile 8/182/106
+BOUNDS = (77.1, 28.5, 77.3, 28.7)
+
+
+def classified_map(height=120, width=150, seed=0):
+    """Random class map using our classes, MODIS classes and unmapped values"""
+    rng = np.random.default_rng(seed)
+    return rng.choice([0, 1, 2, 3, 4, 5, 7, 11, 12, 13, 16, 17, 255], size=(height, width)).astype(np.uint8)
+
+
+def mask_colorize(data):
+    """Original one-mask-per-class colorization"""
+    rgb_image = np.zeros(data.shape + (3,), dtype=np.uint8)
+    for class_id, color in MAP_COLORS.items():
+        rgb_image[data == class_id] = color
+    return rgb_image
+
+
+def test_lut_colorize_matches_masks():
+    data = classified_map()
+    assert np.array_equal(colorize(data), mask_colorize(data))
+    assert np.array_equal(colorize(data.astype(np.int64)), mask_colorize(data))
+
+
+def test_paletted_png_decodes_to_same_colors():
+    for data in (classified_map(), classified_map() % 3, np.full((10, 10), 12, dtype=np.uint8)):
+        img = Image.open(io.BytesIO(render_png(data)))
+
+        assert img.mode == 'P'
+        assert np.array_equal(np.asarray(img.convert('RGB')), mask_colorize(data))
+
+
+def write_classified(path, data):
+    """Write a class array as a single-band uint8 GeoTIFF over BOUNDS"""
+    height, width = data.shape
+    profile = {
+        'driver': 'GTiff', 'height': height, 'width': width, 'count': 1, 'dtype': 'uint8',
+        'crs': 'EPSG:4326', 'transform': from_bounds(*BOUNDS, width, height)
+    }
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data, 1)
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    """Flask test client running from a scratch directory with one classified export"""
+    workdir = tmp_path_factory.mktemp('app')
+    previous = os.getcwd()
+    os.chdir(workdir)
+    os.makedirs('exports', exist_ok=True)
+    write_classified(os.path.join('exports', 'classified.tif'), classified_map() % 6)
+
+    import app
+    yield app.app.test_client()
+    os.chdir(previous)
+
+
+def test_tile_reads_only_its_footprint(tmp_path):
+    path = str(tmp_path / 'classified.tif')
+    data = classified_map() % 6
+    write_classified(path, data)
+
+    with rasterio.open(path) as src:
+        inside = read_tile(src, 8, 182, 106)
+        outside = read_tile(src, 8, 0, 0)
+
+    assert (outside == TRANSPARENT_INDEX).all()
+    assert (inside == TRANSPARENT_INDEX).any()
+    assert set(np.unique(inside)) - {TRANSPARENT_INDEX} <= set(np.unique(data))
+
+    img = Image.open(io.BytesIO(render_tile(path, 8, 182, 106)))
+    assert img.size == (256, 256)
+    assert img.convert('RGBA').getextrema()[3] == (0, 255)
+
+
+def test_tile_endpoint(client):
+    response = client.get('/api/tiles/classified.tif/8/182/106.png')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+
+    assert client.get('/api/tiles/classified.tif/2/9/0.png').status_code == 400
+    assert client.get('/api/tiles/missing.tif/8/182/106.png').status_code == 404
+
+
+def test_tile_cache_evicts_least_recently_used(tmp_path):
+    cache = TileCache(str(tmp_path), max_bytes=250)
+    cache.put('a', b'a' * 100)
+    cache.put('b', b'b' * 100)
+    assert cache.get('a') == b'a' * 100
+
+    cache.put('c', b'c' * 100)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+    reopened = TileCache(str(tmp_path), max_bytes=250)
+    assert reopened.stats()['entries'] == 2
+    assert reopened.get('c') == b'c' * 100
+
+
+def test_tile_cache_key_follows_content(tmp_path):
+    cache = TileCache(str(tmp_path / 'cache'), max_bytes=1000)
+    path = tmp_path / 'map.tif'
+    path.write_bytes(b'one')
+    first = cache.key(str(path), 'xyz', 1, 2, 3)
+
+    assert cache.key(str(path), 'xyz', 1, 2, 3) == first
+    assert cache.key(str(path), 'xyz', 1, 2, 4) != first
+    path.write_bytes(b'two!')
+    assert cache.key(str(path), 'xyz', 1, 2, 3) != first
+
+
+def test_tile_cache_bounds_hashes_and_sweeps_stale_temp_files(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    stale, fresh = cache_dir / 'old.tmp', cache_dir / 'new.tmp'
+    stale.write_bytes(b'partial')
+    fresh.write_bytes(b'partial')
+    os.utime(stale, (0, 0))
+
+    monkeypatch.setattr(tile_cache, 'FILE_HASH_ENTRIES', 2)
+    cache = TileCache(str(cache_dir), max_bytes=1000)
+    assert not stale.exists() and fresh.exists()
+
+    for name in ('a', 'b', 'c'):
+        (tmp_path / name).write_bytes(name.encode())
+        cache.file_hash(str(tmp_path / name))
+    assert len(cache._file_hashes) == 2
+
+
+def test_cached_tiles_and_etags(client, monkeypatch):
+    import app
+
+    url = '/api/tiles/classified.tif/8/182/106.png'
+    first = client.get(url)
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    overlay_etag = client.get('/api/get-map-tiles/classified.tif').headers['ETag']
+    assert overlay_etag != etag
+
+    def fail(*args):
+        raise AssertionError('tile was re-rendered')
+    monkeypatch.setattr(app, 'render_tile', fail)
+    monkeypatch.setattr(app, 'render_overlay', fail)
+
+    assert client.get(url).data == first.data
+    not_modified = client.get(url, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == etag
+
+    overlay = client.get('/api/get-map-tiles/classified.tif', headers={'If-None-Match': overlay_etag})
+    assert overlay.status_code == 304
+
+
+def test_classified_maps_are_written_as_cogs(tmp_path):
+    data = np.kron(classified_map(40, 50) % 6, np.ones((50, 50), dtype=np.uint8))
+    profile = {
+        'driver': 'GTiff', 'height': data.shape[0], 'width': data.shape[1], 'count': 4,
+        'dtype': 'uint16', 'crs': 'EPSG:4326', 'compress': 'lzw', 'photometric': 'RGB',
+        'transform': from_bounds(*BOUNDS, data.shape[1], data.shape[0])
+    }
+    path = str(tmp_path / 'classified.tif')
+    RealtimeTrainer().save_classified_image(data, profile, path)
+
+    with rasterio.open(path) as src:
+        assert src.count == 1 and src.dtypes[0] == 'uint8'
+        assert src.profile['tiled'] and src.profile['compress'] == 'deflate'
+        assert src.tags(ns='IMAGE_STRUCTURE').get('LAYOUT') == 'COG'
+        assert src.overviews(1) == [2, 4, 8]
+        assert np.array_equal(src.read(1), data)
+        # Mode resampling keeps overview values valid classes
+        overview = src.read(1, out_shape=(data.shape[0] // 4, data.shape[1] // 4))
+        assert set(np.unique(overview)) <= set(np.unique(data))
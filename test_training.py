@@ -0,0 +1,368 @@
+"""
+Offline tests for model training
+Run with: python -m pytest test_training.py
+"""
+
+import os
+import threading
+import numpy as np
+import pytest
+import rasterio
+from sklearn.ensemble import RandomForestClassifier
+
+from backend import features
+from backend.features import quantize_bands
+from backend.ml_classifier import MLClassifier
+from backend.model_registry import ModelRegistry
+from backend.normalization import get_band_stats
+from backend.progress import ProgressThrottle
+from backend.realtime_trainer import RealtimeTrainer
+from backend.sampling import stratified_sample
+from test_labeling import write_scene
+
+
+def imbalanced_labels(seed=0):
+    """Labels with one dominant, one medium and one tiny class"""
+    rng = np.random.default_rng(seed)
+    y = np.concatenate([np.zeros(50000, dtype=int), np.ones(3000, dtype=int), np.full(40, 2)])
+    rng.shuffle(y)
+    return y
+
+
+def test_stratified_sample_is_capped_and_disjoint():
+    y = imbalanced_labels()
+    train_idx, eval_idx = stratified_sample(y, 2000, 500, seed=1)
+
+    assert np.bincount(y[train_idx]).tolist() == [2000, 2000, 32]
+    assert np.bincount(y[eval_idx]).tolist() == [500, 500, 8]
+    assert len(np.intersect1d(train_idx, eval_idx)) == 0
+
+
+def test_stratified_sample_is_reproducible():
+    y = imbalanced_labels()
+    first = stratified_sample(y, 1000, 100, seed=7)
+    second = stratified_sample(y, 1000, 100, seed=7)
+
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+
+
+def test_tiny_classes_still_hold_out_a_pixel():
+    y = np.array([0, 0, 1, 1, 2, 2, 3])
+    train_idx, eval_idx = stratified_sample(y, 2000, 500, seed=1)
+
+    assert sorted(y[eval_idx]) == [0, 1, 2]
+    assert sorted(y[train_idx]) == [0, 1, 2, 3]
+
+
+def trained_classifier(X):
+    """MLClassifier and the small forest, fitted on synthetic labels of X, it has registered"""
+    classifier = MLClassifier(ModelRegistry('models'))
+    model = RandomForestClassifier(n_estimators=5, max_depth=8, random_state=0)
+    model.fit(X, classifier.generate_synthetic_labels(X))
+    classifier.registry.register(model, 'random_forest')
+    return classifier, model
+
+
+def test_windowed_classify_matches_full_scene(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('exports')
+    X = write_scene('scene.tif', height=70, width=90)
+    classifier, model = trained_classifier(X)
+    expected = model.predict(X).reshape(70, 90)
+
+    for tile_size in (16, 0):
+        result = classifier.classify('scene.tif', tile_size=tile_size)
+        with rasterio.open(result['output_path']) as src:
+            assert src.profile['tiled']
+            assert src.profile['compress'] == 'deflate'
+            assert np.array_equal(src.read(1), expected)
+        assert sum(result['class_distribution'].values()) == 70 * 90
+
+
+def test_parallel_classify_matches_sequential(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('exports')
+    X = write_scene('scene.tif', height=70, width=90)
+    classifier, _ = trained_classifier(X)
+
+    sequential = classifier.classify('scene.tif', tile_size=32, workers=1)
+    with rasterio.open(sequential['output_path']) as src:
+        expected = src.read(1)
+
+    parallel = classifier.classify('scene.tif', tile_size=32, workers=2)
+    with rasterio.open(parallel['output_path']) as src:
+        assert np.array_equal(src.read(1), expected)
+    assert parallel['class_distribution'] == sequential['class_distribution']
+
+
+
+def test_progress_is_throttled_but_keeps_stage_changes():
+    now = [0.0]
+    sent = []
+    throttle = ProgressThrottle(sent.append, max_per_second=2, clock=lambda: now[0])
+
+    for step in range(100):
+        now[0] = step * 0.01
+        throttle({'stage': 'labeling', 'progress': step})
+    throttle({'stage': 'training', 'progress': 0})
+    throttle({'stage': 'training', 'progress': 50})
+    throttle({'stage': 'training', 'progress': 100, 'data': {'metrics': {}}})
+
+    assert [(u['stage'], u['progress']) for u in sent] == [
+        ('labeling', 0), ('labeling', 50),  # one update per 0.5 s within the stage
+        ('labeling', 99),                   # latest held update, flushed by the stage change
+        ('training', 0), ('training', 100)  # stage start and completion are never held
+    ]
+    assert throttle.coalesced == 97 + 1  # training 50% was superseded by 100%
+
+
+def test_classify_progress_handles_tiny_images():
+    X = np.random.default_rng(0).integers(0, 3000, size=(6, 4)).astype(np.float32)
+    updates = []
+    trainer = RealtimeTrainer(progress_callback=updates.append)
+    trainer.model = RandomForestClassifier(n_estimators=2, random_state=0).fit(X, [0, 1, 2, 0, 1, 2])
+
+    classified, _ = trainer.classify_with_progress(X, (2, 3))
+
+    assert classified.shape == (2, 3)
+    assert updates[-1]['progress'] == 100
+
+
+def test_trained_models_are_versioned_and_stay_loaded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('exports')
+    write_scene('scene.tif', height=60, width=60)
+    monkeypatch.setattr('config.Config.TRAINING_SAMPLES_PER_CLASS', 200)
+    monkeypatch.setattr('config.Config.EVALUATION_SAMPLES_PER_CLASS', 50)
+    registry = ModelRegistry('models')
+    classifier = MLClassifier(registry)
+
+    first = classifier.train_and_classify('scene.tif')
+    second = classifier.train_and_classify('scene.tif', retrain=True)
+
+    assert not first['reused_model'] and not second['reused_model']
+    assert first['model_id'] != second['model_id']
+    assert first['classification']['model_id'] == first['model_id']
+    info = registry.metadata(first['model_id'])
+    assert info['training_samples'] > 0 and info['metrics']['accuracy'] > 0
+    assert len(info['bands']) == 4 and len(info['band_stats']['min']) == 4
+    assert [m['model_id'] for m in registry.list_models()] == [second['model_id'], first['model_id']]
+
+    # Both models were kept warm by training; classifying by ID never reloads
+    classifier.classify('scene.tif', model_id=first['model_id'])
+    assert registry.stats()['misses'] == 0
+
+    # A fresh process finds the newest model on disk, then serves it from memory
+    restarted = MLClassifier(ModelRegistry('models'))
+    assert restarted.classify('scene.tif')['model_id'] == second['model_id']
+    restarted.classify('scene.tif', model_id=second['model_id'])
+    assert restarted.registry.stats()['misses'] == 1
+    assert restarted.registry.stats()['hits'] == 1
+    load = restarted.registry.stats()['loads'][second['model_id']]
+    assert load['load_seconds'] > 0
+    assert load['file_bytes'] == registry.metadata(second['model_id'])['size_bytes']
+
+    with pytest.raises(ValueError):
+        restarted.classify('scene.tif', model_id='../scene')
+
+
+def test_concurrent_trainings_keep_their_own_models(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('exports')
+    write_scene('a.tif', height=40, width=40)
+    write_scene('b.tif', height=40, width=40, seed=1)
+    monkeypatch.setattr('config.Config.TRAINING_SAMPLES_PER_CLASS', 100)
+    monkeypatch.setattr('config.Config.EVALUATION_SAMPLES_PER_CLASS', 20)
+    registry = ModelRegistry('models')
+    classifier = MLClassifier(registry)
+
+    # Both requests register before either classifies
+    both_registered = threading.Barrier(2)
+    fit_and_register = classifier._fit_and_register
+
+    def fit_and_wait(*args):
+        result = fit_and_register(*args)
+        both_registered.wait(30)
+        return result
+
+    monkeypatch.setattr(classifier, '_fit_and_register', fit_and_wait)
+    results = {}
+
+    def train(path):
+        results[path] = classifier.train_and_classify(path, retrain=True)
+
+    threads = [threading.Thread(target=train, args=(path,)) for path in ('a.tif', 'b.tif')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+
+    assert sorted(results) == ['a.tif', 'b.tif']
+    for path, result in results.items():
+        assert registry.metadata(result['model_id'])['source_image'] == path
+        assert result['classification']['model_id'] == result['model_id']
+
+
+def test_registry_evicts_least_recently_used_by_size(tmp_path):
+    registry = ModelRegistry(str(tmp_path), max_models=3, max_bytes=10 ** 9)
+    ids = [registry.register(np.zeros(n * 1000), 'array') for n in (1, 2, 3)]
+    registry.get(ids[0])
+    tiny = registry.register(np.zeros(10), 'array')
+    assert registry.stats()['resident'][0] == ids[2]  # ids[1] was least recently used
+    assert ids[1] not in registry.stats()['resident']
+
+    # Byte budget: reloading a large model pushes the older large ones out
+    registry.max_bytes = os.path.getsize(registry.model_path(ids[2])) + 100
+    # Reloaded models are memory-mapped rather than read into private memory
+    assert isinstance(registry.get(ids[1]), np.memmap)
+    assert registry.stats()['resident'] == [tiny, ids[1]]
+    assert registry.stats()['resident_bytes'] <= registry.max_bytes
+
+
+def test_registry_keeps_a_bounded_number_of_models(tmp_path):
+    registry = ModelRegistry(str(tmp_path), max_models=2, max_stored=3)
+    ids = [registry.register(np.zeros(1000), 'array', {'n': n}) for n in range(3)]
+    registry.get(ids[0])  # in use, so it outlives newer models
+    ids.append(registry.register(np.zeros(1000), 'array', {'n': 3}))
+
+    assert [m['model_id'] for m in registry.list_models()] == [ids[3], ids[2], ids[0]]
+    assert registry.stats()['pruned'] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(ids[1])]
+    with pytest.raises(ValueError):
+        registry.model_path(ids[1])
+
+    # Metadata is read from disk once, then served from the in-memory index
+    restarted = ModelRegistry(str(tmp_path))
+    assert [m['model_id'] for m in restarted.list_models()] == [ids[3], ids[2], ids[0]]
+    os.remove(os.path.join(str(tmp_path), ids[2] + '.json'))
+    assert restarted.metadata(ids[2])['n'] == 2
+
+
+def test_compatible_model_is_reused_instead_of_retrained(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('exports')
+    monkeypatch.setattr('config.Config.TRAINING_SAMPLES_PER_CLASS', 200)
+    monkeypatch.setattr('config.Config.EVALUATION_SAMPLES_PER_CLASS', 50)
+    classifier = MLClassifier(ModelRegistry('models'))
+
+    write_scene('scene.tif', height=60, width=60)
+    trained = classifier.train_and_classify('scene.tif', sensor='sentinel')
+
+    # A neighboring scene from the same sensor with the same value ranges
+    write_scene('neighbor.tif', height=60, width=60, seed=1)
+    fitted = []
+    monkeypatch.setattr(classifier, 'train_random_forest', lambda *args: fitted.append(args))
+    reused = classifier.train_and_classify('neighbor.tif', sensor='sentinel')
+
+    assert fitted == []
+    assert reused['reused_model'] and reused['model_id'] == trained['model_id']
+    assert reused['metrics'] == trained['metrics']
+    assert sum(reused['classification']['class_distribution'].values()) == 60 * 60
+
+    # Another sensor, or a scene with very different ranges, is not served by it
+    assert classifier.find_compatible_model(['band_1', 'band_2', 'band_3', 'band_4'],
+                                            get_band_stats('neighbor.tif'), 'modis') is None
+    with rasterio.open('scene.tif') as src:
+        profile, data = src.profile, src.read()
+    with rasterio.open('dim.tif', 'w', **profile) as dst:
+        dst.write(data // 3)
+    assert classifier.find_compatible_model(['band_1', 'band_2', 'band_3', 'band_4'],
+                                            get_band_stats('dim.tif'), 'sentinel') is None
+
+
+def test_hist_gb_uses_the_same_train_classify_flow(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('exports')
+    write_scene('scene.tif', height=60, width=60)
+    monkeypatch.setattr('config.Config.TRAINING_SAMPLES_PER_CLASS', 300)
+    monkeypatch.setattr('config.Config.EVALUATION_SAMPLES_PER_CLASS', 100)
+    registry = ModelRegistry('models')
+    classifier = MLClassifier(registry)
+
+    result = classifier.train_and_classify('scene.tif', 'hist_gb')
+
+    assert result['model_id'].startswith('hist_gb-') and not result['reused_model']
+    assert result['metrics']['accuracy'] > 0.8
+    assert registry.metadata(result['model_id'])['params']['early_stopping'] is True
+    assert sum(result['classification']['class_distribution'].values()) == 60 * 60
+
+    # Reuse stays within the model type
+    assert classifier.train_and_classify('scene.tif', 'hist_gb')['model_id'] == result['model_id']
+    assert not classifier.train_and_classify('scene.tif', 'random_forest')['reused_model']
+
+    # A fresh classifier picks the newest hist_gb model; the process pool agrees with it
+    restarted = MLClassifier(ModelRegistry('models'))
+    sequential = restarted.classify('scene.tif', 'hist_gb', tile_size=32, workers=1)
+    parallel = restarted.classify('scene.tif', 'hist_gb', tile_size=32, workers=2)
+    assert sequential['model_id'] == result['model_id']
+    assert parallel['class_distribution'] == sequential['class_distribution']
+
+
+def test_hist_gb_trains_with_a_near_empty_class(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('config.Config.HGB_MAX_ITER', 20)
+    rng = np.random.default_rng(0)
+    y = np.concatenate([np.zeros(5000, dtype=int), np.ones(5000, dtype=int), np.full(2, 2)])
+    X = rng.normal(size=(len(y), 4)) + y[:, None]
+
+    # The tiny class keeps a single training pixel after one is held out
+    model_id, metrics = MLClassifier(ModelRegistry('models')).train_hist_gradient_boosting(X, y)
+
+    assert model_id.startswith('hist_gb-') and metrics['accuracy'] > 0.5
+
+
+def test_quantized_features_are_contiguous_uint8(tmp_path):
+    X = write_scene(str(tmp_path / 'scene.tif'), height=50, width=50)
+    stats = get_band_stats(str(tmp_path / 'scene.tif'))
+
+    features = quantize_bands(X, stats, block_size=999)
+
+    assert features.dtype == np.uint8 and features.flags['C_CONTIGUOUS']
+    assert features.nbytes * X.itemsize == X.nbytes
+    assert features.min(axis=0).tolist() == [0] * 4 and features.max(axis=0).tolist() == [255] * 4
+    assert np.array_equal(features, quantize_bands(X, stats))
+    # Bins preserve order within a band; values outside the stats clip to the ends
+    order = np.argsort(X[:, 0], kind='stable')
+    assert np.all(np.diff(features[order, 0].astype(int)) >= 0)
+    assert quantize_bands(np.array([[-5.0] * 4, [1e9] * 4]), stats).tolist() == [[0] * 4, [255] * 4]
+
+
+def read_map(result):
+    with rasterio.open(result['classification']['output_path']) as src:
+        return src.read(1)
+
+
+def test_uint8_features_keep_accuracy_parity(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('exports')
+    write_scene('scene.tif', height=100, width=100)
+    monkeypatch.setattr('config.Config.TRAINING_SAMPLES_PER_CLASS', 500)
+    monkeypatch.setattr('config.Config.EVALUATION_SAMPLES_PER_CLASS', 200)
+    registry = ModelRegistry('models')
+    classifier = MLClassifier(registry)
+
+    monkeypatch.setattr('config.Config.FEATURE_ENCODING', 'raw')
+    raw = classifier.train_and_classify('scene.tif')
+    monkeypatch.setattr('config.Config.FEATURE_ENCODING', 'uint8')
+    monkeypatch.setattr('config.Config.INFERENCE_TILE_SIZE', 32)
+    encoded_rows = []
+    quantize = features.quantize_bands
+
+    def recording(X, stats, *args):
+        encoded_rows.append(len(X))
+        return quantize(X, stats, *args)
+
+    monkeypatch.setattr(features, 'quantize_bands', recording)
+    quantized = classifier.train_and_classify('scene.tif', retrain=True)
+
+    # Sampled rows and prediction windows are encoded, never the whole scene
+    assert encoded_rows and max(encoded_rows) < 100 * 100
+    assert 'feature_encoding' not in registry.metadata(raw['model_id'])
+    assert registry.metadata(quantized['model_id'])['feature_encoding'] == 'uint8'
+    assert quantized['metrics']['accuracy'] >= raw['metrics']['accuracy'] - 0.02
+    assert np.mean(read_map(quantized) == read_map(raw)) > 0.95
+
+    # Each model is served with its own encoding, in this process or the pool
+    for model_id, expected in ((raw['model_id'], read_map(raw)), (quantized['model_id'], read_map(quantized))):
+        result = classifier.classify('scene.tif', model_id=model_id, tile_size=32, workers=2)
+        assert np.array_equal(read_map({'classification': result}), expected)